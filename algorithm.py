@@ -1,39 +1,26 @@
+import contextlib
+import functools
+import hashlib
+import json
+import logging
+import multiprocessing
 import random
+import threading
+import time
+from array import array
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
 from typing import Dict, List, Tuple, Optional, Set
-import copy
 
-# ==================== CONFIG / DATA SETUP (1-based indexing) ====================
-# These variables will be set dynamically when generate_timetable is called
-sections = ["A", "B", "C"]  # Default fallback
-subjects_per_section = {}   # Will be set dynamically
-faculties = {}              # Will be set dynamically
-strict_subject_placement = {}  # Will be set dynamically
-forbidden_subject_placement = {}  # Will be set dynamically
-
-# Break configuration - these will be set from database using a config dict
-# Using a dict to ensure modifications affect all references
-break_config_state = {
-    'first': 2,      # First break after P2 (will be overridden by database)
-    'lunch': 4       # Lunch break after P4 (will be overridden by database)
-}
-
-# For backward compatibility
-break_periods = {
-    'first': 2,      # First break after P2
-    'lunch': 4       # Lunch break after P4
-}
-
-# Convenience accessors for the break configuration
-def get_first_break_period():
-    return break_config_state['first']
+logger = logging.getLogger(__name__)
 
-def get_lunch_break_period():
-    return break_config_state['lunch']
+# Longest debug trace kept for one run (see SolverContext.trace)
+MAX_TRACE_LINES = 5000
 
+# ==================== CONFIG / DATA SETUP (1-based indexing) ====================
 days = {1: "Mon", 2: "Tue", 3: "Wed", 4: "Thu", 5: "Fri"}
 num_days = 5
 num_periods = 7  # Teaching periods
-# num_display_slots will be set dynamically based on number of breaks
 max_subject_per_day = 3
 
 # Map teaching period to display slot
@@ -47,31 +34,271 @@ def teaching_period_to_display_slot(period: int) -> int:
     else:
         return period + 2
 
-subjects_per_section = {
-    # Will be populated dynamically from database
-}
 
-faculties = {
-    # Will be populated dynamically from database
-}
+class TimetableInfeasibleError(Exception):
+    """Raised when the hours and constraints provably admit no timetable.
+
+    `problems` holds the find_infeasibilities reports when the static check raised it.
+    """
+
+    def __init__(self, message: str, problems: Optional[List[Dict[str, object]]] = None):
+        super().__init__(message)
+        self.problems = problems or []
+
+
+class GenerationCancelled(Exception):
+    """Raised inside the solver once the run's cancel token is set (see SolverContext.check_cancelled)."""
+
+
+class SolverStats:
+    """Per-run instrumentation (ctx.stats): wall/CPU time per solver phase and event counters.
+
+    Phase times are inclusive (smart_optimize contains the swaps and placements
+    it makes) and CPU time is the calling thread's, so concurrent requests do
+    not blur each other's numbers.
+    """
+
+    def __init__(self):
+        # phase -> [calls, wall seconds, cpu seconds]
+        self.phases: Dict[str, List[float]] = {}
+        self.counters: Dict[str, int] = {}
+
+    def add_phase(self, name: str, wall: float, cpu: float, calls: int = 1):
+        totals = self.phases.get(name)
+        if totals is None:
+            totals = self.phases[name] = [0, 0.0, 0.0]
+        totals[0] += calls
+        totals[1] += wall
+        totals[2] += cpu
+
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        """Time the enclosed block as one call of phase `name`."""
+        wall, cpu = time.perf_counter(), time.thread_time()
+        try:
+            yield
+        finally:
+            self.add_phase(name, time.perf_counter() - wall, time.thread_time() - cpu)
+
+    def count(self, name: str, amount: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def merge(self, other: Dict[str, dict]):
+        """Add the to_dict() of another run (e.g. a multistart worker's) into this one."""
+        for name, phase in other.get("phases", {}).items():
+            self.add_phase(name, phase["wall_ms"] / 1000, phase["cpu_ms"] / 1000, phase["calls"])
+        for name, amount in other.get("counters", {}).items():
+            self.count(name, amount)
+
+    def to_dict(self) -> Dict[str, dict]:
+        return {
+            "phases": {name: {"calls": int(calls), "wall_ms": round(wall * 1000, 2), "cpu_ms": round(cpu * 1000, 2)}
+                       for name, (calls, wall, cpu) in self.phases.items()},
+            "counters": dict(self.counters)
+        }
+
+
+def timed_phase(name: str):
+    """Decorator for solver functions taking the context first: adds each call's time to ctx.stats under `name`."""
+    def decorate(function):
+        @functools.wraps(function)
+        def timed(ctx, *args, **kwargs):
+            wall, cpu = time.perf_counter(), time.thread_time()
+            try:
+                return function(ctx, *args, **kwargs)
+            finally:
+                ctx.stats.add_phase(name, time.perf_counter() - wall, time.thread_time() - cpu)
+        return timed
+    return decorate
+
+
+class SolverContext:
+    """Everything one timetable generation needs, in one object.
+
+    A context is built per call to store_section_timetables and passed as the
+    first argument to every solver function, so two generations running in
+    the same process (threads, worker pools) never see each other's sections,
+    subjects, faculty assignments or break configuration.
+
+    All randomness goes through `rng`, a random.Random seeded with `seed`, so
+    a run with the same inputs and seed can be replayed exactly.
+
+    Solver tracing is off unless the module logger is at DEBUG or a `trace`
+    list is passed (debug for just this run); call sites check `ctx.debug`
+    before building a message, so a disabled run does no formatting at all.
+    """
 
-assigned_multi_faculty = {}
+    def __init__(self, section_list=None, subjects_dict=None, faculty_dict=None,
+                 strict_constraints=None, forbidden_constraints=None, break_config=None, seed=None,
+                 trace: Optional[List[str]] = None, section_faculty=None, section_groups=None, busy_faculty=None):
+        self.sections: List[str] = list(section_list) if section_list is not None else ["A", "B", "C"]
+        # {section: {subject_name: {hours, lab, last}, ...}, ...}
+        self.subjects_per_section: Dict[str, Dict[str, dict]] = subjects_dict if subjects_dict is not None else {}
+        # {subject_name: faculty_name or [faculty_name, ...]}
+        self.faculties: Dict[str, object] = faculty_dict if faculty_dict is not None else {}
+        # {(section, subject_name): faculty_name or [...]}, overriding `faculties` for that section
+        # (college-wide runs, where departments reuse subject names for different teachers)
+        self.section_faculty: Dict[Tuple[str, str], object] = section_faculty if section_faculty is not None else {}
+        # {section: department}; MC1/MC2 exclusivity only applies within a department (None = all sections)
+        self.section_groups: Dict[str, str] = section_groups if section_groups is not None else {}
+        # {faculty_name: [(day, period), ...]} already booked outside this run (e.g. another department)
+        self.busy_faculty: Dict[str, List[Tuple[int, int]]] = busy_faculty if busy_faculty is not None else {}
+
+        # Per-run random source (seed=None draws fresh OS entropy)
+        self.seed: Optional[int] = seed
+        self.rng = random.Random(seed)
+
+        # Debug tracing: lines also go to `trace` when the caller asked for this run's trace
+        self.trace = trace
+        self.debug = trace is not None or logger.isEnabledFor(logging.DEBUG)
+        self.strict_subject_placement = strict_constraints if strict_constraints is not None else {}
+        self.forbidden_subject_placement = forbidden_constraints if forbidden_constraints is not None else {}
+
+        # Break configuration (loaded from database): break is AFTER the given period
+        break_config = break_config or {}
+        self.break_periods = {
+            'first': break_config.get('first_break_period', 2),   # First break after P2
+            'lunch': break_config.get('lunch_break_period', 4)    # Lunch break after P4
+        }
+
+        # Calculate display slots dynamically: 7 periods + 2 breaks = 9 slots
+        self.num_display_slots = num_periods + 2
+
+        # Faculty chosen for (section, subject) when a subject lists several faculties
+        self.assigned_multi_faculty: Dict[Tuple[str, str], str] = {}
+
+        # Subject names interned to small ints for the TimetableGrid cells
+        self.subject_table = SubjectTable()
+        for section_subjects in self.subjects_per_section.values():
+            for subject in section_subjects:
+                self.subject_table.intern(subject)
+        self.subject_table.intern("REMEDIAL")
+
+        # Per-phase timings and operation counters for this run (see SolverStats)
+        self.stats = SolverStats()
+
+        # Which faculty teaches when, across every section of this generation (plus busy_faculty).
+        # Grids created by create_empty_timetable keep it up to date as cells change.
+        self.reset_occupancy()
+        self._faculty_codes: Dict[str, "SectionFacultyMap"] = {}
+
+        # Strict/forbidden placements compiled once per generation (see compile_constraints)
+        self.constraints: Dict[str, "SectionConstraints"] = compile_constraints(self)
+        self._domains: Dict[str, Dict[str, "SubjectDomain"]] = {}
+
+        # Optimizer iterations run so far, across all sections and attempts
+        self.iterations = 0
+
+        # Section optimizer run after insertion (smart_optimize unless an engine swaps it)
+        self.optimizer = None
+        # Optimizer calls the current pass still has to make, the running one included (None outside a pass);
+        # a time-budgeted optimizer splits what is left of the deadline by it
+        self.optimize_calls_left: Optional[int] = None
+        # time.perf_counter() value at which every phase wraps up with what it has (None = no limit)
+        self.deadline: Optional[float] = None
+        # Cancel token: anything with is_set() (threading.Event, multiprocessing.Event); polled by every search loop
+        self.cancel = None
+
+        # Latest progress snapshot, pushed to progress_callback (if set) on every update
+        self.progress: Dict[str, object] = {}
+        self.progress_callback = None
+
+    def report_progress(self, event: str = "progress", **fields):
+        """Merge `fields` into the progress snapshot and notify the callback.
+
+        `event` names what just happened (attempt_started, section_done,
+        attempt_finished, iteration, ...) and is sent along with the snapshot.
+        """
+        progress = self.progress
+        progress.update(fields)
+        if 'attempt' in progress and 'max_attempts' in progress:
+            done = progress.get('sections_done', 0) / max(len(self.sections), 1)
+            progress['percent'] = int(100 * (progress['attempt'] - 1 + done) / progress['max_attempts'])
+        progress['event'] = event
+        if self.progress_callback is not None:
+            self.progress_callback(dict(progress))
+
+    def check_cancelled(self):
+        """Raise GenerationCancelled if the cancel token has been set."""
+        if self.cancel is not None and self.cancel.is_set():
+            raise GenerationCancelled("Timetable generation was cancelled")
+
+    def out_of_time(self) -> bool:
+        """True once the run's time budget (deadline) is used up."""
+        return self.deadline is not None and time.perf_counter() >= self.deadline
+
+    def reset_occupancy(self):
+        """Start a fresh faculty calendar (e.g. for a new global attempt) holding only busy_faculty."""
+        self.stats.count("calendar_rebuilds")
+        self.occupancy = FacultyOccupancy()
+        for faculty, periods in self.busy_faculty.items():
+            for (day, period) in periods:
+                self.occupancy.add(faculty, day, period)
+
+    def mc_peers(self, section: str) -> List[str]:
+        """Sections whose MC1/MC2 blocks must not overlap with `section`'s."""
+        group = self.section_groups.get(section)
+        if group is None:
+            return self.sections
+        return [other for other in self.sections if self.section_groups.get(other) == group]
+
+    def faculty_codes(self, section: str) -> "SectionFacultyMap":
+        """Subject code -> faculty for one section, resolved lazily and memoised."""
+        mapping = self._faculty_codes.get(section)
+        if mapping is None:
+            mapping = self._faculty_codes[section] = SectionFacultyMap(self, section)
+        return mapping
+
+    def domains_for(self, section: str) -> Dict[str, "SubjectDomain"]:
+        """Static placement domain of every subject of a section (see compute_domains), memoised."""
+        domains = self._domains.get(section)
+        if domains is None:
+            domains = self._domains[section] = compute_domains(self, section)
+        return domains
+
+    def constraints_for(self, section: str) -> "SectionConstraints":
+        """Compiled constraint index for a section (empty if it has no constraints)."""
+        index = self.constraints.get(section)
+        if index is None:
+            index = self.constraints[section] = SectionConstraints({}, {})
+        return index
+
+
+def solver_debug(ctx: SolverContext, message: str):
+    """Emit one solver trace line (callers check ctx.debug first)."""
+    logger.debug(message)
+    if ctx.trace is not None:
+        append_trace(ctx.trace, message)
+
+def append_trace(trace: List[str], message: str):
+    """Add a line to a trace list, which stops growing after MAX_TRACE_LINES."""
+    if len(trace) < MAX_TRACE_LINES:
+        trace.append(message)
+    elif len(trace) == MAX_TRACE_LINES:
+        trace.append(f"... trace truncated after {MAX_TRACE_LINES} lines")
 
-def get_faculty_for_subject(section: str, subject: str) -> Optional[str]:
-    global assigned_multi_faculty
-    if subject not in faculties:
+
+# Convenience accessors for the break configuration
+def get_first_break_period(ctx: SolverContext):
+    return ctx.break_periods['first']
+
+def get_lunch_break_period(ctx: SolverContext):
+    return ctx.break_periods['lunch']
+
+def get_faculty_for_subject(ctx: SolverContext, section: str, subject: str) -> Optional[str]:
+    faculty_data = ctx.section_faculty.get((section, subject), ctx.faculties.get(subject))
+    if faculty_data is None:
         return None
-    faculty_data = faculties[subject]
     if isinstance(faculty_data, str):
         return faculty_data
     if isinstance(faculty_data, list):
         key = (section, subject)
-        if key in assigned_multi_faculty:
-            return assigned_multi_faculty[key]
+        if key in ctx.assigned_multi_faculty:
+            return ctx.assigned_multi_faculty[key]
         # For list, just pick the first one (as per requirement)
         chosen = faculty_data[0] if faculty_data else None
         if chosen:
-            assigned_multi_faculty[key] = chosen
+            ctx.assigned_multi_faculty[key] = chosen
         return chosen
     return None
 
@@ -120,88 +347,301 @@ def convert_placements(placement_dict, section):
             converted[subject] = converted_list
     return converted
 
+class SectionConstraints:
+    """Strict/forbidden placements of one section, compiled for O(1) lookups.
+
+    - strict: {subject: [(day, period), ...]} in the original order (used for placement)
+    - locked_cells: every cell held by a strict placement
+    - forbidden: {subject: frozenset of (day, period)} cells the subject may not use
+    """
+
+    def __init__(self, strict: Dict[str, List[Tuple[int, int]]], forbidden: Dict[str, List[Tuple[int, int]]]):
+        self.strict = strict
+        self.locked_cells: frozenset = frozenset(cell for cells in strict.values() for cell in cells)
+        self.forbidden: Dict[str, frozenset] = {subject: frozenset(cells) for subject, cells in forbidden.items()}
+
+    def is_forbidden(self, subject: str, day: int, period: int) -> bool:
+        cells = self.forbidden.get(subject)
+        return cells is not None and (day, period) in cells
+
+
+def compile_constraints(ctx: SolverContext) -> Dict[str, SectionConstraints]:
+    """Convert the raw strict/forbidden dicts once per generation run."""
+    compiled = {}
+    all_sections = set(ctx.sections) | set(ctx.strict_subject_placement) | set(ctx.forbidden_subject_placement)
+    for section in all_sections:
+        compiled[section] = SectionConstraints(
+            convert_placements(ctx.strict_subject_placement, section),
+            convert_placements(ctx.forbidden_subject_placement, section)
+        )
+    return compiled
+
 # ==================== LOCKED CELLS ====================
-def is_locked_cell(section: str, day: int, period: int, subject: Optional[str] = None) -> bool:
+def is_locked_cell(ctx: SolverContext, section: str, day: int, period: int, subject: Optional[str] = None) -> bool:
     """
     Check if a cell is locked (strict placement or forbidden for a subject)
     Returns True if the cell should not be modified
     """
-    # Check strict placements
-    strict_dict = convert_placements(strict_subject_placement, section)
-    for strict_subject, placements in strict_dict.items():
-        if (day, period) in placements:
-            # This cell is locked to a specific subject
-            return True
+    index = ctx.constraints_for(section)
+
+    # Check strict placements - this cell is locked to a specific subject
+    if (day, period) in index.locked_cells:
+        return True
 
     # Check forbidden placements for the given subject
-    if subject:
-        forbidden_dict = convert_placements(forbidden_subject_placement, section)
-        if subject in forbidden_dict:
-            if (day, period) in forbidden_dict[subject]:
-                # This subject is forbidden at this position
-                return True
+    if subject and index.is_forbidden(subject, day, period):
+        return True
 
     return False
 
-def get_all_locked_cells(section: str) -> Set[Tuple[int, int]]:
+def get_all_locked_cells(ctx: SolverContext, section: str) -> Set[Tuple[int, int]]:
     """Get all cells that are locked due to strict placements"""
-    locked = set()
-    strict_dict = convert_placements(strict_subject_placement, section)
-    for subject, placements in strict_dict.items():
-        for (day, period) in placements:
-            locked.add((day, period))
-    return locked
+    return ctx.constraints_for(section).locked_cells
+
+# ==================== FACULTY OCCUPANCY ====================
+# ADJACENT_WINDOW[p] has the bits of periods p-1, p and p+1 (bit p-1 = period p)
+ADJACENT_WINDOW = [0] + [(7 << p) >> 2 for p in range(1, num_periods + 1)]
+
+class FacultyOccupancy:
+    """faculty -> per-day bitmask of the periods they teach, across all sections.
+
+    Updated incrementally as grid cells change, so a faculty conflict check
+    (same period, or the period just before/after) is one AND against
+    ADJACENT_WINDOW instead of a scan over every section.
+    """
+
+    def __init__(self):
+        self.masks: Dict[str, List[int]] = {}
+        # How many placements hold (faculty, day, period); a bit is cleared only when this reaches 0
+        self.counts: Dict[Tuple[str, int, int], int] = {}
+
+    def add(self, faculty: str, day: int, period: int):
+        key = (faculty, day, period)
+        self.counts[key] = self.counts.get(key, 0) + 1
+        masks = self.masks.get(faculty)
+        if masks is None:
+            masks = self.masks[faculty] = [0] * num_days
+        masks[day - 1] |= 1 << (period - 1)
+
+    def remove(self, faculty: str, day: int, period: int):
+        key = (faculty, day, period)
+        remaining = self.counts.get(key, 0) - 1
+        if remaining > 0:
+            self.counts[key] = remaining
+            return
+        self.counts.pop(key, None)
+        masks = self.masks.get(faculty)
+        if masks is not None:
+            masks[day - 1] &= ~(1 << (period - 1))
+
+    def is_busy(self, faculty: str, day: int, period: int) -> bool:
+        masks = self.masks.get(faculty)
+        return masks is not None and bool(masks[day - 1] & (1 << (period - 1)))
+
+    def conflicts(self, faculty: str, day: int, period: int) -> bool:
+        """True if `faculty` already teaches at, or right before/after, this period."""
+        masks = self.masks.get(faculty)
+        return masks is not None and bool(masks[day - 1] & ADJACENT_WINDOW[period])
+
+
+class SectionFacultyMap(dict):
+    """Subject code -> faculty name (or None) for one section, filled on first use."""
+
+    def __init__(self, ctx: "SolverContext", section: str):
+        super().__init__()
+        self.ctx = ctx
+        self.section = section
+
+    def __missing__(self, code: int) -> Optional[str]:
+        subject = self.ctx.subject_table.names[code]
+        faculty = get_faculty_for_subject(self.ctx, self.section, subject) if subject else None
+        self[code] = faculty
+        return faculty
+
+# ==================== TIMETABLE GRID ====================
+class SubjectTable:
+    """Interns subject names to small ints. Code 0 is reserved for an empty cell."""
+
+    def __init__(self):
+        self.names: List[Optional[str]] = [None]
+        self.codes: Dict[str, int] = {}
+
+    def intern(self, subject: Optional[str]) -> int:
+        if subject is None:
+            return 0
+        code = self.codes.get(subject)
+        if code is None:
+            code = self.codes[subject] = len(self.names)
+            self.names.append(subject)
+        return code
+
+
+class TimetableGrid:
+    """One section's 5x7 timetable used inside the solver.
+
+    Cells hold interned subject codes in a flat array('h'), and a per-subject,
+    per-day bitmask of occupied periods is kept alongside (bit p-1 = period p).
+    Copying is two array copies, the state hash is the raw cell bytes, and
+    "is subject X on day D" is a single int test. Solver results are converted
+    back to the nested {day: {period: subject}} dicts with to_dict().
+    """
+
+    __slots__ = ('subjects', 'cells', 'day_masks', 'occupancy', 'faculty_of')
+
+    def __init__(self, subjects: SubjectTable, cells: Optional[array] = None, day_masks: Optional[array] = None,
+                 occupancy: Optional[FacultyOccupancy] = None, faculty_of: Optional[SectionFacultyMap] = None):
+        self.subjects = subjects
+        self.cells = cells if cells is not None else array('h', bytes(2 * num_days * num_periods))
+        # day_masks[code * num_days + day - 1] -> bitmask of periods holding `code` on `day`
+        self.day_masks = day_masks if day_masks is not None else array('B')
+        # When attached, every set() is mirrored into the shared faculty occupancy index
+        self.occupancy = occupancy
+        self.faculty_of = faculty_of
+
+    @staticmethod
+    def cell_index(day: int, period: int) -> int:
+        return (day - 1) * num_periods + (period - 1)
+
+    def get(self, day: int, period: int) -> Optional[str]:
+        return self.subjects.names[self.cells[(day - 1) * num_periods + period - 1]]
+
+    def code(self, day: int, period: int) -> int:
+        return self.cells[(day - 1) * num_periods + period - 1]
+
+    def set(self, day: int, period: int, subject: Optional[str]):
+        idx = (day - 1) * num_periods + period - 1
+        old = self.cells[idx]
+        new = self.subjects.intern(subject)
+        if old == new:
+            return
+        bit = 1 << (period - 1)
+        masks = self.day_masks
+        occupancy = self.occupancy
+        if old:
+            masks[old * num_days + day - 1] &= ~bit
+            if occupancy is not None:
+                faculty = self.faculty_of[old]
+                if faculty:
+                    occupancy.remove(faculty, day, period)
+        if new:
+            slot = new * num_days + day - 1
+            if slot >= len(masks):
+                masks.extend(bytes(slot + 1 - len(masks)))
+            masks[slot] |= bit
+            if occupancy is not None:
+                faculty = self.faculty_of[new]
+                if faculty:
+                    occupancy.add(faculty, day, period)
+        self.cells[idx] = new
+
+    def faculty_at(self, day: int, period: int) -> Optional[str]:
+        code = self.cells[(day - 1) * num_periods + period - 1]
+        return self.faculty_of[code] if code and self.faculty_of is not None else None
+
+    def day_mask(self, subject: str, day: int) -> int:
+        code = self.subjects.codes.get(subject)
+        if not code:
+            return 0
+        slot = code * num_days + day - 1
+        return self.day_masks[slot] if slot < len(self.day_masks) else 0
+
+    def on_day(self, subject: str, day: int) -> bool:
+        return self.day_mask(subject, day) != 0
+
+    def count(self, subject: str) -> int:
+        code = self.subjects.codes.get(subject)
+        if not code:
+            return 0
+        start = code * num_days
+        return sum(mask.bit_count() for mask in self.day_masks[start:start + num_days])
+
+    def positions(self, subject: str) -> List[Tuple[int, int]]:
+        """(day, period) cells holding `subject`, in day/period order."""
+        found = []
+        for day in range(1, num_days + 1):
+            mask = self.day_mask(subject, day)
+            period = 1
+            while mask:
+                if mask & 1:
+                    found.append((day, period))
+                mask >>= 1
+                period += 1
+        return found
+
+    def copy(self) -> "TimetableGrid":
+        """Detached copy: changes to it are not mirrored into the occupancy index."""
+        return TimetableGrid(self.subjects, array('h', self.cells), array('B', self.day_masks),
+                             None, self.faculty_of)
+
+    def copy_from(self, other: "TimetableGrid"):
+        """Overwrite this grid in place with the contents of `other`."""
+        if self.occupancy is None:
+            self.cells[:] = other.cells
+            self.day_masks = array('B', other.day_masks)
+            return
+        # Attached: go through set() for the changed cells so the occupancy index follows
+        names = self.subjects.names
+        for idx, code in enumerate(other.cells):
+            if self.cells[idx] != code:
+                self.set(idx // num_periods + 1, idx % num_periods + 1, names[code])
+
+    def detach(self):
+        """Remove this grid's placements from the occupancy index and stop tracking."""
+        occupancy = self.occupancy
+        if occupancy is None:
+            return
+        for idx, code in enumerate(self.cells):
+            if code:
+                faculty = self.faculty_of[code]
+                if faculty:
+                    occupancy.remove(faculty, idx // num_periods + 1, idx % num_periods + 1)
+        self.occupancy = None
+
+    def state_key(self) -> bytes:
+        return self.cells.tobytes()
+
+    def to_dict(self) -> Dict[int, Dict[int, Optional[str]]]:
+        names = self.subjects.names
+        return {day: {period: names[self.cells[(day - 1) * num_periods + period - 1]]
+                      for period in range(1, num_periods + 1)}
+                for day in range(1, num_days + 1)}
 
 # ==================== HELPERS ====================
-def create_empty_timetable():
-    tt = {}
-    for day in range(1, num_days + 1):
-        tt[day] = {}
-        for period in range(1, num_periods + 1):
-            tt[day][period] = None
-    return tt
+def create_empty_timetable(ctx: SolverContext, section: str) -> TimetableGrid:
+    """Empty grid for `section`, attached to the context's faculty occupancy index."""
+    return TimetableGrid(ctx.subject_table, occupancy=ctx.occupancy, faculty_of=ctx.faculty_codes(section))
 
-def recount_subjects(section: str, timetable: Dict[int, Dict[int, Optional[str]]]) -> Dict[str, int]:
-    counters = {subj: 0 for subj in subjects_per_section[section]}
-    for day in range(1, num_days + 1):
-        for period in range(1, num_periods + 1):
-            subj = timetable[day][period]
-            if subj and subj in counters:
-                counters[subj] += 1
-    return counters
+def recount_subjects(ctx: SolverContext, section: str, timetable: TimetableGrid) -> Dict[str, int]:
+    return {subj: timetable.count(subj) for subj in ctx.subjects_per_section[section]}
 
-def is_section_complete(section: str, counters: Dict[str, int]) -> bool:
-    for subject, info in subjects_per_section[section].items():
+def is_section_complete(ctx: SolverContext, section: str, counters: Dict[str, int]) -> bool:
+    for subject, info in ctx.subjects_per_section[section].items():
         if counters.get(subject, 0) != info["hours"]:
             return False
     return True
 
-def get_incomplete_subjects(section: str, counters: Dict[str, int]) -> List[Tuple[str, int]]:
+def get_incomplete_subjects(ctx: SolverContext, section: str, counters: Dict[str, int]) -> List[Tuple[str, int]]:
     incomplete = []
-    for subject, info in subjects_per_section[section].items():
+    for subject, info in ctx.subjects_per_section[section].items():
         have = counters.get(subject, 0)
         if have < info["hours"]:
             incomplete.append((subject, info["hours"] - have))
     return incomplete
 
-def get_timetable_state_hash(timetable: Dict[int, Dict[int, Optional[str]]]) -> str:
-    state = []
-    for d in range(1, num_days+1):
-        for p in range(1, num_periods+1):
-            state.append(timetable[d][p] or "EMPTY")
-    return "|".join(state)
+def get_timetable_state_hash(timetable: TimetableGrid) -> bytes:
+    return timetable.state_key()
 
-def print_timetable(section: str, timetable: Dict[int, Dict[int, Optional[str]]], counters: Dict[str, int]):
+def print_timetable(ctx: SolverContext, section: str, timetable: TimetableGrid, counters: Dict[str, int]):
     print(f"\n{'='*130}")
     print(f"SECTION {section} TIMETABLE".center(130))
     print(f"{'='*130}")
     print(f"{'Day':<12}", end="")
     
     # Calculate which display slots are breaks
-    first_break_slot = break_periods['first'] + 1  # +1 for the break itself
-    lunch_break_slot = break_periods['lunch'] + 2  # +2 for both breaks before lunch
+    first_break_slot = ctx.break_periods['first'] + 1  # +1 for the break itself
+    lunch_break_slot = ctx.break_periods['lunch'] + 2  # +2 for both breaks before lunch
     
-    for slot in range(1, num_display_slots + 1):
+    for slot in range(1, ctx.num_display_slots + 1):
         if slot == first_break_slot or slot == lunch_break_slot:
             print(f"{'BREAK':<14}", end="")
         else:
@@ -220,7 +660,7 @@ def print_timetable(section: str, timetable: Dict[int, Dict[int, Optional[str]]]
         day_name = days[d]
         print(f"{day_name:<12}", end="")
 
-        for slot in range(1, num_display_slots + 1):
+        for slot in range(1, ctx.num_display_slots + 1):
             if slot == first_break_slot or slot == lunch_break_slot:
                 print(f"{'BREAK':<14}", end="")
             else:
@@ -232,9 +672,9 @@ def print_timetable(section: str, timetable: Dict[int, Dict[int, Optional[str]]]
                 else:
                     p = slot - 2
 
-                s = timetable[d][p]
+                s = timetable.get(d, p)
                 if s:
-                    f = get_faculty_for_subject(section, s)
+                    f = get_faculty_for_subject(ctx, section, s)
                     display = f"{s}({f})"
                     print(f"{display:<14}", end="")
                 else:
@@ -244,43 +684,29 @@ def print_timetable(section: str, timetable: Dict[int, Dict[int, Optional[str]]]
     print("-"*130)
     print(f"\nSubject Usage for Section {section}:")
     for subject, count in sorted(counters.items()):
-        max_hours = subjects_per_section[section][subject]["hours"]
+        max_hours = ctx.subjects_per_section[section][subject]["hours"]
         status = "✓" if count == max_hours else "✗"
         print(f"  {status} {subject}: {count}/{max_hours}", end="  ")
     print("\n")
 
-def get_faculty_schedule(all_timetables: Dict[str, Dict[int, Dict[int, Optional[str]]]]) -> Dict[Tuple[str, int, int], str]:
-    schedule = {}
-    for section, tt in all_timetables.items():
-        for d in range(1, num_days+1):
-            for p in range(1, num_periods+1):
-                subj = tt[d][p]
-                if subj:
-                    fac = get_faculty_for_subject(section, subj)
-                    if fac:
-                        schedule[(section, d, p)] = fac
-    return schedule
-
-def verify_lab_integrity(section: str, timetable: Dict[int, Dict[int, Optional[str]]]) -> bool:
-    for subject, info in subjects_per_section[section].items():
+def verify_lab_integrity(ctx: SolverContext, section: str, timetable: TimetableGrid) -> bool:
+    for subject, info in ctx.subjects_per_section[section].items():
         if not info["lab"]:
             continue
-        positions = []
-        for d in range(1, num_days+1):
-            for p in range(1, num_periods+1):
-                if timetable[d][p] == subject:
-                    positions.append((d, p))
+        positions = timetable.positions(subject)
         
         expected_hours = info["hours"]
         
         # Labs MUST have even hours only (enforced by UI dropdown)
         if expected_hours % 2 != 0:
-            print(f"    ✗ LAB ERROR: {subject} has odd hours ({expected_hours}) - labs must have even hours only")
+            if ctx.debug:
+                solver_debug(ctx, f"✗ LAB ERROR: {subject} has odd hours ({expected_hours}) - labs must have even hours only")
             return False
         
         # Number of positions must match hours
         if len(positions) != expected_hours:
-            print(f"    ✗ LAB ERROR: {subject} has {len(positions)} periods but needs {expected_hours}")
+            if ctx.debug:
+                solver_debug(ctx, f"✗ LAB ERROR: {subject} has {len(positions)} periods but needs {expected_hours}")
             return False
         
         # All lab periods must be in consecutive pairs
@@ -291,68 +717,72 @@ def verify_lab_integrity(section: str, timetable: Dict[int, Dict[int, Optional[s
         while i < len(positions):
             if i+1 >= len(positions):
                 # Odd number of positions means incomplete pairing
-                print(f"    ✗ LAB ERROR: {subject} has incomplete pairing (odd count) in section {section}")
+                if ctx.debug:
+                    solver_debug(ctx, f"✗ LAB ERROR: {subject} has incomplete pairing (odd count) in section {section}")
                 return False
             
             d1, p1 = positions[i]
             d2, p2 = positions[i+1]
             
             if d1 != d2 or p2 != p1 + 1:
-                print(f"    ✗ LAB ERROR: {subject} not consecutive at {days[d1]} P{p1}")
+                if ctx.debug:
+                    solver_debug(ctx, f"✗ LAB ERROR: {subject} not consecutive at {days[d1]} P{p1}")
                 return False
             
             # Check if lab crosses break (cannot start at first_break_period or lunch_break_period)
-            if p1 == get_first_break_period() or p1 == get_lunch_break_period():
-                print(f"    ✗ LAB ERROR: {subject} crosses break at {days[d1]} P{p1}-P{p2}")
+            if p1 == get_first_break_period(ctx) or p1 == get_lunch_break_period(ctx):
+                if ctx.debug:
+                    solver_debug(ctx, f"✗ LAB ERROR: {subject} crosses break at {days[d1]} P{p1}-P{p2}")
                 return False
             
             pairs_found += 1
             i += 2
         
         if pairs_found != pairs_needed:
-            print(f"    ✗ LAB ERROR: {subject} has {pairs_found} pairs but needs {pairs_needed}")
+            if ctx.debug:
+                solver_debug(ctx, f"✗ LAB ERROR: {subject} has {pairs_found} pairs but needs {pairs_needed}")
             return False
     
     return True
 
 # ==================== CONSTRAINT CHECKS ====================
-def check_last_subject_overlap(section: str, subject: str, day: int, period: int,
-                               all_timetables: Dict[str, Dict[int, Dict[int, Optional[str]]]]) -> bool:
-    if subject not in subjects_per_section[section]:
+def check_last_subject_overlap(ctx: SolverContext, section: str, subject: str, day: int, period: int,
+                               all_timetables: Dict[str, TimetableGrid]) -> bool:
+    if subject not in ctx.subjects_per_section[section]:
         return False
-    if not subjects_per_section[section][subject].get("last", False):
+    if not ctx.subjects_per_section[section][subject].get("last", False):
         return False
 
     # Special handling for MC1 and MC2 - they must NEVER overlap regardless of faculty
     if subject in ["MC1", "MC2"]:
-        for other_section in sections:
+        for other_section in ctx.mc_peers(section):
             if other_section not in all_timetables:
                 continue
             # Check P6 and P7 on the same day
             for chk_p in [6, 7]:
-                other_subj = all_timetables[other_section][day][chk_p]
+                other_subj = all_timetables[other_section].get(day, chk_p)
                 if other_subj in ["MC1", "MC2"]:
-                    print(f"      ✗ MC OVERLAP: {subject} in {section} cannot be placed - {other_subj} already in {other_section} on {days[day]} P{chk_p}")
+                    if ctx.debug:
+                        solver_debug(ctx, f"✗ MC OVERLAP: {subject} in {section} cannot be placed - {other_subj} already in {other_section} on {days[day]} P{chk_p}")
                     return True
         return False
 
     # For other last=True subjects, check faculty conflicts
-    faculty = get_faculty_for_subject(section, subject)
+    faculty = get_faculty_for_subject(ctx, section, subject)
     if not faculty:
         return False
-    for other_section in sections:
+    for other_section in ctx.sections:
         if other_section not in all_timetables:
             continue
         for chk_p in [6,7]:
-            other_subj = all_timetables[other_section][day][chk_p]
-            if other_subj and other_subj in subjects_per_section[other_section] and subjects_per_section[other_section][other_subj].get("last", False):
-                other_fac = get_faculty_for_subject(other_section, other_subj)
+            other_subj = all_timetables[other_section].get(day, chk_p)
+            if other_subj and other_subj in ctx.subjects_per_section[other_section] and ctx.subjects_per_section[other_section][other_subj].get("last", False):
+                other_fac = get_faculty_for_subject(ctx, other_section, other_subj)
                 if other_fac == faculty:
                     return True
     return False
 
-def check_faculty_conflict(faculty: str, section: str, day: int, period: int,
-                          faculty_schedule: Dict[Tuple[str, int, int], str]) -> bool:
+def check_faculty_conflict(ctx: SolverContext, faculty: str, day: int, period: int) -> bool:
     """Check if faculty has conflicts (already teaching at same time or adjacent time in any section).
     
     Prevents faculty from:
@@ -363,29 +793,15 @@ def check_faculty_conflict(faculty: str, section: str, day: int, period: int,
     if not faculty:
         return False
     
-    # Check all sections for conflicts
-    for other_section in sections:
-        # Conflict 1: Faculty already teaching at this exact period in any section
-        if (other_section, day, period) in faculty_schedule and faculty_schedule[(other_section, day, period)] == faculty:
-            return True
-        
-        # Conflict 2: Faculty teaching in adjacent periods (overload prevention)
-        # Faculty cannot teach in consecutive periods to avoid exhaustion
-        if period < num_periods and (other_section, day, period + 1) in faculty_schedule and faculty_schedule[(other_section, day, period + 1)] == faculty:
-            return True  # Faculty already at period+1
-        if period > 1 and (other_section, day, period - 1) in faculty_schedule and faculty_schedule[(other_section, day, period - 1)] == faculty:
-            return True  # Faculty already at period-1
-    
-    return False
+    ctx.stats.count("faculty_checks")
+    # One bitmask test against the faculty's occupancy for this day covers all three rules
+    return ctx.occupancy.conflicts(faculty, day, period)
 
-def subject_already_on_day(timetable: Dict[int, Dict[int, Optional[str]]], subject: str, day: int) -> bool:
+def subject_already_on_day(timetable: TimetableGrid, subject: str, day: int) -> bool:
     """Check if a non-lab subject is already placed on a given day"""
-    for period in range(1, num_periods + 1):
-        if timetable[day][period] == subject:
-            return True
-    return False
+    return timetable.on_day(subject, day)
 
-def check_consecutive_constraint(timetable: Dict[int, Dict[int, Optional[str]]], subject: str,
+def check_consecutive_constraint(timetable: TimetableGrid, subject: str,
                                  day: int, period: int, is_lab: bool) -> bool:
     """
     STRICT: Non-lab subjects can NEVER be consecutive on the same day.
@@ -399,16 +815,16 @@ def check_consecutive_constraint(timetable: Dict[int, Dict[int, Optional[str]]],
     # This prevents multiple occurrences even at break boundaries
     
     # Check previous period
-    if period > 1 and timetable[day][period-1] == subject:
+    if period > 1 and timetable.get(day, period-1) == subject:
         return False  # BLOCKED: cannot be consecutive with same subject
 
     # Check next period
-    if period < num_periods and timetable[day][period+1] == subject:
+    if period < num_periods and timetable.get(day, period+1) == subject:
         return False  # BLOCKED: cannot be consecutive with same subject
 
     return True
 
-def can_place_lab(timetable: Dict[int, Dict[int, Optional[str]]], subject: str, section: str,
+def can_place_lab(ctx: SolverContext, timetable: TimetableGrid, subject: str, section: str,
                   day: int, period: int, slots_needed: int) -> bool:
     """
     Lab placement rules with break awareness:
@@ -418,14 +834,14 @@ def can_place_lab(timetable: Dict[int, Dict[int, Optional[str]]], subject: str,
     - MC1 and MC2 are enforced to P6-P7 only
     - Labs cannot be placed at P7 (only 1 slot available)
     """
-    if subject not in subjects_per_section[section]:
+    if subject not in ctx.subjects_per_section[section]:
         return False
     
     # Labs cannot be placed at P7 (need 2 consecutive periods)
     if period == 7:
         return False
     
-    info = subjects_per_section[section][subject]
+    info = ctx.subjects_per_section[section][subject]
 
     # MC1 and MC2 MUST be at P6-P7 (strictly enforced)
     if subject in ["MC1", "MC2"]:
@@ -439,7 +855,7 @@ def can_place_lab(timetable: Dict[int, Dict[int, Optional[str]]], subject: str,
 
     # Labs cannot start at periods where breaks occur (would cross into break)
     # If break is after period X, lab cannot start at period X
-    if period == get_first_break_period() or period == get_lunch_break_period():
+    if period == get_first_break_period(ctx) or period == get_lunch_break_period(ctx):
         return False
 
     # Valid lab starting periods depend on break configuration
@@ -447,7 +863,7 @@ def can_place_lab(timetable: Dict[int, Dict[int, Optional[str]]], subject: str,
     # We need to calculate based on actual break positions
     valid_lab_starts = []
     for p in range(1, num_periods):
-        if p != get_first_break_period() and p != get_lunch_break_period():
+        if p != get_first_break_period(ctx) and p != get_lunch_break_period(ctx):
             valid_lab_starts.append(p)
     
     if period not in valid_lab_starts:
@@ -459,13 +875,13 @@ def can_place_lab(timetable: Dict[int, Dict[int, Optional[str]]], subject: str,
 
     # Check if cells are empty
     for i in range(slots_needed):
-        cell = timetable[day][period + i]
+        cell = timetable.get(day, period + i)
         if cell is not None:
             return False
 
     return True
 
-def get_preferred_lab_periods() -> List[int]:
+def get_preferred_lab_periods(ctx: SolverContext) -> List[int]:
     """Return lab starting periods in priority order: preferred first, fallback last.
     Labs are 2-period consecutive blocks. They should NOT cross break boundaries.
     
@@ -484,8 +900,8 @@ def get_preferred_lab_periods() -> List[int]:
     - Lab P5-P6: OK
     - Lab P6-P7: OK"""
     
-    first_break = get_first_break_period()
-    lunch_break = get_lunch_break_period()
+    first_break = get_first_break_period(ctx)
+    lunch_break = get_lunch_break_period(ctx)
     
     valid_periods = []
     for p in range(1, num_periods):  # p can be 1-6 (need p+1 to exist)
@@ -510,104 +926,406 @@ def get_preferred_lab_periods() -> List[int]:
     
     return preferred + fallback
 
+# ==================== DOMAINS & FEASIBILITY ====================
+class SubjectDomain:
+    """Where one subject of a section may go before anything is placed.
+
+    `by_day` maps day -> allowed periods (non-labs) or allowed block starts
+    (labs), after breaks, forbidden cells and other subjects' strict cells.
+    Faculty calendars and MC1/MC2 exclusivity change while solving, so they
+    are checked on top of this (see remaining_slack / find_infeasibilities).
+    """
+
+    __slots__ = ("subject", "lab", "hours", "by_day")
+
+    def __init__(self, subject: str, info: dict, by_day: Dict[int, Tuple[int, ...]]):
+        self.subject = subject
+        self.lab = info["lab"]
+        self.hours = info["hours"]
+        self.by_day = by_day
+
+    @property
+    def units_needed(self) -> int:
+        """Periods (non-labs, at most one per day) or 2-period blocks (labs) to place."""
+        return self.hours // 2 if self.lab else self.hours
+
+    @property
+    def size(self) -> int:
+        """Most units the domain can hold: allowed days for non-labs, block starts for labs."""
+        if self.lab:
+            return sum(len(starts) for starts in self.by_day.values())
+        return len(self.by_day)
+
+    @property
+    def slack(self) -> int:
+        return self.size - self.units_needed
+
+
+def compute_domains(ctx: SolverContext, section: str) -> Dict[str, SubjectDomain]:
+    """Build the SubjectDomain of every subject of `section`."""
+    constraints = ctx.constraints_for(section)
+    domains = {}
+    for subject, info in ctx.subjects_per_section.get(section, {}).items():
+        blocked = constraints.locked_cells - set(constraints.strict.get(subject, ()))
+        forbidden = constraints.forbidden.get(subject, frozenset())
+        by_day = {}
+        for day in range(1, num_days + 1):
+            if info["lab"]:
+                starts = tuple(p for p in range(1, num_periods)
+                               if lab_can_start(ctx, subject, info, p)
+                               and not {(day, p), (day, p + 1)} & (blocked | forbidden))
+            else:
+                starts = tuple(p for p in range(1, num_periods + 1)
+                               if (day, p) not in blocked and (day, p) not in forbidden)
+            if starts:
+                by_day[day] = starts
+        domains[subject] = SubjectDomain(subject, info, by_day)
+    return domains
+
+
+def remaining_slack(ctx: SolverContext, timetable: TimetableGrid, domain: SubjectDomain,
+                    faculty: Optional[str], remaining: int, day: int, period: int) -> int:
+    """Units `domain`'s subject can still get from (day, period) on, minus the units it still needs.
+
+    Used by insertion to place the most constrained subject first; a negative
+    value means the subject can no longer be completed by the forward walk.
+    """
+    needed = (remaining + 1) // 2 if domain.lab else remaining
+    available = 0
+    for d, periods in domain.by_day.items():
+        if d < day or (not domain.lab and timetable.on_day(domain.subject, d)):
+            continue
+        for p in periods:
+            if d == day and p < period:
+                continue
+            cells = ((d, p), (d, p + 1)) if domain.lab else ((d, p),)
+            if any(timetable.get(*cell) is not None for cell in cells):
+                continue
+            if faculty and any(ctx.occupancy.conflicts(faculty, *cell) for cell in cells):
+                continue
+            available += 1
+            if not domain.lab:
+                break
+    return available - needed
+
+
+def infeasibility(check: str, message: str, **where) -> Dict[str, object]:
+    """One find_infeasibilities report: the check that failed, a readable message and where it applies."""
+    return dict(check=check, message=message, **where)
+
+
+def unassignable_subjects(ctx: SolverContext, section: str) -> Tuple[int, List[str]]:
+    """Match a section's hours to its cells; return (hours left over, subjects that cannot all fit).
+
+    A max-flow over source -> subject -> (subject, day) -> cell -> sink, where
+    a non-lab subject gets at most one period per day and every cell holds one
+    period. It relaxes the lab rules (blocks only need their cells to be in the
+    domain), so leftover hours prove the section cannot be completed. The
+    subjects returned form the set whose hours exceed the cells they share.
+    """
+    domains = ctx.domains_for(section)
+    capacity: Dict[tuple, Dict[tuple, int]] = {}
+
+    def edge(u, v, cap):
+        capacity.setdefault(u, {})[v] = capacity.get(u, {}).get(v, 0) + cap
+        capacity.setdefault(v, {}).setdefault(u, 0)
+
+    source, sink = ("source",), ("sink",)
+    needed = 0
+    for subject, domain in domains.items():
+        if subject == "REMEDIAL":  # optional filler, not demand
+            continue
+        needed += domain.hours
+        edge(source, ("subject", subject), domain.hours)
+        for day, periods in domain.by_day.items():
+            cells = {(day, p + offset) for p in periods for offset in ((0, 1) if domain.lab else (0,))}
+            edge(("subject", subject), ("day", subject, day), len(cells) if domain.lab else 1)
+            for cell in cells:
+                edge(("day", subject, day), ("cell",) + cell, 1)
+    for day in range(1, num_days + 1):
+        for period in range(1, num_periods + 1):
+            edge(("cell", day, period), sink, 1)
+
+    def reachable_from_source():
+        parent = {source: None}
+        queue = [source]
+        for node in queue:
+            for nxt, cap in capacity[node].items():
+                if cap > 0 and nxt not in parent:
+                    parent[nxt] = node
+                    queue.append(nxt)
+        return parent
+
+    flow = 0
+    while True:
+        parent = reachable_from_source()
+        if sink not in parent:
+            break
+        path = []
+        node = sink
+        while parent[node] is not None:
+            path.append((parent[node], node))
+            node = parent[node]
+        push = min(capacity[u][v] for u, v in path)
+        for u, v in path:
+            capacity[u][v] -= push
+            capacity[v][u] += push
+        flow += push
+
+    # Subjects still reachable from the source after max-flow are the ones that cannot all be placed
+    stuck = sorted(node[1] for node in reachable_from_source() if node[0] == "subject")
+    return needed - flow, stuck
+
+
+def find_infeasibilities(ctx: SolverContext) -> List[Dict[str, object]]:
+    """Reasons the inputs admit no complete timetable, found without searching.
+
+    Each report is a dict with `check`, `message` and the section / subject /
+    faculty / day / period it concerns. Every check is a necessary condition
+    of the solver's rules, so an empty list does not prove a timetable
+    exists, but a non-empty one proves it does not.
+    """
+    problems = []
+    week = num_days * num_periods
+    mc_blocks: Dict[Optional[str], int] = {}  # department (section group) -> MC1/MC2 blocks
+    faculty_load: Dict[str, List[int]] = {faculty: [len(periods), False] for faculty, periods in ctx.busy_faculty.items()}
+    strict_cells: Dict[Tuple[str, int], List[Tuple[int, str, str]]] = {}  # (faculty, day) -> [(period, section, subject)]
+
+    for section in ctx.sections:
+        subjects = ctx.subjects_per_section.get(section, {})
+        found = len(problems)
+        # REMEDIAL is filler for whatever cells stay free, so it never counts towards the week
+        total = sum(info["hours"] for subject, info in subjects.items() if subject != "REMEDIAL")
+        if total > week:
+            problems.append(infeasibility("section_hours", f"Section {section} needs {total} periods but the week has only {week}",
+                                          section=section))
+
+        domains = ctx.domains_for(section)
+        strict = ctx.constraints_for(section).strict
+        for subject, info in subjects.items():
+            if subject == "REMEDIAL":
+                continue
+            domain = domains[subject]
+            if info["lab"] and info["hours"] % 2:
+                problems.append(infeasibility("odd_lab_hours", f"{section}/{subject}: lab hours ({info['hours']}) must be even, labs are 2-period blocks",
+                                              section=section, subject=subject))
+            elif domain.slack < 0:
+                if info["lab"]:
+                    message = (f"{section}/{subject}: needs {domain.units_needed} lab block(s) but only "
+                               f"{domain.size} valid block start(s) remain after breaks, forbidden and strict cells")
+                else:
+                    message = (f"{section}/{subject}: needs {info['hours']} periods on different days but only "
+                               f"{domain.size} day(s) have an allowed period")
+                problems.append(infeasibility("subject_domain", message, section=section, subject=subject))
+            if subject in ["MC1", "MC2"]:
+                group = ctx.section_groups.get(section)
+                mc_blocks[group] = mc_blocks.get(group, 0) + info["hours"] // 2
+
+            faculty = get_faculty_for_subject(ctx, section, subject)
+            if not faculty:
+                continue
+            load = faculty_load.setdefault(faculty, [0, False])
+            load[0] += info["hours"]
+            load[1] = load[1] or info["lab"]
+            for (day, period) in strict.get(subject, ()):
+                for offset in range(2 if info["lab"] else 1):
+                    strict_cells.setdefault((faculty, day), []).append((period + offset, section, subject))
+
+        # Subjects competing for the same few cells (only worth reporting if nothing simpler explains it)
+        if len(problems) == found:
+            missing, stuck = unassignable_subjects(ctx, section)
+            if missing:
+                problems.append(infeasibility("cell_matching", f"Section {section}: {missing} period(s) of {', '.join(stuck)} "
+                                                               f"cannot be given cells; together they need more than their allowed cells",
+                                              section=section, subjects=stuck))
+
+    # MC1/MC2 run at P6-P7 and never overlap across sections: one block per day at most
+    mc_days = num_days if lab_can_start(ctx, "MC1", {"last": True}, 6) else 0
+    for group, blocks in mc_blocks.items():
+        if blocks > mc_days:
+            where = f" in {group}" if group is not None else ""
+            problems.append(infeasibility("mc_exclusivity", f"MC1/MC2 need {blocks} block(s) across sections{where} but cannot overlap, "
+                                                            f"and only {mc_days} day(s) have a P6-P7 slot"))
+
+    # A faculty never teaches back-to-back (except inside their own lab block), which caps a day's periods
+    for faculty, (hours, teaches_lab) in faculty_load.items():
+        per_day = num_periods - num_periods // 3 if teaches_lab else (num_periods + 1) // 2
+        if hours > per_day * num_days:
+            problems.append(infeasibility("faculty_load", f"Faculty {faculty} has {hours} periods but can take at most "
+                                                          f"{per_day * num_days} a week without back-to-back classes",
+                                          faculty=faculty))
+
+    for (faculty, day), cells in strict_cells.items():
+        cells.sort()
+        for (p1, section1, subject1), (p2, section2, subject2) in zip(cells, cells[1:]):
+            if p2 - p1 <= 1 and (section1, subject1) != (section2, subject2):
+                problems.append(infeasibility("strict_faculty_clash", f"Strict placements {section1}/{subject1} and {section2}/{subject2} "
+                                                                      f"give faculty {faculty} back-to-back classes on {days[day]} P{p1}/P{p2}",
+                                              faculty=faculty, day=day, period=p1))
+    return problems
+
+
+@timed_phase("feasibility_check")
+def check_feasibility(ctx: SolverContext):
+    """Raise TimetableInfeasibleError if find_infeasibilities proves there is no timetable."""
+    problems = find_infeasibilities(ctx)
+    if problems:
+        raise TimetableInfeasibleError("; ".join(problem["message"] for problem in problems), problems)
+
 # ==================== INSERTION ALGORITHM ====================
-def insertion_algorithm(section: str, all_timetables: Dict[str, Dict[int, Dict[int, Optional[str]]]]) -> Tuple[Dict[int, Dict[int, Optional[str]]], Dict[str, int]]:
-    print(f"\n  → INSERTION for Section {section}")
-    timetable = create_empty_timetable()
-    counters = {subj: 0 for subj in subjects_per_section[section]}
-    faculty_schedule = get_faculty_schedule(all_timetables)
+def place_labs_first(ctx: SolverContext, section: str, timetable: TimetableGrid, counters: Dict[str, int],
+                     all_timetables: Dict[str, TimetableGrid]):
+    """Place the section's lab blocks, most constrained lab first, one block per day where possible."""
+    subjects = ctx.subjects_per_section[section]
+    domains = ctx.domains_for(section)
+    labs = {}
+    for subject, info in subjects.items():
+        if info["lab"] and info["hours"] - counters[subject] >= 2:
+            faculty = get_faculty_for_subject(ctx, section, subject)
+            labs[subject] = (faculty, remaining_slack(ctx, timetable, domains[subject], faculty,
+                                                      info["hours"] - counters[subject], 1, 1))
+    order = list(labs)
+    ctx.rng.shuffle(order)
+    order.sort(key=lambda s: labs[s][1])
+
+    for subject in order:
+        info = subjects[subject]
+        faculty = labs[subject][0]
+        starts = [(day, period) for day, periods in domains[subject].by_day.items() for period in periods]
+        ctx.rng.shuffle(starts)
+        for (day, period) in starts:
+            if info["hours"] - counters[subject] < 2:
+                break
+            if timetable.on_day(subject, day):
+                continue
+            if not can_place_lab(ctx, timetable, subject, section, day, period, 2):
+                continue
+            if (info.get("last", False) or subject in ["MC1", "MC2"]) and \
+                    check_last_subject_overlap(ctx, section, subject, day, period, all_timetables):
+                continue
+            if any(check_faculty_conflict(ctx, faculty, day, period + i) for i in range(2)):
+                continue
+            for i in range(2):
+                timetable.set(day, period + i, subject)
+            counters[subject] += 2
+            if ctx.debug:
+                solver_debug(ctx, f"✓ Placed lab {subject} at {days[day]} P{period}-P{period+1} (slack {labs[subject][1]})")
+
+@timed_phase("insertion")
+def insertion_algorithm(ctx: SolverContext, section: str, all_timetables: Dict[str, TimetableGrid]) -> Tuple[TimetableGrid, Dict[str, int]]:
+    if ctx.debug:
+        solver_debug(ctx, f"→ INSERTION for Section {section}")
+    timetable = create_empty_timetable(ctx, section)
+    counters = {subj: 0 for subj in ctx.subjects_per_section[section]}
 
     # Handle strict placements first
-    strict_dict = convert_placements(strict_subject_placement, section)
+    constraints = ctx.constraints_for(section)
+    strict_dict = constraints.strict
     for subject, placements in strict_dict.items():
-        if subject not in subjects_per_section[section]:
+        if subject not in ctx.subjects_per_section[section]:
             continue
-        info = subjects_per_section[section][subject]
+        info = ctx.subjects_per_section[section][subject]
         is_lab = info["lab"]
-        faculty = get_faculty_for_subject(section, subject)
+        faculty = get_faculty_for_subject(ctx, section, subject)
         for (day, period) in placements:
             slots_needed = 2 if is_lab else 1
             
             # Check faculty conflict BEFORE placing any subject (strict or not)
             has_conflict = False
             for slot_offset in range(slots_needed):
-                if check_faculty_conflict(faculty, section, day, period + slot_offset, faculty_schedule):
+                if check_faculty_conflict(ctx, faculty, day, period + slot_offset):
                     has_conflict = True
                     break
             
             if has_conflict:
-                print(f"    ✗ Could not place strict {subject} at {days[day]} P{period} - faculty conflict")
+                if ctx.debug:
+                    solver_debug(ctx, f"✗ Could not place strict {subject} at {days[day]} P{period} - faculty conflict")
                 continue
             
-            if is_lab and not can_place_lab(timetable, subject, section, day, period, slots_needed):
-                print(f"    ✗ Could not place strict lab {subject} at {days[day]} P{period}")
+            if is_lab and not can_place_lab(ctx, timetable, subject, section, day, period, slots_needed):
+                if ctx.debug:
+                    solver_debug(ctx, f"✗ Could not place strict lab {subject} at {days[day]} P{period}")
                 continue
-            if info.get("last", False) and check_last_subject_overlap(section, subject, day, period, all_timetables):
-                print(f"    ✗ Cannot place strict {subject} - last=True overlap")
+            if info.get("last", False) and check_last_subject_overlap(ctx, section, subject, day, period, all_timetables):
+                if ctx.debug:
+                    solver_debug(ctx, f"✗ Cannot place strict {subject} - last=True overlap")
                 continue
 
             # For non-lab strict placements, check consecutive constraint BEFORE placing
             if not is_lab:
                 # Check if cell is already occupied
-                if timetable[day][period] is not None:
-                    print(f"    ✗ Could not place strict {subject} at {days[day]} P{period} - cell occupied")
+                if timetable.get(day, period) is not None:
+                    if ctx.debug:
+                        solver_debug(ctx, f"✗ Could not place strict {subject} at {days[day]} P{period} - cell occupied")
                     continue
 
                 # Temporarily place to check constraint
-                timetable[day][period] = subject
+                timetable.set(day, period, subject)
                 
                 if not check_consecutive_constraint(timetable, subject, day, period, is_lab):
-                    print(f"    ✗ Could not place strict {subject} at {days[day]} P{period} - violates consecutive constraint")
+                    if ctx.debug:
+                        solver_debug(ctx, f"✗ Could not place strict {subject} at {days[day]} P{period} - violates consecutive constraint")
                     # Rollback
-                    timetable[day][period] = None
+                    timetable.set(day, period, None)
                     continue
 
-                # If valid, update counters and faculty schedule
+                # If valid, update counters (the grid keeps the faculty occupancy in sync)
                 counters[subject] += 1
-                faculty_schedule[(section, day, period)] = faculty
-                print(f"    ✓ Placed strict {subject} at {days[day]} P{period}")
+                if ctx.debug:
+                    solver_debug(ctx, f"✓ Placed strict {subject} at {days[day]} P{period}")
             else:
                 # Labs - check MC1/MC2 overlap if applicable
                 if subject in ["MC1", "MC2"]:
-                    if check_last_subject_overlap(section, subject, day, period, all_timetables):
-                        print(f"    ✗ Could not place strict {subject} at {days[day]} P{period} - MC overlap")
+                    if check_last_subject_overlap(ctx, section, subject, day, period, all_timetables):
+                        if ctx.debug:
+                            solver_debug(ctx, f"✗ Could not place strict {subject} at {days[day]} P{period} - MC overlap")
                         continue
 
                 # Place the lab
                 for i in range(slots_needed):
-                    timetable[day][period + i] = subject
-                    faculty_schedule[(section, day, period + i)] = faculty
+                    timetable.set(day, period + i, subject)
                 counters[subject] += slots_needed  # Increment by number of hours/periods
-                print(f"    ✓ Placed strict lab {subject} at {days[day]} P{period}-P{period+1}")
+                if ctx.debug:
+                    solver_debug(ctx, f"✓ Placed strict lab {subject} at {days[day]} P{period}-P{period+1}")
 
-    subjects_to_place = [s for s, info in subjects_per_section[section].items() if s != "REMEDIAL"]
+    subjects_to_place = [s for s, info in ctx.subjects_per_section[section].items() if s != "REMEDIAL"]
+    domains = ctx.domains_for(section)
+    faculty_of = {s: get_faculty_for_subject(ctx, section, s) for s in subjects_to_place}
+
+    # Lab blocks have the fewest legal positions; give them their slots before the walk fills them
+    place_labs_first(ctx, section, timetable, counters, all_timetables)
 
-    # Use priority order for periods: preferred lab periods first, then others
-    lab_priority_periods = get_preferred_lab_periods()
     regular_periods = [p for p in range(1, num_periods+1)]
 
     # Try to place subjects
     for day in range(1, num_days+1):
+        ctx.check_cancelled()
         for period in regular_periods:
-            if timetable[day][period] is not None:
+            if timetable.get(day, period) is not None:
                 continue
 
             # Check if this cell is locked to a strict placement
-            if is_locked_cell(section, day, period):
+            if (day, period) in constraints.locked_cells:
                 continue
 
-            random.shuffle(subjects_to_place)
+            # Most constrained first: the subject with the least room left from this cell on
+            # goes first; shuffling beforehand keeps ties in random order
+            ctx.rng.shuffle(subjects_to_place)
+            pending = {}
             for subject in subjects_to_place:
-                info = subjects_per_section[section][subject]
-                if counters[subject] >= info["hours"]:
-                    continue
-
-                # Check forbidden constraint for this subject
-                if is_locked_cell(section, day, period, subject):
+                remaining = ctx.subjects_per_section[section][subject]["hours"] - counters[subject]
+                if remaining > 0:
+                    pending[subject] = remaining_slack(ctx, timetable, domains[subject], faculty_of[subject],
+                                                       remaining, day, period)
+            for subject in sorted(pending, key=pending.get):
+                info = ctx.subjects_per_section[section][subject]
+
+                # Outside the subject's domain (forbidden, break-crossing lab start, ...)
+                if period not in domains[subject].by_day.get(day, ()):
                     continue
 
                 is_lab = info["lab"]
-                faculty = get_faculty_for_subject(section, subject)
+                faculty = faculty_of[subject]
 
                 if is_lab:
                     # For labs, check if next period would exceed bounds
@@ -618,15 +1336,14 @@ def insertion_algorithm(section: str, all_timetables: Dict[str, Dict[int, Dict[i
                     
                     remaining = info["hours"] - counters[subject]
                     if remaining >= 2:
-                        if can_place_lab(timetable, subject, section, day, period, 2):
+                        if can_place_lab(ctx, timetable, subject, section, day, period, 2):
                             # Check last subject overlap (includes MC1/MC2 overlap check)
                             if info.get("last", False) or subject in ["MC1", "MC2"]:
-                                if check_last_subject_overlap(section, subject, day, period, all_timetables):
+                                if check_last_subject_overlap(ctx, section, subject, day, period, all_timetables):
                                     continue
-                            if not any(check_faculty_conflict(faculty, section, day, period+i, faculty_schedule) for i in range(2)):
+                            if not any(check_faculty_conflict(ctx, faculty, day, period+i) for i in range(2)):
                                 for i in range(2):
-                                    timetable[day][period+i] = subject
-                                    faculty_schedule[(section, day, period+i)] = faculty
+                                    timetable.set(day, period+i, subject)
                                 counters[subject] += 2  # 2-period lab = 2 hours
                                 break
                 else:
@@ -634,62 +1351,143 @@ def insertion_algorithm(section: str, all_timetables: Dict[str, Dict[int, Dict[i
                     if subject_already_on_day(timetable, subject, day):
                         continue
                     
+                    # Faculty conflict - checked before the tentative placement, since
+                    # placing the subject adds its faculty to the occupancy index
+                    if check_faculty_conflict(ctx, faculty, day, period):
+                        continue
+
                     # For non-lab subjects, check consecutive constraint
-                    old_val = timetable[day][period]
-                    timetable[day][period] = subject
+                    old_val = timetable.get(day, period)
+                    timetable.set(day, period, subject)
 
                     if check_consecutive_constraint(timetable, subject, day, period, False):
-                        if not check_faculty_conflict(faculty, section, day, period, faculty_schedule):
-                            # Valid placement - keep it
-                            counters[subject] += 1
-                            faculty_schedule[(section, day, period)] = faculty
-                            break
-                        else:
-                            # Faculty conflict - rollback
-                            timetable[day][period] = old_val
+                        # Valid placement - keep it
+                        counters[subject] += 1
+                        break
                     else:
                         # Consecutive constraint violated - rollback
-                        timetable[day][period] = old_val
+                        timetable.set(day, period, old_val)
 
     # Don't fill with REMEDIAL here - let fix_remedial_at_end handle it
     # That function will reorganize subjects and place REMEDIAL at the end
     return timetable, counters
 
 # ==================== SWAP & SAFE SWAP ====================
-def attempt_random_swap(section: str, timetable: Dict[int, Dict[int, Optional[str]]],
+def unit_has_faculty_conflict(ctx: SolverContext, timetable: TimetableGrid, unit: List[Tuple[int, int]]) -> bool:
+    """Check the cells of one placed unit (a period or a lab pair) for faculty clashes.
+
+    The unit's own cells are taken out of the occupancy index while probing,
+    so a lab pair is not reported as clashing with itself.
+    """
+    faculty = timetable.faculty_at(*unit[0])
+    if not faculty:
+        return False
+    occupancy = timetable.occupancy if timetable.occupancy is not None else ctx.occupancy
+    attached = timetable.occupancy is not None
+    if attached:
+        for (d, p) in unit:
+            occupancy.remove(faculty, d, p)
+    clash = any(occupancy.conflicts(faculty, d, p) for (d, p) in unit)
+    if attached:
+        for (d, p) in unit:
+            occupancy.add(faculty, d, p)
+    return clash
+
+def lab_can_start(ctx: SolverContext, subject: str, info: dict, period: int) -> bool:
+    """Whether a 2-period block of lab `subject` may start at `period` (the rules of can_place_lab)."""
+    if period >= num_periods:
+        return False
+    if (subject in ["MC1", "MC2"] or info.get("last", False)) and period != 6:
+        return False
+    return period != get_first_break_period(ctx) and period != get_lunch_break_period(ctx)
+
+def lab_day_intact(ctx: SolverContext, timetable: TimetableGrid, subject: str, info: dict, day: int) -> bool:
+    """verify_lab_integrity for a single lab on a single day: whole blocks at valid starts."""
+    mask = timetable.day_mask(subject, day)
+    period = 1
+    while mask:
+        if mask & 1:
+            if not mask & 2 or not lab_can_start(ctx, subject, info, period):
+                return False
+            mask >>= 2
+            period += 2
+        else:
+            mask >>= 1
+            period += 1
+    return True
+
+def swapped_unit_is_valid(ctx: SolverContext, section: str, timetable: TimetableGrid,
+                          unit: List[Tuple[int, int]], displaced: Optional[str] = None) -> bool:
+    """Check the constraints touched by the subject that was just moved into `unit`.
+
+    Only that subject's day (lab blocks, once-per-day, no same-subject neighbours)
+    and its faculty's calendar can have changed, so nothing else is re-validated.
+    `displaced` is the subject that sat in `unit` before the move: when it is a
+    lab, its blocks on that day must still be whole (a unit cut out of the middle
+    of a longer lab run would split it).
+    """
+    ctx.stats.count("move_validations")
+    day, period = unit[0]
+    subject = timetable.get(day, period)
+    if displaced and displaced != subject:
+        left = ctx.subjects_per_section[section].get(displaced)
+        if left is not None and left["lab"] and not lab_day_intact(ctx, timetable, displaced, left, day):
+            return False
+    if not subject or subject == "REMEDIAL":
+        return True
+    info = ctx.subjects_per_section[section].get(subject)
+    if info is None:
+        return True
+    if info["lab"]:
+        if not lab_day_intact(ctx, timetable, subject, info, day):
+            return False
+    else:
+        # Non-lab subjects: once per day, which also rules out consecutive periods
+        if timetable.day_mask(subject, day).bit_count() > 1:
+            return False
+    return not unit_has_faculty_conflict(ctx, timetable, unit)
+
+def expand_unit(tt: TimetableGrid, d: int, p: int) -> List[Tuple[int, int]]:
+    """The cell (d, p) plus its neighbour when both hold the same subject (a lab block)."""
+    subj = tt.get(d, p)
+    if not subj:
+        return [(d,p)]
+    if p < num_periods and tt.get(d, p+1) == subj:
+        return [(d,p),(d,p+1)]
+    if p > 1 and tt.get(d, p-1) == subj:
+        return [(d,p-1),(d,p)]
+    return [(d,p)]
+
+@timed_phase("random_swap")
+def attempt_random_swap(ctx: SolverContext, section: str, timetable: TimetableGrid,
                         counters: Dict[str, int],
-                        all_timetables: Dict[str, Dict[int, Dict[int, Optional[str]]]]) -> bool:
-    positions = [(d,p) for d in range(1, num_days+1) for p in range(1, num_periods+1)]
-    locked_cells = get_all_locked_cells(section)
+                        all_timetables: Dict[str, TimetableGrid]) -> bool:
+    """Try random swaps of two equally long units until one keeps the section valid.
+
+    Each candidate is applied to the live grid (a handful of cell writes, which
+    also move the faculties in the occupancy index), checked only where it can
+    have broken something (see swapped_unit_is_valid), and undone if rejected.
+    """
+    constraints = ctx.constraints_for(section)
+    locked_cells = constraints.locked_cells
 
     # Remove locked cells from positions
-    positions = [(d,p) for (d,p) in positions if (d,p) not in locked_cells]
+    positions = [(d,p) for d in range(1, num_days+1) for p in range(1, num_periods+1) if (d,p) not in locked_cells]
 
-    random.shuffle(positions)
+    ctx.rng.shuffle(positions)
     attempts = 0
     max_attempts = 200
 
     while attempts < max_attempts and len(positions) >= 2:
+        ctx.check_cancelled()
         attempts += 1
-        (d1,p1) = positions[random.randrange(len(positions))]
-        (d2,p2) = positions[random.randrange(len(positions))]
+        (d1,p1) = positions[ctx.rng.randrange(len(positions))]
+        (d2,p2) = positions[ctx.rng.randrange(len(positions))]
         if (d1,p1) == (d2,p2):
             continue
 
-        new_timetable = copy.deepcopy(timetable)
-
-        def expand_unit(tt, d, p):
-            subj = tt[d][p]
-            if not subj:
-                return [(d,p)]
-            if p < num_periods and tt[d][p+1] == subj:
-                return [(d,p),(d,p+1)]
-            if p > 1 and tt[d][p-1] == subj:
-                return [(d,p-1),(d,p)]
-            return [(d,p)]
-
-        unit1 = expand_unit(new_timetable, d1, p1)
-        unit2 = expand_unit(new_timetable, d2, p2)
+        unit1 = expand_unit(timetable, d1, p1)
+        unit2 = expand_unit(timetable, d2, p2)
 
         # Check if any cell in units is locked
         if any((d,p) in locked_cells for (d,p) in unit1) or any((d,p) in locked_cells for (d,p) in unit2):
@@ -698,10 +1496,10 @@ def attempt_random_swap(section: str, timetable: Dict[int, Dict[int, Optional[st
         if set(unit1) & set(unit2):
             continue
 
-        vals1 = [new_timetable[d][p] for (d,p) in unit1]
-        vals2 = [new_timetable[d][p] for (d,p) in unit2]
+        vals1 = [timetable.get(d, p) for (d,p) in unit1]
+        vals2 = [timetable.get(d, p) for (d,p) in unit2]
 
-        if len(vals1) != len(vals2):
+        if len(vals1) != len(vals2) or vals1 == vals2:
             continue
 
         # Check forbidden constraints before swapping
@@ -710,158 +1508,136 @@ def attempt_random_swap(section: str, timetable: Dict[int, Dict[int, Optional[st
 
         forbidden_swap = False
         for (d,p) in unit2:
-            if subj1 and is_locked_cell(section, d, p, subj1):
+            if subj1 and constraints.is_forbidden(subj1, d, p):
                 forbidden_swap = True
                 break
         for (d,p) in unit1:
-            if subj2 and is_locked_cell(section, d, p, subj2):
+            if subj2 and constraints.is_forbidden(subj2, d, p):
                 forbidden_swap = True
                 break
 
         if forbidden_swap:
             continue
 
+        ctx.stats.count("swaps_tried")
         for idx, (d,p) in enumerate(unit1):
-            new_timetable[d][p] = vals2[idx]
+            timetable.set(d, p, vals2[idx])
         for idx, (d,p) in enumerate(unit2):
-            new_timetable[d][p] = vals1[idx]
-
-        temp_all = {}
-        for s in all_timetables:
-            if s == section:
-                temp_all[s] = new_timetable
-            else:
-                temp_all[s] = all_timetables[s]
-
-        if not verify_lab_integrity(section, new_timetable):
-            continue
-
-        valid_nonconsec = True
-        for d in range(1, num_days+1):
-            for p in range(1, num_periods+1):
-                subj = new_timetable[d][p]
-                if not subj:
-                    continue
-                info = subjects_per_section[section].get(subj)
-                if info and not info["lab"]:
-                    if not check_consecutive_constraint(new_timetable, subj, d, p, False):
-                        valid_nonconsec = False
-                        break
-            if not valid_nonconsec:
-                break
-        if not valid_nonconsec:
-            continue
+            timetable.set(d, p, vals1[idx])
 
-        faculty_sched_temp = get_faculty_schedule(temp_all)
-        conflict_found = False
-        for d in range(1, num_days+1):
-            for p in range(1, num_periods+1):
-                subj = new_timetable[d][p]
-                if subj:
-                    fac = get_faculty_for_subject(section, subj)
-                    if check_faculty_conflict(fac, section, d, p, faculty_sched_temp):
-                        conflict_found = True
-                        break
-            if conflict_found:
-                break
-        if conflict_found:
-            continue
+        if (swapped_unit_is_valid(ctx, section, timetable, unit1, subj1)
+                and swapped_unit_is_valid(ctx, section, timetable, unit2, subj2)):
+            # A swap moves subjects around but never changes how many hours each has
+            ctx.stats.count("swaps_accepted")
+            return True
 
-        for d in range(1, num_days+1):
-            for p in range(1, num_periods+1):
-                timetable[d][p] = new_timetable[d][p]
-        new_counters = recount_subjects(section, timetable)
-        counters.clear()
-        counters.update(new_counters)
-        return True
+        # Rejected: put both units back
+        for idx, (d,p) in enumerate(unit1):
+            timetable.set(d, p, vals1[idx])
+        for idx, (d,p) in enumerate(unit2):
+            timetable.set(d, p, vals2[idx])
 
     return False
 
 # ==================== PLACEMENT AVOIDING STUCK CELLS ====================
-def place_avoiding_stuck_cells(section: str, timetable: Dict[int, Dict[int, Optional[str]]],
+@timed_phase("placement")
+def place_avoiding_stuck_cells(ctx: SolverContext, section: str, timetable: TimetableGrid,
                                counters: Dict[str, int], subject: str,
                                stuck_cells: Set[Tuple[int, int]],
-                               all_timetables: Dict[str, Dict[int, Dict[int, Optional[str]]]]) -> bool:
-    faculty = get_faculty_for_subject(section, subject)
-    faculty_schedule = get_faculty_schedule(all_timetables)
-    info = subjects_per_section[section][subject]
+                               all_timetables: Dict[str, TimetableGrid]) -> bool:
+    faculty = get_faculty_for_subject(ctx, section, subject)
+    info = ctx.subjects_per_section[section][subject]
     is_lab = info["lab"]
-    locked_cells = get_all_locked_cells(section)
+    constraints = ctx.constraints_for(section)
+    locked_cells = constraints.locked_cells
 
     if is_lab:
         # Try preferred periods first, then fallback
-        lab_periods = get_preferred_lab_periods()
+        lab_periods = get_preferred_lab_periods(ctx)
         for d in range(1, num_days+1):
             for p in lab_periods:
                 if (d,p) in stuck_cells or (d,p) in locked_cells:
                     continue
                 if info["hours"] - counters[subject] < 2:
                     continue
-                if can_place_lab(timetable, subject, section, d, p, 2):
+                if can_place_lab(ctx, timetable, subject, section, d, p, 2):
                     # Check if second cell is also not locked
                     if (d, p+1) in locked_cells:
                         continue
                     # Check MC1/MC2 overlap for these subjects
                     if subject in ["MC1", "MC2"]:
-                        if check_last_subject_overlap(section, subject, d, p, all_timetables):
+                        if check_last_subject_overlap(ctx, section, subject, d, p, all_timetables):
                             continue
                     # Check faculty conflicts
-                    if not any(check_faculty_conflict(faculty, section, d, p+i, faculty_schedule) for i in range(2)):
+                    if not any(check_faculty_conflict(ctx, faculty, d, p+i) for i in range(2)):
                         for i in range(2):
-                            timetable[d][p+i] = subject
+                            timetable.set(d, p+i, subject)
                             counters[subject] += 1
+                        ctx.stats.count("placements_made")
                         return True
     else:
         for d in range(1, num_days+1):
             for p in range(1, num_periods+1):
                 if (d,p) in stuck_cells or (d,p) in locked_cells:
                     continue
-                if is_locked_cell(section, d, p, subject):
+                if constraints.is_forbidden(subject, d, p):
                     continue
                 # For non-lab subjects, can only place once per day
                 if subject_already_on_day(timetable, subject, d):
                     continue
-                if timetable[d][p] is None:
+                if timetable.get(d, p) is None:
+                    # Faculty conflict - checked before the tentative placement below
+                    if check_faculty_conflict(ctx, faculty, d, p):
+                        continue
+
                     # Temporarily place to check consecutive constraint
-                    timetable[d][p] = subject
+                    timetable.set(d, p, subject)
 
                     if check_consecutive_constraint(timetable, subject, d, p, False):
-                        if not check_faculty_conflict(faculty, section, d, p, faculty_schedule):
-                            # Valid placement - keep it
-                            counters[subject] += 1
-                            return True
-                        else:
-                            # Faculty conflict - rollback
-                            timetable[d][p] = None
+                        # Valid placement - keep it
+                        counters[subject] += 1
+                        ctx.stats.count("placements_made")
+                        return True
                     else:
                         # Consecutive constraint violated - rollback
-                        timetable[d][p] = None
+                        timetable.set(d, p, None)
     return False
 
 # ==================== SMART OPTIMIZATION ====================
-def smart_optimize(section: str, timetable: Dict[int, Dict[int, Optional[str]]],
-                   counters: Dict[str, int], all_timetables: Dict[str, Dict[int, Dict[int, Optional[str]]]],
-                   max_iterations: int = 1000) -> Tuple[Dict[int, Dict[int, Optional[str]]], Dict[str, int], bool]:
-    print(f"\n  → SMART OPTIMIZATION for Section {section}")
+@timed_phase("smart_optimize")
+def smart_optimize(ctx: SolverContext, section: str, timetable: TimetableGrid,
+                   counters: Dict[str, int], all_timetables: Dict[str, TimetableGrid],
+                   max_iterations: int = 1000) -> Tuple[TimetableGrid, Dict[str, int], bool]:
+    if ctx.debug:
+        solver_debug(ctx, f"→ SMART OPTIMIZATION for Section {section}")
 
-    seen_states: Set[str] = set()
     stuck_cells: Set[Tuple[int,int]] = set()
     consecutive_same_state = 0
-    last_state_hash = ""
+    last_state_hash = b""
 
     for iteration in range(1, max_iterations+1):
+        ctx.check_cancelled()
+        if ctx.out_of_time():
+            if ctx.debug:
+                solver_debug(ctx, f"⚠ Time budget used up after {iteration - 1} iterations")
+            break
+        ctx.iterations += 1
         if iteration % 100 == 0:
-            print(f"    → Iteration {iteration}/{max_iterations}")
-
-        counters = recount_subjects(section, timetable)
-        if is_section_complete(section, counters):
-            print(f"    ✓ Section {section} is 100% COMPLETE!")
+            if ctx.debug:
+                solver_debug(ctx, f"→ Iteration {iteration}/{max_iterations}")
+            ctx.report_progress(event="iteration", iteration=iteration, max_iterations=max_iterations,
+                                deficit=sum(missing for _, missing in get_incomplete_subjects(ctx, section, counters)))
+
+        counters = recount_subjects(ctx, section, timetable)
+        if is_section_complete(ctx, section, counters):
+            if ctx.debug:
+                solver_debug(ctx, f"✓ Section {section} is 100% COMPLETE!")
             return timetable, counters, True
 
         # ACTIVELY try to place incomplete subjects every iteration
-        incomplete = get_incomplete_subjects(section, counters)
+        incomplete = get_incomplete_subjects(ctx, section, counters)
         for subj, deficit in incomplete:
-            if place_avoiding_stuck_cells(section, timetable, counters, subj, stuck_cells, all_timetables):
+            if place_avoiding_stuck_cells(ctx, section, timetable, counters, subj, stuck_cells, all_timetables):
                 # Successfully placed more - reset loop detection
                 consecutive_same_state = 0
 
@@ -873,15 +1649,16 @@ def smart_optimize(section: str, timetable: Dict[int, Dict[int, Optional[str]]],
             last_state_hash = current_state
 
         if consecutive_same_state >= 10:
-            print(f"    ⚠ Loop detected! Trying recovery strategies...")
-            incomplete = get_incomplete_subjects(section, counters)
+            if ctx.debug:
+                solver_debug(ctx, "⚠ Loop detected! Trying recovery strategies...")
+            incomplete = get_incomplete_subjects(ctx, section, counters)
             if incomplete:
                 subj, deficit = incomplete[0]
-                if place_avoiding_stuck_cells(section, timetable, counters, subj, stuck_cells, all_timetables):
+                if place_avoiding_stuck_cells(ctx, section, timetable, counters, subj, stuck_cells, all_timetables):
                     consecutive_same_state = 0
                     continue
 
-            if attempt_random_swap(section, timetable, counters, all_timetables):
+            if attempt_random_swap(ctx, section, timetable, counters, all_timetables):
                 consecutive_same_state = 0
                 continue
 
@@ -889,57 +1666,60 @@ def smart_optimize(section: str, timetable: Dict[int, Dict[int, Optional[str]]],
                 for p in range(1, num_periods+1):
                     if (d,p) not in stuck_cells:
                         stuck_cells.add((d,p))
-                        print(f"    → Marking stuck cell {days[d]} P{p}")
+                        if ctx.debug:
+                            solver_debug(ctx, f"→ Marking stuck cell {days[d]} P{p}")
                         break
                 if stuck_cells:
                     break
             consecutive_same_state = 0
             continue
 
-        incomplete = get_incomplete_subjects(section, counters)
+        incomplete = get_incomplete_subjects(ctx, section, counters)
         if incomplete:
             for subject, deficit in incomplete:
                 # Try to place this subject as many times as needed (up to deficit)
                 placed = 0
                 for _ in range(deficit):
-                    if place_avoiding_stuck_cells(section, timetable, counters, subject, stuck_cells, all_timetables):
+                    if place_avoiding_stuck_cells(ctx, section, timetable, counters, subject, stuck_cells, all_timetables):
                         placed += 1
                     else:
                         break  # Can't place anymore
 
-    print(f"    ✗ Could not fully optimize after {max_iterations} iterations")
+    if ctx.debug:
+        solver_debug(ctx, f"✗ Could not fully optimize Section {section}")
     # Do final cleanup before returning
-    fix_remedial_at_end(section, timetable)
-    counters = recount_subjects(section, timetable)
+    fix_remedial_at_end(ctx, section, timetable)
+    counters = recount_subjects(ctx, section, timetable)
     return timetable, counters, False
 
-def fix_remedial_at_end(section: str, timetable: Dict[int, Dict[int, Optional[str]]]):
+@timed_phase("fix_remedial")
+def fix_remedial_at_end(ctx: SolverContext, section: str, timetable: TimetableGrid):
     """Final cleanup: 
     1. Remove duplicate non-lab subjects from same day (keep only first occurrence)
     2. Fill empty slots in P5-P7 with REMEDIAL (max 3 total per day, only in last 3 periods)
     3. Never remove already-placed subjects, only fill gaps"""
-    locked_cells = get_all_locked_cells(section)
+    locked_cells = get_all_locked_cells(ctx, section)
 
     for day in range(1, num_days + 1):
         # Pass 1: Remove duplicate non-lab subjects (keep only first occurrence per day)
         seen_nonlab = set()
         
         for period in range(1, num_periods + 1):
-            subject = timetable[day][period]
+            subject = timetable.get(day, period)
             if not subject:
                 continue
             
             # Skip locked subjects
             if (day, period) in locked_cells:
                 # For locked cells, just track if we've seen this subject
-                info = subjects_per_section[section].get(subject, {})
+                info = ctx.subjects_per_section[section].get(subject, {})
                 is_lab = info.get("lab", False)
                 if not is_lab and subject != "REMEDIAL":
                     seen_nonlab.add(subject)
                 continue
             
             # Get subject info
-            info = subjects_per_section[section].get(subject, {})
+            info = ctx.subjects_per_section[section].get(subject, {})
             is_lab = info.get("lab", False)
             
             if is_lab:
@@ -952,7 +1732,7 @@ def fix_remedial_at_end(section: str, timetable: Dict[int, Dict[int, Optional[st
                 # Non-lab subject: only keep first occurrence per day
                 if subject in seen_nonlab:
                     # This is a duplicate - remove it
-                    timetable[day][period] = None
+                    timetable.set(day, period, None)
                 else:
                     seen_nonlab.add(subject)
         
@@ -964,22 +1744,22 @@ def fix_remedial_at_end(section: str, timetable: Dict[int, Dict[int, Optional[st
             if period > num_periods:
                 break
             
-            subject = timetable[day][period]
+            subject = timetable.get(day, period)
             
             # If slot is empty and not locked, try to fill with REMEDIAL
             if subject is None and (day, period) not in locked_cells:
                 if remedial_count < max_remedial:
-                    timetable[day][period] = "REMEDIAL"
+                    timetable.set(day, period, "REMEDIAL")
                     remedial_count += 1
             elif subject == "REMEDIAL":
                 # Count existing REMEDIAL
                 remedial_count += 1
 
 # ==================== FACULTY TIMETABLE GENERATION ====================
-def generate_faculty_timetables(all_timetables: Dict[str, Dict[int, Dict[int, Optional[str]]]]) -> Dict[str, Dict[int, Dict[int, str]]]:
+def generate_faculty_timetables(ctx: SolverContext, all_timetables: Dict[str, TimetableGrid]) -> Dict[str, Dict[int, Dict[int, str]]]:
     faculty_timetables = {}
     all_faculties = set()
-    for v in faculties.values():
+    for v in ctx.faculties.values():
         if isinstance(v, str):
             all_faculties.add(v)
         else:
@@ -990,25 +1770,25 @@ def generate_faculty_timetables(all_timetables: Dict[str, Dict[int, Dict[int, Op
         for section, tt in all_timetables.items():
             for d in range(1, num_days+1):
                 for p in range(1, num_periods+1):
-                    subj = tt[d][p]
+                    subj = tt.get(d, p)
                     if subj:
-                        fac = get_faculty_for_subject(section, subj)
+                        fac = get_faculty_for_subject(ctx, section, subj)
                         if fac == faculty_name:
                             faculty_tt[d][p] = f"{subj}({section})"
         faculty_timetables[faculty_name] = faculty_tt
     return faculty_timetables
 
-def print_faculty_timetable(faculty_name: str, faculty_tt: Dict[int, Dict[int, str]]):
+def print_faculty_timetable(ctx: SolverContext, faculty_name: str, faculty_tt: Dict[int, Dict[int, str]]):
     print(f"\n{'='*130}")
     print(f"FACULTY: {faculty_name}".center(130))
     print(f"{'='*130}")
     print(f"{'Day':<12}", end="")
     
     # Calculate which display slots are breaks
-    first_break_slot = break_periods['first'] + 1  # +1 for the break itself
-    lunch_break_slot = break_periods['lunch'] + 2  # +2 for both breaks before lunch
+    first_break_slot = ctx.break_periods['first'] + 1  # +1 for the break itself
+    lunch_break_slot = ctx.break_periods['lunch'] + 2  # +2 for both breaks before lunch
     
-    for slot in range(1, num_display_slots + 1):
+    for slot in range(1, ctx.num_display_slots + 1):
         if slot == first_break_slot or slot == lunch_break_slot:
             print(f"{'BREAK':<14}", end="")
         else:
@@ -1027,7 +1807,7 @@ def print_faculty_timetable(faculty_name: str, faculty_tt: Dict[int, Dict[int, s
         day_name = days[d]
         print(f"{day_name:<12}", end="")
 
-        for slot in range(1, num_display_slots + 1):
+        for slot in range(1, ctx.num_display_slots + 1):
             if slot == first_break_slot or slot == lunch_break_slot:
                 print(f"{'BREAK':<14}", end="")
             else:
@@ -1045,7 +1825,10 @@ def print_faculty_timetable(faculty_name: str, faculty_tt: Dict[int, Dict[int, s
     print("-" * 130)
 
 # ==================== MAIN ====================
-def main():
+def main(ctx: Optional[SolverContext] = None):
+    if ctx is None:
+        ctx = SolverContext()
+
     print("=" * 130)
     print("SMART TIMETABLE GENERATION - FIXED VERSION".center(130))
     print("=" * 130)
@@ -1071,6 +1854,8 @@ def main():
 
     while global_attempt < max_global_attempts:
         global_attempt += 1
+        # Grids from the previous attempt keep their own calendar; start a clean one
+        ctx.reset_occupancy()
         print(f"\n{'='*130}")
         print(f"GLOBAL ATTEMPT {global_attempt}/{max_global_attempts}".center(130))
         print(f"{'='*130}")
@@ -1078,41 +1863,41 @@ def main():
         all_timetables = {}
         all_counters = {}
 
-        for section in sections:
+        for section in ctx.sections:
             print(f"\n{'-'*80}")
             print(f"Processing Section {section}")
             print(f"{'-'*80}")
-            timetable, counters = insertion_algorithm(section, all_timetables)
-            timetable, counters, success = smart_optimize(section, timetable, counters, all_timetables)
+            timetable, counters = insertion_algorithm(ctx, section, all_timetables)
+            timetable, counters, success = smart_optimize(ctx, section, timetable, counters, all_timetables)
             all_timetables[section] = timetable
             all_counters[section] = counters
 
-            if section != sections[0]:
-                for prev in sections[:sections.index(section)]:
-                    prev_counters = recount_subjects(prev, all_timetables[prev])
-                    if not is_section_complete(prev, prev_counters):
+            if section != ctx.sections[0]:
+                for prev in ctx.sections[:ctx.sections.index(section)]:
+                    prev_counters = recount_subjects(ctx, prev, all_timetables[prev])
+                    if not is_section_complete(ctx, prev, prev_counters):
                         print(f"  ⚠ Section {prev} affected -> re-optimizing")
-                        all_timetables[prev], all_counters[prev], _ = smart_optimize(prev, all_timetables[prev], prev_counters, all_timetables)
+                        all_timetables[prev], all_counters[prev], _ = smart_optimize(ctx, prev, all_timetables[prev], prev_counters, all_timetables)
 
         print(f"\n{'='*130}")
         print("VALIDATION".center(130))
         print(f"{'='*130}")
         all_complete = True
         has_empty_slots = False
-        for section in sections:
-            counters = recount_subjects(section, all_timetables[section])
+        for section in ctx.sections:
+            counters = recount_subjects(ctx, section, all_timetables[section])
             all_counters[section] = counters
-            if not is_section_complete(section, counters):
+            if not is_section_complete(ctx, section, counters):
                 all_complete = False
-                incom = get_incomplete_subjects(section, counters)
+                incom = get_incomplete_subjects(ctx, section, counters)
                 print(f"  ✗ Section {section} incomplete: {incom}")
             for d in range(1, num_days+1):
                 for p in range(1, num_periods+1):
-                    if all_timetables[section][d][p] is None:
+                    if all_timetables[section].get(d, p) is None:
                         has_empty_slots = True
                         print(f"  ✗ Section {section}: Empty slot at {days[d]} P{p}")
 
-            if not verify_lab_integrity(section, all_timetables[section]):
+            if not verify_lab_integrity(ctx, section, all_timetables[section]):
                 all_complete = False
 
         if all_complete and not has_empty_slots:
@@ -1121,16 +1906,16 @@ def main():
             print(f"{'='*130}")
 
             # Print section timetables
-            for section in sections:
-                print_timetable(section, all_timetables[section], all_counters[section])
+            for section in ctx.sections:
+                print_timetable(ctx, section, all_timetables[section], all_counters[section])
 
             # Print faculty timetables
             print(f"\n{'='*130}")
             print("FACULTY TIMETABLES".center(130))
             print(f"{'='*130}")
-            faculty_timetables = generate_faculty_timetables(all_timetables)
+            faculty_timetables = generate_faculty_timetables(ctx, all_timetables)
             for faculty_name in sorted(faculty_timetables.keys()):
-                print_faculty_timetable(faculty_name, faculty_timetables[faculty_name])
+                print_faculty_timetable(ctx, faculty_name, faculty_timetables[faculty_name])
 
             return
 
@@ -1141,31 +1926,32 @@ def main():
     print("\n" + "="*130)
     print("WARNING: exhausted global attempts; printing best-effort result".center(130))
     print("="*130)
-    for section in sections:
-        print_timetable(section, best_all_timetables[section], best_all_counters[section])
+    for section in ctx.sections:
+        print_timetable(ctx, section, best_all_timetables[section], best_all_counters[section])
 
     # Print faculty timetables even for best-effort
     print(f"\n{'='*130}")
     print("FACULTY TIMETABLES (BEST EFFORT)".center(130))
     print(f"{'='*130}")
-    faculty_timetables = generate_faculty_timetables(best_all_timetables)
+    faculty_timetables = generate_faculty_timetables(ctx, best_all_timetables)
     for faculty_name in sorted(faculty_timetables.keys()):
-        print_faculty_timetable(faculty_name, faculty_timetables[faculty_name])
+        print_faculty_timetable(ctx, faculty_name, faculty_timetables[faculty_name])
  
-def section_timetable(section: str, all_timetables: Dict[str, Dict[int, Dict[int, Optional[str]]]] = None,
-                      attempts: int = 10) -> Tuple[Dict[int, Dict[int, Optional[str]]], Dict[str, int], bool]:
+def section_timetable(ctx: SolverContext, section: str, all_timetables: Dict[str, TimetableGrid] = None,
+                      attempts: int = 10) -> Tuple[TimetableGrid, Dict[str, int], bool]:
     """Generate and return a timetable for a single section.
 
     Parameters:
-    - section: the section name (must be in `sections`).
+    - ctx: the SolverContext holding this generation's input data.
+    - section: the section name (must be in `ctx.sections`).
     - all_timetables: optional dict of other sections' timetables to consider for cross-section constraints.
     - attempts: number of attempts to try optimization before returning best-effort.
 
     Returns a tuple (timetable, counters, success) where `timetable` is the generated
-    timetable dict, `counters` maps subjects to placed hours, and `success` indicates
+    TimetableGrid (use .to_dict() for the nested dict format), `counters` maps subjects to placed hours, and `success` indicates
     whether a fully valid timetable (per constraints) was produced.
     """
-    if section not in sections:
+    if section not in ctx.sections:
         raise ValueError(f"Unknown section: {section}")
 
     if all_timetables is None:
@@ -1175,16 +1961,455 @@ def section_timetable(section: str, all_timetables: Dict[str, Dict[int, Dict[int
     best_counters = None
 
     for _ in range(attempts):
-        tt, counters = insertion_algorithm(section, all_timetables)
-        tt, counters, success = smart_optimize(section, tt, counters, all_timetables)
+        tt, counters = insertion_algorithm(ctx, section, all_timetables)
+        tt, counters, success = smart_optimize(ctx, section, tt, counters, all_timetables)
         if success:
             return tt, counters, True
+        # Only the latest attempt should occupy faculty slots in the shared index
+        if best_tt is not None:
+            best_tt.detach()
         best_tt, best_counters = tt, counters
 
     # return best effort if no success
     return best_tt, best_counters, False
 
-def store_section_timetables(section_list=None, subjects_dict=None, faculty_dict=None, strict_constraints=None, forbidden_constraints=None, break_config=None):
+# ==================== GLOBAL ATTEMPTS ====================
+MAX_GLOBAL_ATTEMPTS = 5  # Reduced from 50 for faster generation
+
+def run_global_attempt(ctx: SolverContext) -> Dict[str, TimetableGrid]:
+    """One full pass over all sections: insert, optimize, and re-optimize earlier sections it disturbed."""
+    all_timetables = {}
+    optimize = ctx.optimizer or smart_optimize
+
+    for index, section in enumerate(ctx.sections):
+        ctx.report_progress(event="section_started", section=section, sections_done=index)
+        later = len(ctx.sections) - index - 1
+        timetable, counters = insertion_algorithm(ctx, section, all_timetables)
+        ctx.optimize_calls_left = later + 1
+        timetable, counters, success = optimize(ctx, section, timetable, counters, all_timetables)
+        all_timetables[section] = timetable
+        ctx.report_progress(event="section_done", section=section, sections_done=index + 1,
+                            deficit=sum(missing for _, missing in get_incomplete_subjects(ctx, section, counters)))
+
+        if section != ctx.sections[0]:
+            earlier = ctx.sections[:index]
+            for position, prev in enumerate(earlier):
+                prev_counters = recount_subjects(ctx, prev, all_timetables[prev])
+                if not is_section_complete(ctx, prev, prev_counters):
+                    ctx.optimize_calls_left = later + len(earlier) - position
+                    all_timetables[prev], _, _ = optimize(ctx, prev, all_timetables[prev], prev_counters, all_timetables)
+
+    ctx.optimize_calls_left = None
+    ctx.report_progress(sections_done=len(ctx.sections))
+    return all_timetables
+
+# Repair moves per section in joint mode; the whole budget grows linearly with the department
+JOINT_ITERATIONS_PER_SECTION = 400
+
+def faculty_sections(ctx: SolverContext) -> Dict[str, Set[str]]:
+    """faculty -> sections they teach in (the sections a joint repair move can trade slots with)."""
+    taught: Dict[str, Set[str]] = {}
+    for section in ctx.sections:
+        for subject in ctx.subjects_per_section[section]:
+            faculty = get_faculty_for_subject(ctx, section, subject)
+            if faculty:
+                taught.setdefault(faculty, set()).add(section)
+    return taught
+
+def run_joint_attempt(ctx: SolverContext) -> Dict[str, TimetableGrid]:
+    """One global attempt that repairs all sections together instead of one after another.
+
+    Every section is inserted first (in a random order, so no section always
+    gets first pick of the shared faculty slots), then one repair loop works
+    on whichever sections are still incomplete. When a section cannot place
+    a subject, the loop either swaps within it or swaps inside another section
+    that shares the blocked faculty, which keeps that section valid but can
+    free the slot. The budget is JOINT_ITERATIONS_PER_SECTION per section and
+    earlier sections are never re-optimized, so the cost grows linearly with
+    the number of sections.
+    """
+    all_timetables: Dict[str, TimetableGrid] = {}
+    order = list(ctx.sections)
+    ctx.rng.shuffle(order)
+    for index, section in enumerate(order):
+        ctx.report_progress(event="section_started", section=section, sections_done=index)
+        all_timetables[section], _ = insertion_algorithm(ctx, section, all_timetables)
+
+    incomplete = joint_repair(ctx, all_timetables, order)
+
+    # Whatever is still incomplete gets one pass of the section optimizer (still linear)
+    optimize = ctx.optimizer or smart_optimize
+    still_incomplete = [section for section in order if section in incomplete]
+    for position, section in enumerate(still_incomplete):
+        timetable = all_timetables[section]
+        ctx.optimize_calls_left = len(still_incomplete) - position
+        all_timetables[section], _, _ = optimize(ctx, section, timetable, recount_subjects(ctx, section, timetable),
+                                                 all_timetables)
+    ctx.optimize_calls_left = None
+
+    ctx.report_progress(sections_done=len(order))
+    # Keep the department's section order in the result
+    return {section: all_timetables[section] for section in ctx.sections}
+
+@timed_phase("relocation")
+def relocate_for(ctx: SolverContext, section: str, timetable: TimetableGrid, subject: str,
+                 all_timetables: Dict[str, TimetableGrid]) -> bool:
+    """Put non-lab `subject` into a cell held by another non-lab class and move that class to a free cell.
+
+    The smallest change that can place a subject when no free cell accepts it;
+    returns False (grid unchanged) if no such pair of cells exists.
+    """
+    info = ctx.subjects_per_section[section][subject]
+    if info["lab"]:
+        return False
+    constraints = ctx.constraints_for(section)
+    faculty = get_faculty_for_subject(ctx, section, subject)
+    cells = [(d, p) for d, periods in ctx.domains_for(section)[subject].by_day.items() for p in periods]
+    ctx.rng.shuffle(cells)
+    for (d, p) in cells:
+        occupant = timetable.get(d, p)
+        if not occupant or occupant == subject or (d, p) in constraints.locked_cells:
+            continue
+        if ctx.subjects_per_section[section].get(occupant, {}).get("lab", False):
+            continue
+        if timetable.on_day(subject, d):
+            continue
+        timetable.set(d, p, None)
+        if check_faculty_conflict(ctx, faculty, d, p):
+            timetable.set(d, p, occupant)
+            continue
+        timetable.set(d, p, subject)
+        counters = recount_subjects(ctx, section, timetable)
+        if place_avoiding_stuck_cells(ctx, section, timetable, counters, occupant, {(d, p)}, all_timetables):
+            ctx.stats.count("relocations_made")
+            return True
+        timetable.set(d, p, occupant)
+    return False
+
+@timed_phase("joint_repair")
+def joint_repair(ctx: SolverContext, all_timetables: Dict[str, TimetableGrid], order: List[str]) -> Set[str]:
+    """The repair loop of run_joint_attempt; returns the sections it could not complete.
+
+    Missing hours are first put into free cells, which moves nothing already
+    placed; swaps (in the section or in one sharing the blocked faculty) only
+    happen when that fails.
+    """
+    taught = faculty_sections(ctx)
+    incomplete = {section for section in order
+                  if not is_section_complete(ctx, section, recount_subjects(ctx, section, all_timetables[section]))}
+    max_iterations = JOINT_ITERATIONS_PER_SECTION * len(order)
+    iteration = 0
+    while incomplete and iteration < max_iterations and not ctx.out_of_time():
+        ctx.check_cancelled()
+        iteration += 1
+        ctx.iterations += 1
+        if iteration % 100 == 0:
+            if ctx.debug:
+                solver_debug(ctx, f"→ Joint iteration {iteration}/{max_iterations}, {len(incomplete)} section(s) incomplete")
+            ctx.report_progress(event="iteration", iteration=iteration, max_iterations=max_iterations,
+                                sections_done=len(order) - len(incomplete))
+
+        section = ctx.rng.choice(sorted(incomplete))
+        timetable = all_timetables[section]
+        counters = recount_subjects(ctx, section, timetable)
+        placed = False
+        for subject, _ in get_incomplete_subjects(ctx, section, counters):
+            if place_avoiding_stuck_cells(ctx, section, timetable, counters, subject, set(), all_timetables):
+                placed = True
+
+        if not placed:
+            # Make room by moving one class to a free cell (two cells change)
+            for subject, _ in get_incomplete_subjects(ctx, section, counters):
+                if relocate_for(ctx, section, timetable, subject, all_timetables):
+                    placed = True
+                    break
+
+        if not placed:
+            # Stuck: reshuffle this section, or a section competing for one of its missing faculties
+            partners = {other for subject, _ in get_incomplete_subjects(ctx, section, counters)
+                        for other in taught.get(get_faculty_for_subject(ctx, section, subject), ())}
+            partners.discard(section)
+            target = section
+            if partners and ctx.rng.random() < 0.5:
+                target = ctx.rng.choice(sorted(partners))
+            attempt_random_swap(ctx, target, all_timetables[target], recount_subjects(ctx, target, all_timetables[target]),
+                                all_timetables)
+
+        if is_section_complete(ctx, section, recount_subjects(ctx, section, timetable)):
+            incomplete.discard(section)
+            ctx.report_progress(event="section_done", section=section, sections_done=len(order) - len(incomplete),
+                                deficit=0)
+            if ctx.debug:
+                solver_debug(ctx, f"✓ Section {section} is 100% COMPLETE!")
+    return incomplete
+
+@timed_phase("evaluate")
+def evaluate_attempt(ctx: SolverContext, all_timetables: Dict[str, TimetableGrid]) -> Tuple[bool, int]:
+    """Return (complete, shortfall) for a global attempt.
+
+    complete means every section has exactly its hours, no empty cells and intact labs;
+    shortfall is the number of subject hours still unplaced (lower is better).
+    """
+    complete = True
+    shortfall = 0
+    for section in ctx.sections:
+        timetable = all_timetables[section]
+        counters = recount_subjects(ctx, section, timetable)
+        if not is_section_complete(ctx, section, counters):
+            complete = False
+        shortfall += sum(missing for _, missing in get_incomplete_subjects(ctx, section, counters))
+        if 0 in timetable.cells:
+            complete = False
+        if not verify_lab_integrity(ctx, section, timetable):
+            complete = False
+    return complete, shortfall
+
+def fill_empty_with_remedial(all_timetables: Dict[str, TimetableGrid]):
+    """Fill any remaining None values with REMEDIAL."""
+    for timetable in all_timetables.values():
+        for day in range(1, num_days + 1):
+            for period in range(1, num_periods + 1):
+                if timetable.get(day, period) is None:
+                    timetable.set(day, period, "REMEDIAL")
+
+# ==================== SOLUTION QUALITY ====================
+def solution_quality(subjects_dict: Dict[str, dict], timetables: Dict[str, Dict[int, Dict[int, str]]]) -> Dict[str, object]:
+    """Quality of finished timetables (the stored dict format), for any engine.
+
+    score is the percentage of required hours placed (100.0 means every subject
+    got its hours; REMEDIAL filler is not required). gaps counts free or REMEDIAL
+    periods before a day's last class; remedial_cells counts filler cells.
+    """
+    required = placed = gaps = remedial_cells = 0
+    for section, timetable in timetables.items():
+        counts: Dict[str, int] = {}
+        for day in timetable.values():
+            periods = [day[period] for period in sorted(day)]
+            filler = [subject in (None, "REMEDIAL") for subject in periods]
+            last_class = max((index for index, free in enumerate(filler) if not free), default=-1)
+            gaps += sum(1 for index, free in enumerate(filler) if free and index < last_class)
+            remedial_cells += sum(filler)
+            for subject in periods:
+                counts[subject] = counts.get(subject, 0) + 1
+        for subject, info in subjects_dict.get(section, {}).items():
+            if subject != "REMEDIAL":
+                required += info["hours"]
+                placed += min(info["hours"], counts.get(subject, 0))
+    return {
+        "score": round(100 * placed / required, 2) if required else 100.0,
+        "complete": placed == required,
+        "unplaced_hours": required - placed,
+        "gaps": gaps,
+        "remedial_cells": remedial_cells
+    }
+
+def use_engine_optimizer(ctx: SolverContext, engine: str):
+    """Install the section optimizer of a greedy-family `engine` ("anneal" swaps in anneal_optimize)."""
+    if engine == "anneal":
+        from local_search import anneal_optimize
+        ctx.optimizer = anneal_optimize
+
+# ==================== SOLVER PROCESS POOL ====================
+# Parallel solves (multistart attempts, college partitions) share one process pool per server
+# process, created on first use and kept. It uses the "spawn" start method: forking the threaded
+# web server on every request would copy locks held by other threads into the children.
+# Each batch of tasks gets a slot in a shared array of stop flags, its cross-process cancel token.
+STOP_FLAG_SLOTS = 256
+# How often a batch's owner checks its cancel token while waiting for tasks
+POOL_POLL_SECONDS = 0.1
+
+_solver_pool: Optional[ProcessPoolExecutor] = None
+_solver_pool_workers = 0
+_stop_flags = None
+_free_stop_slots: List[int] = []
+_solver_pool_lock = threading.Lock()
+
+# In a pool worker: the shared stop flags, and the stop flag of the task running now
+_worker_stop_flags = None
+_worker_stop = None
+
+class StopFlag:
+    """Cancel token backed by one slot of the solver pool's shared stop flags."""
+
+    def __init__(self, flags, slot: int):
+        self.flags = flags
+        self.slot = slot
+
+    def is_set(self) -> bool:
+        return bool(self.flags[self.slot])
+
+    def set(self):
+        self.flags[self.slot] = 1
+
+def _init_solver_worker(flags):
+    global _worker_stop_flags
+    _worker_stop_flags = flags
+
+def _run_with_stop_flag(slot, function, args):
+    """Pool task wrapper: `function(args)` with its batch's stop flag as _worker_stop."""
+    global _worker_stop
+    _worker_stop = StopFlag(_worker_stop_flags, slot)
+    return function(args)
+
+def solver_pool(workers: int, replace: Optional[ProcessPoolExecutor] = None) -> ProcessPoolExecutor:
+    """The shared pool, started (or replaced by a larger one) so it has at least `workers` processes.
+
+    `replace` is a pool found broken (a worker died); it is swapped for a new one.
+    A replaced pool finishes the tasks it is running and then exits.
+    """
+    global _solver_pool, _solver_pool_workers, _stop_flags
+    context = multiprocessing.get_context("spawn")
+    with _solver_pool_lock:
+        if _stop_flags is None:
+            _stop_flags = context.Array("b", STOP_FLAG_SLOTS, lock=False)
+            _free_stop_slots.extend(range(STOP_FLAG_SLOTS))
+        if _solver_pool is None or _solver_pool is replace or workers > _solver_pool_workers:
+            if _solver_pool is not None:
+                _solver_pool.shutdown(wait=False)
+            _solver_pool_workers = max(workers, _solver_pool_workers)
+            _solver_pool = ProcessPoolExecutor(max_workers=_solver_pool_workers, mp_context=context,
+                                               initializer=_init_solver_worker, initargs=(_stop_flags,))
+        return _solver_pool
+
+class SolverBatch:
+    """Tasks run on the shared solver pool under one stop flag; use it as a context manager.
+
+    Leaving the block stops the batch: queued tasks are cancelled and running
+    ones see their stop flag at their next cancellation check. The flag's slot
+    is handed out again only after every task of the batch has ended.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self.pool = solver_pool(workers)
+        with _solver_pool_lock:
+            if not _free_stop_slots:
+                raise RuntimeError("Too many parallel solves are running; try again later")
+            self.slot = _free_stop_slots.pop()
+            _stop_flags[self.slot] = 0
+        self.futures: List[Future] = []
+
+    def submit(self, function, args) -> Future:
+        try:
+            future = self.pool.submit(_run_with_stop_flag, self.slot, function, args)
+        except BrokenProcessPool:
+            self.pool = solver_pool(self.workers, replace=self.pool)
+            future = self.pool.submit(_run_with_stop_flag, self.slot, function, args)
+        self.futures.append(future)
+        return future
+
+    def run(self, function, tasks: list, cancel=None):
+        """Yield (index, result) for every `function(task)` as they finish, `workers` at a time.
+
+        Setting the `cancel` token (see SolverContext.cancel) raises GenerationCancelled.
+        """
+        queued = list(enumerate(tasks))
+        pending: Dict[Future, int] = {}
+        while queued or pending:
+            while queued and len(pending) < self.workers:
+                index, task = queued.pop(0)
+                pending[self.submit(function, task)] = index
+            done, _ = wait(pending, timeout=POOL_POLL_SECONDS, return_when=FIRST_COMPLETED)
+            if cancel is not None and cancel.is_set():
+                raise GenerationCancelled("Timetable generation was cancelled")
+            for future in done:
+                yield pending.pop(future), future.result()
+
+    def stop(self):
+        _stop_flags[self.slot] = 1
+        running = [future for future in self.futures if not future.cancel()]
+        remaining = [len(running)]
+
+        def ended(_future):
+            with _solver_pool_lock:
+                remaining[0] -= 1
+                if remaining[0] == 0:
+                    _free_stop_slots.append(self.slot)
+
+        if not running:
+            with _solver_pool_lock:
+                _free_stop_slots.append(self.slot)
+        for future in running:
+            future.add_done_callback(ended)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+# ==================== PARALLEL MULTI-START ====================
+def _multistart_attempt(args) -> Tuple[int, bool, int, Dict[str, Dict[int, Dict[int, str]]], Dict[str, dict],
+                                        Optional[List[str]]]:
+    """Run one global attempt in a worker process with its own seed and context."""
+    inputs, seed, joint, context_options, deadline, engine, debug = args
+    # The worker's trace lines travel back with the result (None when the run is not traced)
+    trace = [] if debug else None
+    ctx = SolverContext(*inputs, seed=seed, trace=trace, **context_options)
+    use_engine_optimizer(ctx, engine)
+    ctx.cancel = _worker_stop
+    if deadline is not None:
+        # perf_counter is per process; the deadline travels as wall-clock time
+        ctx.deadline = time.perf_counter() + (deadline - time.time())
+    all_timetables = run_joint_attempt(ctx) if joint else run_global_attempt(ctx)
+    complete, shortfall = evaluate_attempt(ctx, all_timetables)
+    fill_empty_with_remedial(all_timetables)
+    ctx.stats.count("iterations", ctx.iterations)
+    return (seed, complete, shortfall, {section: tt.to_dict() for section, tt in all_timetables.items()},
+            ctx.stats.to_dict(), trace)
+
+def solve_multistart(inputs: tuple, attempts: int, workers: int, seed: Optional[int] = None,
+                     report_progress=None, joint: bool = False, context_options: Optional[dict] = None,
+                     time_limit: Optional[float] = None, cancel=None,
+                     stats: Optional[SolverStats] = None, engine: str = "greedy",
+                     trace: Optional[List[str]] = None) -> Dict[str, Dict[int, Dict[int, str]]]:
+    """Fan independent global attempts out over the shared solver pool, `workers` at a time.
+
+    Returns the first complete solution (pending attempts are cancelled), otherwise
+    the attempt with the smallest shortfall. `inputs` are the SolverContext arguments;
+    each attempt's seed is drawn from `seed`. `report_progress(**fields)` is told
+    about every finished attempt. `joint` runs run_joint_attempt instead of run_global_attempt;
+    `context_options` are extra SolverContext keyword arguments (section_faculty, ...);
+    `engine` ("greedy" or "anneal") picks the section optimizer each attempt runs.
+    With a `time_limit` (seconds) every attempt wraps up at the deadline and the
+    best attempt finished by then is returned. Setting the `cancel` token
+    (see SolverContext.cancel) raises GenerationCancelled. The timings and
+    counters of every finished attempt are merged into `stats`, and with a
+    `trace` list the attempts are traced and their lines appended to it.
+    """
+    seed_source = random.Random(seed)
+    seeds = [seed_source.randrange(2**32) for _ in range(attempts)]
+    deadline = time.time() + time_limit if time_limit is not None else None
+    tasks = [(inputs, seed, joint, context_options or {}, deadline, engine, trace is not None) for seed in seeds]
+    best = None
+    # Leaving the batch stops the attempts still running once we have an answer
+    with SolverBatch(workers) as batch:
+        for finished, (_, result) in enumerate(batch.run(_multistart_attempt, tasks, cancel=cancel), 1):
+            seed, complete, shortfall, timetables, attempt_stats, attempt_trace = result
+            if stats is not None:
+                stats.merge(attempt_stats)
+            if trace is not None:
+                append_trace(trace, f"=== Attempt {finished} (seed {seed}, shortfall {shortfall}) ===")
+                for line in attempt_trace:
+                    append_trace(trace, line)
+            if complete:
+                return timetables
+            if best is None or shortfall < best[0]:
+                best = (shortfall, timetables)
+            if report_progress is not None:
+                report_progress(event="attempt_finished", attempts_finished=finished, max_attempts=attempts,
+                                percent=int(100 * finished / attempts), shortfall=shortfall,
+                                best_shortfall=best[0])
+            if deadline is not None and time.time() >= deadline:
+                break
+    return best[1]
+
+ENGINES = ("greedy", "cpsat", "anneal")
+
+def store_section_timetables(section_list=None, subjects_dict=None, faculty_dict=None, strict_constraints=None, forbidden_constraints=None, break_config=None,
+                             engine="greedy", time_limit=None, num_workers=None, multistart_workers=None, seed=None,
+                             progress=None, trace=None, joint=False, section_faculty=None, section_groups=None,
+                             busy_faculty=None, report=None, cancel=None):
     """Generate and return timetables for all sections.
     
     Args:
@@ -1194,91 +2419,417 @@ def store_section_timetables(section_list=None, subjects_dict=None, faculty_dict
         strict_constraints: Dictionary {section: {subject: [(day, period), ...], ...}, ...} for fixed placements
         forbidden_constraints: Dictionary {section: {subject: [(day, period), ...], ...}, ...} for forbidden placements
         break_config: Dictionary {first_break_period, lunch_break_period} for break timings (loaded from database)
+        engine: "greedy" (insertion + repair, default), "cpsat" (CP-SAT model, needs ortools)
+                or "anneal" (insertion + simulated annealing with tabu memory, see local_search.py)
+        time_limit: wall-clock budget in seconds for the whole run, honored by every engine and phase;
+                    when it runs out the best timetables found so far are returned
+                    (anneal also splits it across the sections as per-section budgets)
+        num_workers: number of parallel CP-SAT search workers (cpsat engine only)
+        multistart_workers: if > 1, run the greedy restarts in parallel on this many processes
+                            (of the shared solver pool, see SolverBatch)
+        seed: seed for the run's random source; the same inputs and seed reproduce the same timetables
+        progress: optional callable receiving progress snapshots (attempt, section, iteration, percent, ...)
+        trace: optional list; turns on debug tracing for this run and collects the trace lines into it
+        joint: greedy/anneal engines: repair all sections together over the shared faculty calendar
+               (run_joint_attempt) instead of section by section; scales linearly with the section count
+        section_faculty, section_groups, busy_faculty: see SolverContext (used by store_college_timetables)
+        report: optional dict; filled with the result's solution_quality plus elapsed_ms,
+                time_limit_ms and budget_exhausted, and the run's SolverStats (phases, counters)
+        cancel: optional cancel token (e.g. threading.Event); once set, the run stops at the
+                next check in any search loop and raises GenerationCancelled
     
     Returns a dictionary mapping section names to their timetables.
     Each timetable is a dictionary mapping day numbers (1-5) to dictionaries mapping period numbers (1-7) to subject names."""
     
-    global sections, subjects_per_section, faculties, assigned_multi_faculty, strict_subject_placement, forbidden_subject_placement, break_periods, break_config_state, num_display_slots
-    
-    # Set the global variables from parameters
-    if section_list is not None:
-        sections = section_list
-    if subjects_dict is not None:
-        subjects_per_section = subjects_dict
-    if faculty_dict is not None:
-        faculties = faculty_dict
-    if strict_constraints is not None:
-        strict_subject_placement = strict_constraints
-    if forbidden_constraints is not None:
-        forbidden_subject_placement = forbidden_constraints
-    
-    # Update break configuration from database
-    if break_config is not None:
-        break_config_state['first'] = break_config.get('first_break_period', 2)
-        break_config_state['lunch'] = break_config.get('lunch_break_period', 4)
-        # Also update the legacy dict for backward compatibility
-        break_periods['first'] = break_config_state['first']
-        break_periods['lunch'] = break_config_state['lunch']
-    
-    # Calculate display slots dynamically: 7 periods + 2 breaks = 9 slots
-    num_display_slots = num_periods + 2
-    
-    # Reset assigned faculties for this generation
-    assigned_multi_faculty = {}
-    
-    max_global_attempts = 5  # Reduced from 50 for faster generation
-    global_attempt = 0
-    best_all_timetables = None
-    best_all_counters = None
-
-    while global_attempt < max_global_attempts:
-        global_attempt += 1
-        all_timetables = {}
-        all_counters = {}
-
-        for section in sections:
-            timetable, counters = insertion_algorithm(section, all_timetables)
-            timetable, counters, success = smart_optimize(section, timetable, counters, all_timetables)
-            all_timetables[section] = timetable
-            all_counters[section] = counters
-
-            if section != sections[0]:
-                for prev in sections[:sections.index(section)]:
-                    prev_counters = recount_subjects(prev, all_timetables[prev])
-                    if not is_section_complete(prev, prev_counters):
-                        all_timetables[prev], all_counters[prev], _ = smart_optimize(prev, all_timetables[prev], prev_counters, all_timetables)
-
-        all_complete = True
-        has_empty_slots = False
-        for section in sections:
-            counters = recount_subjects(section, all_timetables[section])
-            all_counters[section] = counters
-            if not is_section_complete(section, counters):
-                all_complete = False
-            for d in range(1, num_days+1):
-                for p in range(1, num_periods+1):
-                    if all_timetables[section][d][p] is None:
-                        has_empty_slots = True
-                        break
-
-            if not verify_lab_integrity(section, all_timetables[section]):
-                all_complete = False
+    # All state for this generation lives on the context, so concurrent calls are independent
+    context_options = {'section_faculty': section_faculty, 'section_groups': section_groups, 'busy_faculty': busy_faculty}
+    ctx = SolverContext(section_list, subjects_dict, faculty_dict,
+                        strict_constraints, forbidden_constraints, break_config, seed=seed, trace=trace,
+                        **context_options)
+    ctx.progress_callback = progress
+    ctx.cancel = cancel
+    started = time.perf_counter()
+    if time_limit is not None:
+        ctx.deadline = started + time_limit
+
+    def finish(timetables):
+        if report is not None:
+            report.update(solution_quality(ctx.subjects_per_section, timetables))
+            report.update(elapsed_ms=round((time.perf_counter() - started) * 1000, 2),
+                          time_limit_ms=round(time_limit * 1000) if time_limit is not None else None,
+                          budget_exhausted=ctx.out_of_time())
+            ctx.stats.count("iterations", ctx.iterations)
+            report.update(ctx.stats.to_dict())
+        return timetables
+
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine: {engine}")
+    # Provably impossible inputs fail here, before any search
+    check_feasibility(ctx)
+    if engine == "cpsat":
+        from cpsat_solver import solve_with_cpsat
+        return finish(solve_with_cpsat(ctx, time_limit=time_limit, num_workers=num_workers))
+    use_engine_optimizer(ctx, engine)
+
+    if multistart_workers and multistart_workers > 1:
+        inputs = (section_list, subjects_dict, faculty_dict, strict_constraints, forbidden_constraints, break_config)
+        return finish(solve_multistart(inputs, max(MAX_GLOBAL_ATTEMPTS, multistart_workers), multistart_workers,
+                                       seed=seed, report_progress=ctx.report_progress, joint=joint,
+                                       context_options=context_options, time_limit=time_limit, cancel=cancel,
+                                       stats=ctx.stats, engine=engine, trace=trace))
 
-        if all_complete and not has_empty_slots:
-            return all_timetables
+    best_all_timetables = None
+    best_shortfall = None
+    best_score = None
+
+    for attempt in range(1, MAX_GLOBAL_ATTEMPTS + 1):
+        ctx.check_cancelled()
+        # Past the budget, keep the best attempt so far instead of starting another
+        if attempt > 1 and ctx.out_of_time():
+            break
+        ctx.report_progress(event="attempt_started", attempt=attempt, max_attempts=MAX_GLOBAL_ATTEMPTS, sections_done=0)
+        # Grids from the previous attempt keep their own calendar; start a clean one
+        ctx.reset_occupancy()
+        all_timetables = run_joint_attempt(ctx) if joint else run_global_attempt(ctx)
+        complete, shortfall = evaluate_attempt(ctx, all_timetables)
+
+        if best_shortfall is None or shortfall < best_shortfall:
+            best_all_timetables, best_shortfall = all_timetables, shortfall
+            best_score = solution_quality(ctx.subjects_per_section,
+                                          {section: tt.to_dict() for section, tt in all_timetables.items()})["score"]
+        ctx.report_progress(event="attempt_finished", total_iterations=ctx.iterations, shortfall=shortfall,
+                            deficit=shortfall, best_shortfall=best_shortfall, best_score=best_score)
+
+        if complete:
+            return finish({section: tt.to_dict() for section, tt in all_timetables.items()})
+        # Every hour is placed and only REMEDIAL filler is missing; later attempts cannot do better
+        if shortfall == 0:
+            break
+
+    # Return best attempt if we couldn't get a perfect solution
+    fill_empty_with_remedial(best_all_timetables)
+    # Solver grids are converted to the stored dict format only here, at the boundary
+    return finish({section: tt.to_dict() for section, tt in best_all_timetables.items()})
+
+# ==================== PROBLEM FINGERPRINT ====================
+def problem_fingerprint(section_list, subjects_dict, faculty_dict, strict_constraints, forbidden_constraints,
+                        break_config, **options) -> str:
+    """SHA-256 of a canonical form of the solver inputs plus any solver `options` (engine, seed, ...).
+
+    Equal problems get equal fingerprints however their dicts and constraint
+    lists happen to be ordered, so a stored solution can be reused for them.
+    """
+    def cells(constraints):
+        return {section: {subject: sorted((list(cell) for cell in placements), key=str)
+                          for subject, placements in (subjects or {}).items()}
+                for section, subjects in (constraints or {}).items()}
+
+    problem = {
+        "sections": sorted(section_list),
+        "subjects": {section: {name: {"hours": int(info["hours"]), "lab": bool(info.get("lab")),
+                                      "last": bool(info.get("last"))}
+                               for name, info in subjects.items()}
+                     for section, subjects in subjects_dict.items()},
+        "faculties": faculty_dict,
+        "strict": cells(strict_constraints),
+        "forbidden": cells(forbidden_constraints),
+        "breaks": {key: int(value) for key, value in (break_config or {}).items()},
+        "options": options
+    }
+    canonical = json.dumps(problem, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf8")).hexdigest()
+
+# ==================== INCREMENTAL REPAIR ====================
+def normalize_stored_timetable(timetable) -> Dict[int, Dict[int, Optional[str]]]:
+    """{day: {period: subject}} with int keys, from a stored timetable (JSON turns the keys into strings)."""
+    return {int(day): {int(period): subject for period, subject in periods.items()}
+            for day, periods in timetable.items()}
+
+def load_existing_timetable(ctx: SolverContext, section: str, existing: Dict[int, Dict[int, Optional[str]]],
+                            all_timetables: Dict[str, TimetableGrid]) -> Tuple[TimetableGrid, int]:
+    """Build a section's grid from its stored timetable, keeping only what is still valid.
+
+    A stored class is dropped if the current inputs no longer allow it: the
+    subject is gone or over its hours, the cell is forbidden or strict for
+    another subject, a lab block is broken or starts at a break, a non-lab
+    class repeats on a day, its faculty is busy (same or adjacent period,
+    including other sections already loaded) or MC1/MC2 overlap. Strict
+    placements are then put back in. Returns (grid, number of classes dropped).
+    """
+    subjects = ctx.subjects_per_section[section]
+    constraints = ctx.constraints_for(section)
+    strict_owner = {cell: subject for subject, cells in constraints.strict.items() for cell in cells}
+    timetable = create_empty_timetable(ctx, section)
+    dropped = 0
 
-        best_all_timetables = all_timetables
-        best_all_counters = all_counters
+    for day in range(1, num_days + 1):
+        row = existing.get(day, {})
+        period = 1
+        while period <= num_periods:
+            subject = row.get(period)
+            info = subjects.get(subject)
+            width = 2 if info and info["lab"] else 1
+            cells = [(day, period + offset) for offset in range(width)]
+            start = period
+            period += width
+            if not subject:
+                continue
+            faculty = get_faculty_for_subject(ctx, section, subject)
+            valid = (
+                info is not None
+                and all(row.get(p) == subject for (_, p) in cells)
+                and (width == 1 or lab_can_start(ctx, subject, info, start))
+                and timetable.count(subject) + width <= info["hours"]
+                and (width == 2 or not timetable.on_day(subject, day))
+                and all(strict_owner.get(cell, subject) == subject for cell in cells)
+                and not any(constraints.is_forbidden(subject, d, p) for (d, p) in cells)
+                and not any(check_faculty_conflict(ctx, faculty, d, p) for (d, p) in cells)
+                and not (width == 2 and check_last_subject_overlap(ctx, section, subject, day, start, all_timetables))
+            )
+            if valid:
+                for (d, p) in cells:
+                    timetable.set(d, p, subject)
+            elif subject != "REMEDIAL":  # extra REMEDIAL filler is dropped and refilled silently
+                dropped += 1
+                if info is not None and info["lab"] and row.get(start + 1) != subject:
+                    period = start + 1  # a lone lab period: only that cell is invalid
+
+    # Strict placements win over whatever kept its place
+    for subject, cells in constraints.strict.items():
+        info = subjects.get(subject)
+        if info is None:
+            continue
+        for (day, period) in cells:
+            block = [(day, period + offset) for offset in range(2 if info["lab"] else 1)]
+            if all(timetable.get(d, p) == subject for (d, p) in block):
+                continue
+            for (d, p) in block:
+                for (ud, up) in expand_unit(timetable, d, p) if timetable.get(d, p) else ():
+                    timetable.set(ud, up, None)
+                    dropped += 1
+            faculty = get_faculty_for_subject(ctx, section, subject)
+            if not any(check_faculty_conflict(ctx, faculty, d, p) for (d, p) in block):
+                for (d, p) in block:
+                    timetable.set(d, p, subject)
+    return timetable, dropped
+
+def repair_section_timetables(section_list, subjects_dict, faculty_dict, strict_constraints, forbidden_constraints,
+                              break_config, existing, seed=None, progress=None, trace=None,
+                              cancel=None) -> Tuple[Dict[str, dict], dict]:
+    """Re-solve after a small edit, starting from the stored timetables and moving as little as possible.
+
+    Args are those of store_section_timetables plus `existing`, the current
+    {section: {day: {period: subject}}} timetables (string keys are fine).
+    Every stored class the edit did not invalidate keeps its cell (see
+    load_existing_timetable); sections without a stored timetable are inserted
+    fresh. Missing hours go into free cells first; only sections the edit left
+    short of what their stored timetable had (and new sections) are then
+    handed to joint_repair, which may relocate or swap classes. Gaps the
+    stored timetable already had are not chased, since closing them would
+    reshuffle sections the edit never touched.
+
+    Returns (timetables, report) where report has, per section, the classes
+    dropped on load (`unassigned`) and the cells that differ from the stored
+    timetable (`changed_cells`), plus `shortfall`, the hours still unplaced
+    (0 = every subject got its hours). A set `cancel` token stops the repair
+    with GenerationCancelled, as in store_section_timetables.
+    """
+    ctx = SolverContext(section_list, subjects_dict, faculty_dict,
+                        strict_constraints, forbidden_constraints, break_config, seed=seed, trace=trace)
+    ctx.progress_callback = progress
+    ctx.cancel = cancel
+    check_feasibility(ctx)
+
+    stored = {section: normalize_stored_timetable(existing[section]) for section in ctx.sections if existing.get(section)}
+    all_timetables: Dict[str, TimetableGrid] = {}
+    unassigned: Dict[str, int] = {}
+    for section in ctx.sections:
+        if section in stored:
+            all_timetables[section], unassigned[section] = load_existing_timetable(ctx, section, stored[section],
+                                                                                   all_timetables)
+    for section in ctx.sections:
+        if section not in stored:
+            all_timetables[section], _ = insertion_algorithm(ctx, section, all_timetables)
+    all_timetables = {section: all_timetables[section] for section in ctx.sections}
+
+    def missing_hours(section, counts):
+        return sum(max(0, info["hours"] - counts.get(subject, 0))
+                   for subject, info in ctx.subjects_per_section[section].items())
+
+    # Free cells only: nothing that kept its place moves
+    dirty = []
+    for section, timetable in all_timetables.items():
+        counters = recount_subjects(ctx, section, timetable)
+        for subject, deficit in get_incomplete_subjects(ctx, section, counters):
+            for _ in range(deficit):
+                if not place_avoiding_stuck_cells(ctx, section, timetable, counters, subject, set(), all_timetables):
+                    break
+        if section not in stored:
+            dirty.append(section)
+        else:
+            before = {}
+            for periods in stored[section].values():
+                for subject in periods.values():
+                    before[subject] = before.get(subject, 0) + 1
+            if missing_hours(section, recount_subjects(ctx, section, timetable)) > missing_hours(section, before):
+                dirty.append(section)
+
+    if dirty:
+        joint_repair(ctx, all_timetables, dirty)
+    _, shortfall = evaluate_attempt(ctx, all_timetables)
+    fill_empty_with_remedial(all_timetables)
+
+    timetables = {section: tt.to_dict() for section, tt in all_timetables.items()}
+    changed_cells = {}
+    for section, timetable in timetables.items():
+        before = stored.get(section, {})
+        changed_cells[section] = sum(1 for day, periods in timetable.items() for period, subject in periods.items()
+                                     if before.get(day, {}).get(period) != subject)
+    report = {'unassigned': unassigned, 'changed_cells': changed_cells, 'shortfall': shortfall}
+    if ctx.debug:
+        solver_debug(ctx, f"Repair: {report}")
+    return timetables, report
+
+# ==================== COLLEGE-WIDE GENERATION ====================
+def college_partitions(departments: Dict[str, dict]) -> List[List[str]]:
+    """Group departments that share a faculty (directly or through other departments).
+
+    Departments in different groups have no teacher in common, so their
+    timetables cannot clash and the groups can be solved independently.
+    """
+    parent = {dept: dept for dept in departments}
+
+    def find(dept):
+        while parent[dept] != dept:
+            parent[dept] = parent[parent[dept]]
+            dept = parent[dept]
+        return dept
+
+    teaches_in: Dict[str, str] = {}
+    for dept, data in departments.items():
+        for faculty_data in data['faculties'].values():
+            for faculty in (faculty_data if isinstance(faculty_data, list) else [faculty_data]):
+                if not faculty:
+                    continue
+                if faculty in teaches_in:
+                    parent[find(dept)] = find(teaches_in[faculty])
+                else:
+                    teaches_in[faculty] = dept
+
+    groups: Dict[str, List[str]] = {}
+    for dept in departments:
+        groups.setdefault(find(dept), []).append(dept)
+    return list(groups.values())
+
+def solve_college_partition(departments: Dict[str, dict], options: dict, progress=None,
+                            cancel=None) -> Dict[str, Dict[str, dict]]:
+    """Solve one college_partitions group against a single faculty calendar.
+
+    Departments with the same break configuration are merged into one run
+    (sections renamed "<dept>/<section>", faculty resolved per section, MC1/MC2
+    exclusivity kept per department). Runs with different break configurations
+    are solved one after another, each treating the faculty periods booked by
+    the earlier runs as busy. `options` are store_section_timetables keyword
+    arguments, except that the budget comes as `deadline`, a time.time() value
+    shared with the rest of the college run: each run gets the time left until it.
+    Setting the `cancel` token raises GenerationCancelled.
+    Returns {dept_name: {section: timetable}}.
+    """
+    options = dict(options)
+    deadline = options.pop('deadline', None)
+    by_breaks: Dict[tuple, List[str]] = {}
+    for dept, data in departments.items():
+        key = tuple(sorted((data['break_config'] or {}).items()))
+        by_breaks.setdefault(key, []).append(dept)
+
+    busy_faculty: Dict[str, List[Tuple[int, int]]] = {}
+    result: Dict[str, Dict[str, dict]] = {}
+    for dept_names in sorted(by_breaks.values(), key=len, reverse=True):
+        section_list, subjects_dict, strict, forbidden = [], {}, {}, {}
+        section_faculty, section_groups, names = {}, {}, {}
+        for dept in dept_names:
+            data = departments[dept]
+            for section in data['sections']:
+                qualified = f"{dept}/{section}"
+                names[qualified] = (dept, section)
+                section_list.append(qualified)
+                section_groups[qualified] = dept
+                subjects_dict[qualified] = data['subjects_per_section'].get(section, {})
+                for subject in subjects_dict[qualified]:
+                    if subject in data['faculties']:
+                        section_faculty[(qualified, subject)] = data['faculties'][subject]
+                if section in data['strict_constraints']:
+                    strict[qualified] = data['strict_constraints'][section]
+                if section in data['forbidden_constraints']:
+                    forbidden[qualified] = data['forbidden_constraints'][section]
+
+        time_limit = max(0.0, deadline - time.time()) if deadline is not None else None
+        timetables = store_section_timetables(
+            section_list, subjects_dict, {}, strict, forbidden, departments[dept_names[0]]['break_config'],
+            time_limit=time_limit, progress=progress, cancel=cancel, section_faculty=section_faculty, section_groups=section_groups,
+            busy_faculty={faculty: list(periods) for faculty, periods in busy_faculty.items()}, **options)
+
+        for qualified, timetable in timetables.items():
+            dept, section = names[qualified]
+            result.setdefault(dept, {})[section] = timetable
+            for day, periods in timetable.items():
+                for period, subject in periods.items():
+                    faculty_data = section_faculty.get((qualified, subject))
+                    faculty = faculty_data[0] if isinstance(faculty_data, list) and faculty_data else faculty_data
+                    if faculty and subject != "REMEDIAL":
+                        busy_faculty.setdefault(faculty, []).append((day, period))
+    return result
+
+def _college_partition_worker(args) -> Dict[str, Dict[str, dict]]:
+    departments, options = args
+    return solve_college_partition(departments, options, cancel=_worker_stop)
+
+def store_college_timetables(departments: Dict[str, dict], engine="greedy", time_limit=None, num_workers=None,
+                             seed=None, joint=True, partition_workers=None, progress=None,
+                             cancel=None) -> Dict[str, Dict[str, dict]]:
+    """Generate every department of a college against one shared faculty calendar.
 
-    # Fill any remaining None values with REMEDIAL
-    if best_all_timetables:
-        for section in best_all_timetables:
-            for day in range(1, num_days + 1):
-                for period in range(1, num_periods + 1):
-                    if best_all_timetables[section][day][period] is None:
-                        best_all_timetables[section][day][period] = "REMEDIAL"
-    
-    return best_all_timetables  # Return best attempt if we couldn't get a perfect solution
+    Args:
+        departments: {dept_name: {sections, subjects_per_section, faculties, strict_constraints,
+                     forbidden_constraints, break_config}} (the store_section_timetables inputs per department)
+        engine, num_workers, seed, joint: as for store_section_timetables
+        time_limit: wall-clock budget in seconds for the whole college run; every partition
+                    and break-configuration group gets what is left of it
+        partition_workers: if > 1, solve independent department groups (no shared faculty,
+                           see college_partitions) in parallel on this many processes
+        progress: optional callable receiving progress snapshots, with partition/partitions added
+        cancel: optional cancel token, as for store_section_timetables (parallel partitions included)
+
+    Returns {dept_name: {section: timetable}}.
+    """
+    partitions = college_partitions(departments)
+    seed_source = random.Random(seed)
+    # One deadline for the whole run, whether the partitions run in parallel or one after another
+    deadline = time.time() + time_limit if time_limit is not None else None
+    jobs = []
+    for dept_names in partitions:
+        options = {'engine': engine, 'deadline': deadline, 'num_workers': num_workers,
+                   'seed': seed_source.randrange(2**32), 'joint': joint}
+        jobs.append(({dept: departments[dept] for dept in dept_names}, options))
+    logger.info(f"College generation: {len(departments)} department(s) in {len(partitions)} independent group(s)")
+
+    result: Dict[str, Dict[str, dict]] = {}
+    if partition_workers and partition_workers > 1 and len(jobs) > 1:
+        with SolverBatch(partition_workers) as batch:
+            for finished, (_, timetables) in enumerate(batch.run(_college_partition_worker, jobs, cancel=cancel), 1):
+                result.update(timetables)
+                if progress is not None:
+                    progress({'partition': finished, 'partitions': len(jobs), 'percent': int(100 * finished / len(jobs))})
+        return result
+
+    for index, (group, options) in enumerate(jobs, 1):
+        report = None
+        if progress is not None:
+            report = lambda snapshot, index=index: progress(dict(snapshot, partition=index, partitions=len(jobs)))
+        result.update(solve_college_partition(group, options, progress=report, cancel=cancel))
+    return result
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # The command-line run shows the full solver trace
+    logging.basicConfig(level=logging.DEBUG, format="%(message)s")
+    main()
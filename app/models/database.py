@@ -30,6 +30,7 @@ class SectionTimetable(db.Model):
     dept_name = db.Column(db.String(100), nullable=False)
     college_id = db.Column(db.String(50), nullable=False)
     timetable = db.Column(JSONB, nullable=False)
+    seed = db.Column(db.BigInteger, nullable=True)  # solver seed, to replay the generation run
     created_at = db.Column(db.DateTime(timezone=True), server_default=db.func.now())
     
     __table_args__ = (
@@ -44,6 +45,31 @@ class SectionTimetable(db.Model):
         db.Index('idx_timetable_lookup', 'dept_name', 'college_id', 'created_at')
     )
 
+class SolverResult(db.Model):
+    """Cached solver output, keyed by the fingerprint of the inputs it was solved from"""
+    __tablename__ = 'solver_results'
+    id = db.Column(db.Integer, primary_key=True)
+    college_id = db.Column(db.String(50), nullable=False)
+    dept_name = db.Column(db.String(100), nullable=False)
+    fingerprint = db.Column(db.String(64), nullable=False)  # algorithm.problem_fingerprint, without the seed
+    seed = db.Column(db.BigInteger, nullable=False)
+    timetables = db.Column(JSONB, nullable=False)  # {section: {day: {period: subject}}}
+    hits = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime(timezone=True), server_default=db.func.now())
+    last_used_at = db.Column(db.DateTime(timezone=True), server_default=db.func.now())  # LRU eviction order
+
+    __table_args__ = (
+        db.UniqueConstraint('college_id', 'dept_name', 'fingerprint', 'seed', name='unique_solver_result'),
+        db.Index('idx_solver_result_lookup', 'college_id', 'dept_name', 'fingerprint'),
+        db.ForeignKeyConstraint(
+            ['dept_name', 'college_id'],
+            ['departments.name', 'departments.college_id'],
+            name='fk_solver_result_department',
+            onupdate='CASCADE',
+            ondelete='CASCADE'
+        )
+    )
+
 class Subject(db.Model):
     __tablename__ = 'subjects'
     id = db.Column(db.Integer, primary_key=True)
@@ -138,6 +164,8 @@ class Faculty(db.Model):
 
     __table_args__ = (
         db.UniqueConstraint('faculty_id', 'college_id', name='unique_faculty_per_college'),
+        # College-wide faculty directory loads and name -> id resolution
+        db.Index('idx_faculty_college_name', 'college_id', 'faculty_name'),
         db.ForeignKeyConstraint(
             ['dept_name', 'college_id'],
             ['departments.name', 'departments.college_id'],
@@ -0,0 +1,214 @@
+"""Solver benchmark: run store_section_timetables on synthetic departments.
+
+Examples:
+    python benchmark.py                                   # default size grid, greedy engine
+    python benchmark.py --sections 3,6,9 --labs 2 --seeds 5 --engines greedy,cpsat --out bench.json
+
+For every (case, engine, seed) it records wall time, optimizer iterations,
+whether every subject got its hours, the REMEDIAL fill count and peak Python
+memory, and writes the runs plus a per-case summary as JSON.
+"""
+
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+from algorithm import store_section_timetables, TimetableInfeasibleError, num_days, num_periods
+
+THEORY_NAMES = ["MATHS", "DDCO", "OS", "DSA", "JAVA", "UHV", "DBMS", "CN", "AI", "SE"]
+LAB_NAMES = ["DSL", "OSL", "DBL", "CNL", "AIL", "SEL"]
+
+
+def synthetic_department(sections=3, theory_subjects=6, theory_hours=4, labs=2, lab_hours=2,
+                         mc_lab=True, sections_per_faculty=3, strict_per_section=1,
+                         forbidden_density=0.05, seed=0):
+    """Build store_section_timetables inputs for a made-up department.
+
+    Sections are grouped `sections_per_faculty` at a time; each group gets its own
+    subject names (and so its own faculty), the way one semester's sections share
+    teachers. `forbidden_density` is the fraction of a section's cells that get a
+    random forbidden subject.
+
+    Returns (section_list, subjects_dict, faculty_dict, strict_constraints,
+    forbidden_constraints, break_config).
+    """
+    rng = random.Random(seed)
+    section_list = [f"S{i + 1}" for i in range(sections)]
+    subjects_dict, faculty_dict, strict, forbidden = {}, {}, {}, {}
+
+    for index, section in enumerate(section_list):
+        group = index // sections_per_faculty
+        position = index % sections_per_faculty
+        subjects = {}
+        theory = [f"G{group}_{THEORY_NAMES[i % len(THEORY_NAMES)]}{i // len(THEORY_NAMES) or ''}"
+                  for i in range(theory_subjects)]
+        for name in theory:
+            subjects[name] = {'hours': theory_hours, 'lab': False, 'last': False}
+        for i in range(labs):
+            name = f"G{group}_{LAB_NAMES[i % len(LAB_NAMES)]}{i // len(LAB_NAMES) or ''}"
+            subjects[name] = {'hours': lab_hours, 'lab': True, 'last': False}
+        # MC1/MC2 may run in only one section per day, so at most num_days sections get one
+        if mc_lab and index < num_days:
+            subjects["MC1"] = {'hours': 2, 'lab': True, 'last': True}
+        subjects['REMEDIAL'] = {'hours': 1, 'lab': False, 'last': False}
+        subjects_dict[section] = subjects
+
+        for name in subjects:
+            if name != 'REMEDIAL':
+                faculty_dict.setdefault(name, f"FAC_{name}")
+
+        # Strict cells spread so the same subject never lands in adjacent periods across a group
+        if strict_per_section:
+            strict[section] = {}
+            for k in range(min(strict_per_section, len(theory))):
+                day = (position + k) % num_days + 1
+                period = (2 * position) % num_periods + 1
+                strict[section][theory[k]] = [(day, period)]
+
+        cells = [(d, p) for d in range(1, num_days + 1) for p in range(1, num_periods + 1)]
+        forbidden_cells = rng.sample(cells, int(len(cells) * forbidden_density))
+        if forbidden_cells:
+            forbidden[section] = {}
+            for cell in forbidden_cells:
+                forbidden[section].setdefault(rng.choice(theory), []).append(cell)
+
+    break_config = {'first_break_period': 2, 'lunch_break_period': 4}
+    return section_list, subjects_dict, faculty_dict, strict, forbidden, break_config
+
+
+def unplaced_hours(subjects_dict, timetables):
+    """Hours (REMEDIAL excluded) the solver failed to place."""
+    missing = 0
+    for section, subjects in subjects_dict.items():
+        cells = [timetables[section][d][p] for d in timetables[section] for p in timetables[section][d]]
+        for name, info in subjects.items():
+            if name != 'REMEDIAL':
+                missing += max(0, info['hours'] - cells.count(name))
+    return missing
+
+
+def run_once(inputs, engine, seed, time_limit=None, measure_memory=True, joint=False):
+    """Solve one synthetic department and return its measurements."""
+    section_list, subjects_dict, faculty_dict, strict, forbidden, break_config = inputs
+    snapshot = {}
+
+    def solve():
+        return store_section_timetables(section_list, subjects_dict, faculty_dict, strict, forbidden, break_config,
+                                        engine=engine, time_limit=time_limit, seed=seed,
+                                        progress=snapshot.update, joint=joint)
+
+    record = {'engine': engine, 'seed': seed, 'joint': joint}
+    try:
+        start = time.perf_counter()
+        try:
+            timetables = solve()
+        finally:
+            record['wall_time_s'] = round(time.perf_counter() - start, 4)
+
+        if measure_memory:
+            # Separate run: tracemalloc slows allocation-heavy code too much to time alongside it
+            tracemalloc.start()
+            try:
+                solve()
+                record['peak_memory_kb'] = round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+            finally:
+                tracemalloc.stop()
+    except (TimetableInfeasibleError, TimeoutError) as e:
+        record.update(complete=False, error=f"{type(e).__name__}: {e}")
+        return record
+
+    missing = unplaced_hours(subjects_dict, timetables)
+    record.update(
+        complete=missing == 0,
+        unplaced_hours=missing,
+        remedial_cells=sum(1 for tt in timetables.values() for day in tt.values() for subj in day.values()
+                           if subj == 'REMEDIAL'),
+        iterations=snapshot.get('total_iterations'),
+        attempts=snapshot.get('attempt')
+    )
+    return record
+
+
+def summarize(runs):
+    summary = {
+        'runs': len(runs),
+        'success_rate': round(sum(1 for r in runs if r.get('complete')) / len(runs), 3)
+    }
+    timed = [r['wall_time_s'] for r in runs if 'wall_time_s' in r]
+    if timed:
+        summary['median_wall_time_s'] = round(statistics.median(timed), 4)
+        summary['max_wall_time_s'] = max(timed)
+    remedial = [r['remedial_cells'] for r in runs if 'remedial_cells' in r]
+    if remedial:
+        summary['mean_remedial_cells'] = round(statistics.mean(remedial), 2)
+    memory = [r['peak_memory_kb'] for r in runs if 'peak_memory_kb' in r]
+    if memory:
+        summary['max_peak_memory_kb'] = max(memory)
+    return summary
+
+
+def int_list(value):
+    return [int(v) for v in value.split(',') if v]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sections', type=int_list, default=[3, 6, 9], help='comma-separated section counts')
+    parser.add_argument('--theory', type=int_list, default=[6], help='comma-separated theory subject counts')
+    parser.add_argument('--labs', type=int_list, default=[2], help='comma-separated lab counts per section')
+    parser.add_argument('--forbidden-density', type=float, default=0.05)
+    parser.add_argument('--strict-per-section', type=int, default=1)
+    parser.add_argument('--sections-per-faculty', type=int, default=3,
+                        help='sections sharing one set of teachers')
+    parser.add_argument('--joint', action='store_true', help='repair all sections together (joint mode)')
+    parser.add_argument('--engines', default='greedy', help='comma-separated engines (greedy, cpsat, anneal)')
+    parser.add_argument('--seeds', type=int, default=3, help='runs per case and engine (seeds 0..N-1)')
+    parser.add_argument('--time-limit', type=float, default=None, help='CP-SAT time limit in seconds')
+    parser.add_argument('--no-memory', action='store_true', help='skip the tracemalloc peak-memory run')
+    parser.add_argument('--out', default='-', help='output JSON file (default: stdout)')
+    args = parser.parse_args(argv)
+
+    cases = []
+    for sections in args.sections:
+        for theory in args.theory:
+            for labs in args.labs:
+                case = {'sections': sections, 'theory_subjects': theory, 'labs': labs,
+                        'forbidden_density': args.forbidden_density, 'strict_per_section': args.strict_per_section,
+                        'sections_per_faculty': args.sections_per_faculty}
+                runs = []
+                for engine in args.engines.split(','):
+                    for seed in range(args.seeds):
+                        inputs = synthetic_department(sections=sections, theory_subjects=theory, labs=labs,
+                                                      sections_per_faculty=args.sections_per_faculty,
+                                                      strict_per_section=args.strict_per_section,
+                                                      forbidden_density=args.forbidden_density, seed=seed)
+                        record = run_once(inputs, engine, seed, args.time_limit, not args.no_memory, args.joint)
+                        print(f"sections={sections} theory={theory} labs={labs} engine={engine} seed={seed}: "
+                              f"{record.get('wall_time_s', '-')}s complete={record['complete']}", file=sys.stderr)
+                        runs.append(record)
+                engines = {engine: summarize([r for r in runs if r['engine'] == engine])
+                           for engine in args.engines.split(',')}
+                cases.append({'case': case, 'summary': engines, 'runs': runs})
+
+    report = {
+        'generated_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cases': cases
+    }
+    output = json.dumps(report, indent=2)
+    if args.out == '-':
+        print(output)
+    else:
+        with open(args.out, 'w', encoding='utf8') as f:
+            f.write(output)
+        print(f"Wrote {args.out}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,206 @@
+"""CP-SAT timetable engine (engine="cpsat").
+
+Encodes the same rules the greedy solver in algorithm.py enforces as a
+constraint model and lets OR-Tools' CP-SAT search it:
+
+- every subject gets exactly its weekly hours
+- labs are 2-period blocks that never start at a break period (last=True labs,
+  MC1 and MC2 start at P6)
+- a non-lab subject appears at most once per day
+- a faculty never teaches two sections in the same or back-to-back periods
+  (the two halves of their own lab block excepted)
+- MC1/MC2 run in at most one section per day (per department in college-wide runs)
+- periods a faculty is booked outside this run (ctx.busy_faculty) stay free,
+  with the same back-to-back gap
+- strict cells are fixed and forbidden cells are excluded
+
+The answer is either a timetable that satisfies all of them, a proof that
+none exists (TimetableInfeasibleError), or a timeout.
+"""
+
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+try:
+    from ortools.sat.python import cp_model
+except ImportError:  # ortools is optional; only this engine needs it
+    cp_model = None
+
+from algorithm import (
+    SolverContext, TimetableInfeasibleError, days, num_days, num_periods,
+    get_faculty_for_subject, lab_can_start
+)
+
+# Empty cells are filled with REMEDIAL afterwards; fix_remedial_at_end puts them in P5-P7,
+# so the model prefers to leave free periods there as well.
+REMEDIAL_PERIODS = (5, 6, 7)
+
+DEFAULT_TIME_LIMIT = 30.0
+DEFAULT_NUM_WORKERS = 8
+# How often a running solve checks the context's cancel token
+CANCEL_POLL_SECONDS = 0.1
+
+
+def lab_start_periods(ctx: SolverContext, subject: str, info: dict) -> List[int]:
+    """Periods a 2-period lab of `subject` may start at (same rules as can_place_lab)."""
+    return [p for p in range(1, num_periods) if lab_can_start(ctx, subject, info, p)]
+
+
+def solve_with_cpsat(ctx: SolverContext, time_limit: Optional[float] = None,
+                     num_workers: Optional[int] = None) -> Dict[str, Dict[int, Dict[int, str]]]:
+    """Build and solve the CP-SAT model for every section of `ctx`.
+
+    Returns {section: {day: {period: subject}}} like store_section_timetables.
+    Raises TimetableInfeasibleError if the constraints admit no timetable,
+    TimeoutError if none was found within `time_limit` seconds and
+    GenerationCancelled if the context's cancel token was set meanwhile.
+    """
+    if cp_model is None:
+        raise RuntimeError("The cpsat engine requires ortools (pip install ortools)")
+
+    build_wall, build_cpu = time.perf_counter(), time.thread_time()
+    model = cp_model.CpModel()
+    # x[(section, subject, day, period)] -> subject taught in that cell
+    x: Dict[Tuple[str, str, int, int], "cp_model.IntVar"] = {}
+    # lab_start[(section, subject, day, period)] -> lab block occupies period and period+1
+    lab_start: Dict[Tuple[str, str, int, int], "cp_model.IntVar"] = {}
+    # faculty -> [(section, subject)] it teaches in this generation
+    taught_by: Dict[str, List[Tuple[str, str]]] = {}
+
+    for section in ctx.sections:
+        ctx.check_cancelled()
+        constraints = ctx.constraints_for(section)
+        subjects = ctx.subjects_per_section[section]
+
+        for subject, info in subjects.items():
+            if subject == "REMEDIAL":
+                continue
+            for d in range(1, num_days + 1):
+                for p in range(1, num_periods + 1):
+                    x[section, subject, d, p] = model.NewBoolVar(f"x_{section}_{subject}_{d}_{p}")
+
+            faculty = get_faculty_for_subject(ctx, section, subject)
+            if faculty:
+                taught_by.setdefault(faculty, []).append((section, subject))
+
+            cells = [x[section, subject, d, p] for d in range(1, num_days + 1) for p in range(1, num_periods + 1)]
+            model.Add(sum(cells) == info["hours"])
+
+            if info["lab"]:
+                starts = lab_start_periods(ctx, subject, info)
+                for d in range(1, num_days + 1):
+                    for p in starts:
+                        lab_start[section, subject, d, p] = model.NewBoolVar(f"lab_{section}_{subject}_{d}_{p}")
+                    # A cell is taught exactly when a block starts there or one period earlier
+                    for p in range(1, num_periods + 1):
+                        covering = [lab_start[section, subject, d, s] for s in (p, p - 1)
+                                    if (section, subject, d, s) in lab_start]
+                        model.Add(x[section, subject, d, p] == sum(covering))
+            else:
+                for d in range(1, num_days + 1):
+                    model.Add(sum(x[section, subject, d, p] for p in range(1, num_periods + 1)) <= 1)
+
+            for (d, p) in constraints.forbidden.get(subject, ()):
+                model.Add(x[section, subject, d, p] == 0)
+
+        for subject, placements in constraints.strict.items():
+            if subject not in subjects or subject == "REMEDIAL":
+                continue
+            for (d, p) in placements:
+                if subjects[subject]["lab"]:
+                    if (section, subject, d, p) not in lab_start:
+                        raise TimetableInfeasibleError(
+                            f"Strict lab {subject} for section {section} cannot start at {days[d]} P{p}")
+                    model.Add(lab_start[section, subject, d, p] == 1)
+                else:
+                    model.Add(x[section, subject, d, p] == 1)
+
+        # One subject per cell
+        for d in range(1, num_days + 1):
+            for p in range(1, num_periods + 1):
+                model.Add(sum(x[section, subject, d, p] for subject in subjects if subject != "REMEDIAL") <= 1)
+
+    # Faculty: never in two places at once, and a free period between consecutive classes
+    for faculty, units in taught_by.items():
+        for d in range(1, num_days + 1):
+            busy = {p: sum(x[s, subj, d, p] for (s, subj) in units) for p in range(1, num_periods + 1)}
+            for p in range(1, num_periods + 1):
+                model.Add(busy[p] <= 1)
+            for p in range(1, num_periods):
+                own_block = [lab_start[s, subj, d, p] for (s, subj) in units if (s, subj, d, p) in lab_start]
+                model.Add(busy[p] + busy[p + 1] - sum(own_block) <= 1)
+            for (day, period) in ctx.busy_faculty.get(faculty, ()):
+                if day == d:
+                    for p in range(max(1, period - 1), min(num_periods, period + 1) + 1):
+                        model.Add(busy[p] == 0)
+
+    # MC1/MC2 never run in two sections (of the same department) on the same day
+    for group in {ctx.section_groups.get(section) for section in ctx.sections}:
+        for d in range(1, num_days + 1):
+            mc_blocks = [var for (s, subj, day, p), var in lab_start.items()
+                         if day == d and subj in ["MC1", "MC2"] and ctx.section_groups.get(s) == group]
+            if len(mc_blocks) > 1:
+                model.Add(sum(mc_blocks) <= 1)
+
+    # Prefer leaving free (REMEDIAL) periods at the end of the day
+    free_early = []
+    for section in ctx.sections:
+        subjects = [s for s in ctx.subjects_per_section[section] if s != "REMEDIAL"]
+        for d in range(1, num_days + 1):
+            for p in range(1, num_periods + 1):
+                if p not in REMEDIAL_PERIODS:
+                    free_early.append(1 - sum(x[section, subject, d, p] for subject in subjects))
+    if free_early:
+        model.Minimize(sum(free_early))
+
+    ctx.stats.add_phase("cpsat_model", time.perf_counter() - build_wall, time.thread_time() - build_cpu)
+
+    solver = cp_model.CpSolver()
+    max_time = float(time_limit if time_limit is not None else DEFAULT_TIME_LIMIT)
+    if ctx.deadline is not None:
+        # Building the model already used part of the run's budget
+        max_time = min(max_time, max(0.0, ctx.deadline - time.perf_counter()))
+    solver.parameters.max_time_in_seconds = max_time
+    solver.parameters.num_search_workers = int(num_workers if num_workers is not None else DEFAULT_NUM_WORKERS)
+    if ctx.seed is not None:
+        solver.parameters.random_seed = ctx.seed % 2**31
+    ctx.report_progress(event='solver_started', phase='cpsat', time_limit=solver.parameters.max_time_in_seconds)
+    finished = threading.Event()
+
+    def stop_when_cancelled():
+        while not finished.wait(CANCEL_POLL_SECONDS):
+            if ctx.cancel.is_set():
+                solver.StopSearch()
+                return
+
+    if ctx.cancel is not None:
+        threading.Thread(target=stop_when_cancelled, daemon=True, name='cpsat-cancel').start()
+    search_wall, search_cpu = time.perf_counter(), time.thread_time()
+    try:
+        status = solver.Solve(model)
+    finally:
+        finished.set()
+        # CP-SAT searches on its own threads; report its user time rather than this thread's
+        ctx.stats.add_phase("cpsat_search", time.perf_counter() - search_wall,
+                            max(solver.UserTime(), time.thread_time() - search_cpu))
+    ctx.stats.count("cpsat_branches", solver.NumBranches())
+    ctx.stats.count("cpsat_conflicts", solver.NumConflicts())
+    ctx.check_cancelled()
+
+    if status == cp_model.INFEASIBLE:
+        raise TimetableInfeasibleError("No timetable satisfies the given hours and constraints")
+    if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        raise TimeoutError(f"CP-SAT found no timetable within {solver.parameters.max_time_in_seconds:g}s")
+
+    result = {}
+    for section in ctx.sections:
+        subjects = [s for s in ctx.subjects_per_section[section] if s != "REMEDIAL"]
+        timetable = {}
+        for d in range(1, num_days + 1):
+            timetable[d] = {}
+            for p in range(1, num_periods + 1):
+                placed = next((subject for subject in subjects if solver.Value(x[section, subject, d, p])), None)
+                timetable[d][p] = placed or "REMEDIAL"
+        result[section] = timetable
+    return result
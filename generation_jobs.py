@@ -0,0 +1,230 @@
+"""In-process queue for timetable generation jobs.
+
+POST /generation-jobs hands the solve to a small thread pool and returns a
+job id at once; GET /generation-jobs/<id> reads the job's status, latest
+solver progress and, once finished, its result. Streaming clients subscribe
+to a job and receive every progress snapshot as it happens.
+
+Every run holds a cancel token (a threading.Event the solver polls). POST
+/generation-jobs/<id>/cancel sets it, and starting a new run for the same
+key (department) sets the token of the run it supersedes, so a department
+never has two solves competing for CPU. Jobs live in memory only and
+finished ones are dropped after `retention_seconds`.
+"""
+
+import queue
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+
+class GenerationJob:
+    """One queued or running generation and everything reported about it so far."""
+
+    def __init__(self, params: dict, key: Optional[tuple] = None):
+        self.id = uuid.uuid4().hex
+        self.params = params
+        self.key = key
+        self.cancel_token = threading.Event()
+        self.superseded_by: Optional[str] = None
+        self.status = QUEUED
+        self.progress: dict = {}
+        self.result: Optional[dict] = None
+        self.http_status: Optional[int] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._listeners: List[queue.Queue] = []
+        self._listeners_lock = threading.Lock()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (SUCCEEDED, FAILED, CANCELLED)
+
+    def to_dict(self) -> dict:
+        return {
+            'id': self.id,
+            'status': self.status,
+            'dept_name': self.params.get('dept_name'),
+            'college_id': self.params.get('college_id'),
+            'progress': dict(self.progress),
+            'result': self.result,
+            'http_status': self.http_status,
+            'error': self.error,
+            'cancel_requested': self.cancel_token.is_set(),
+            'superseded_by': self.superseded_by,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at
+        }
+
+    def subscribe(self) -> queue.Queue:
+        """Queue receiving every later progress snapshot, then None once the job has finished."""
+        events: queue.Queue = queue.Queue()
+        with self._listeners_lock:
+            if self.finished:
+                events.put(None)
+            else:
+                self._listeners.append(events)
+        return events
+
+    def unsubscribe(self, events: queue.Queue):
+        with self._listeners_lock:
+            if events in self._listeners:
+                self._listeners.remove(events)
+
+    def publish(self, snapshot: Optional[dict]):
+        """Hand a progress snapshot (None: job finished) to every subscriber."""
+        with self._listeners_lock:
+            for events in self._listeners:
+                events.put(snapshot)
+
+
+class GenerationJobQueue:
+    """Runs generation jobs on a thread pool.
+
+    `runner(params, progress, cancel)` does the actual work and returns
+    (response_body, http_status) like the synchronous route; `progress` is a
+    callable and `cancel` the job's cancel token, both passed down to the solver.
+    """
+
+    def __init__(self, runner: Callable[[dict, Callable[[dict], None], threading.Event], Tuple[dict, int]],
+                 max_workers: int = 2, retention_seconds: float = 3600):
+        self.runner = runner
+        self.retention_seconds = retention_seconds
+        self.jobs: Dict[str, GenerationJob] = {}
+        # key -> cancel token of the newest run for that key (queued job, running job or synchronous run)
+        self.active: Dict[tuple, threading.Event] = {}
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='generation-job')
+
+    def submit(self, params: dict, key: Optional[tuple] = None) -> GenerationJob:
+        """Queue a job; with a `key`, any earlier unfinished run for the same key is cancelled."""
+        job = GenerationJob(params, key)
+        with self.lock:
+            self._prune()
+            if key is not None:
+                self._supersede(key, job.id, f'job {job.id}')
+                self._claim(key, job.cancel_token)
+            self.jobs[job.id] = job
+        self.executor.submit(self._run, job)
+        return job
+
+    def claim(self, key: tuple, owner: str = 'synchronous') -> threading.Event:
+        """Cancel token for a run outside the queue (e.g. a synchronous request); supersedes earlier runs.
+
+        `owner` names the run in the superseded jobs' `superseded_by`.
+        """
+        return self.claim_all([key], owner)
+
+    def claim_all(self, keys: List[tuple], owner: str = 'synchronous') -> threading.Event:
+        """One cancel token for a run covering several keys (e.g. every department of a college).
+
+        Supersedes the earlier runs of each key; a later run for any of them cancels it.
+        Release it with release() for every key.
+        """
+        token = threading.Event()
+        with self.lock:
+            for key in keys:
+                self._supersede(key, owner, f'a {owner} run')
+                self._claim(key, token)
+        return token
+
+    def release(self, key: tuple, token: threading.Event):
+        """Forget a finished run's token (unless a newer run already replaced it)."""
+        with self.lock:
+            self._release(key, token)
+
+    def cancel(self, job_id: str) -> Optional[GenerationJob]:
+        """Ask a job to stop: a queued job is cancelled at once, a running one at the solver's next check."""
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is not None and not job.finished:
+                job.cancel_token.set()
+                if job.status == QUEUED:
+                    self._finish_cancelled(job, 'Cancelled before it started')
+        return job
+
+    def get(self, job_id: str) -> Optional[GenerationJob]:
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def _run(self, job: GenerationJob):
+        with self.lock:
+            if job.finished:
+                return
+            job.status = RUNNING
+            job.started_at = time.time()
+
+        def report(snapshot: dict):
+            job.progress = snapshot
+            job.publish(snapshot)
+
+        try:
+            body, http_status = self.runner(job.params, report, job.cancel_token)
+            job.result = body
+            job.http_status = http_status
+            if body.get('ok'):
+                job.status = SUCCEEDED
+                job.progress = dict(job.progress, percent=100)
+            else:
+                job.status = CANCELLED if body.get('cancelled') else FAILED
+                job.error = body.get('error')
+        except Exception as e:
+            job.status = FAILED
+            job.error = str(e)
+        finally:
+            job.finished_at = time.time()
+            job.publish(None)
+            if job.key is not None:
+                self.release(job.key, job.cancel_token)
+
+    def _finish_cancelled(self, job: GenerationJob, reason: str):
+        """End a job that never started (caller holds the lock)."""
+        job.status = CANCELLED
+        job.error = reason
+        job.finished_at = time.time()
+        job.publish(None)
+        if job.key is not None:
+            self._release(job.key, job.cancel_token)
+
+    def _supersede(self, key: tuple, by: str, description: str):
+        """Mark every unfinished job for `key` as superseded by `by` and tell its subscribers (caller holds the lock).
+
+        Queued jobs end as cancelled at once; running ones stop at the solver's
+        next check once _claim sets their token.
+        """
+        for other in self.jobs.values():
+            if other.key == key and not other.finished:
+                other.superseded_by = by
+                if other.status == QUEUED:
+                    self._finish_cancelled(other, f'Superseded by {description}')
+                else:
+                    other.publish(dict(other.progress, event='superseded', superseded_by=by))
+
+    def _claim(self, key: tuple, token: threading.Event):
+        """Make `token` the newest run for `key`, cancelling the previous one (caller holds the lock)."""
+        previous = self.active.get(key)
+        if previous is not None:
+            previous.set()
+        self.active[key] = token
+
+    def _release(self, key: tuple, token: threading.Event):
+        if self.active.get(key) is token:
+            del self.active[key]
+
+    def _prune(self):
+        """Forget finished jobs older than the retention window (caller holds the lock)."""
+        cutoff = time.time() - self.retention_seconds
+        expired = [job_id for job_id, job in self.jobs.items() if job.finished and job.finished_at < cutoff]
+        for job_id in expired:
+            del self.jobs[job_id]
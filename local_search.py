@@ -0,0 +1,318 @@
+"""Simulated-annealing optimizer with tabu memory (engine="anneal").
+
+A drop-in replacement for smart_optimize: it takes one section's grid after
+insertion and improves it with local moves, keeping every hard rule the
+greedy solver enforces (locked/forbidden cells, lab blocks, once per day,
+faculty calendar, MC overlap) and minimising a scored objective:
+
+    100 x unmet hours  +  3 x gaps  +  1 x free periods  +  faculty load balance
+
+- unmet hours: subject hours (REMEDIAL included) not placed yet
+- gaps: free periods before the day's last class
+- free periods: cells that will end up as REMEDIAL filler
+- faculty load balance: sum of squared daily loads of the section's faculties
+  (all sections counted), which favours spreading a teacher's week
+
+Moves are: place an unmet subject in free cells, swap two equally long units,
+or evict a placed non-lab subject to make room for an unmet one. Worse moves
+are accepted with the Metropolis rule under a temperature that cools over
+`MAX_ITERATIONS`, and the search stops as soon as nothing is unmet (or after
+`STALL_ITERATIONS` without a new best). Schedule
+and stopping depend only on the iteration count, so a fixed seed replays the
+same walk; wall-clock time (the run's deadline) is only a hard cap. Tabu memory is over moves, not states: after a subject leaves a
+cell it may not return there for `TABU_TENURE` iterations unless that yields
+a new best score.
+"""
+
+import math
+import time
+from typing import Dict, List, Optional, Tuple
+
+from algorithm import (
+    SolverContext, TimetableGrid, num_days, num_periods,
+    expand_unit, fix_remedial_at_end, is_section_complete, lab_can_start,
+    recount_subjects, solver_debug, swapped_unit_is_valid, timed_phase
+)
+
+UNMET_WEIGHT = 100
+GAP_WEIGHT = 3
+FREE_WEIGHT = 1
+
+TABU_TENURE = 25
+START_TEMPERATURE = 20.0
+END_TEMPERATURE = 0.2
+# Iterations per optimize call; the temperature reaches END_TEMPERATURE at the last one
+MAX_ITERATIONS = 10000
+# Give up on a section after this many iterations without a new best (a later attempt reshuffles it)
+STALL_ITERATIONS = 500
+
+# A move is the list of cell writes it made: (day, period, old_subject, new_subject)
+Move = List[Tuple[int, int, Optional[str], Optional[str]]]
+
+
+def section_faculties(ctx: SolverContext, section: str) -> List[str]:
+    """Faculties teaching any subject of `section`."""
+    faculty_of = ctx.faculty_codes(section)
+    codes = ctx.subject_table.codes
+    return sorted({faculty_of[codes[s]] for s in ctx.subjects_per_section[section] if s in codes} - {None})
+
+
+def section_score(ctx: SolverContext, section: str, timetable: TimetableGrid,
+                  faculties: List[str]) -> Tuple[int, int]:
+    """Return (score, unmet_hours) for one section's grid; lower score is better.
+
+    `faculties` (see section_faculties) are the teachers whose load balance is scored.
+    """
+    subjects = ctx.subjects_per_section[section]
+    unmet = 0
+    for subject, info in subjects.items():
+        unmet += max(0, info["hours"] - timetable.count(subject))
+
+    remedial = ctx.subject_table.codes.get("REMEDIAL", -1)
+    free = 0
+    gaps = 0
+    cells = timetable.cells
+    for day in range(num_days):
+        row = cells[day * num_periods:(day + 1) * num_periods]
+        last_class = 0
+        for period, code in enumerate(row, 1):
+            if code and code != remedial:
+                last_class = period
+        for period, code in enumerate(row, 1):
+            if not code or code == remedial:
+                free += 1
+                if period < last_class:
+                    gaps += 1
+
+    balance = 0
+    masks = ctx.occupancy.masks
+    for faculty in faculties:
+        if faculty in masks:
+            balance += sum(mask.bit_count() ** 2 for mask in masks[faculty])
+
+    return UNMET_WEIGHT * unmet + GAP_WEIGHT * gaps + FREE_WEIGHT * free + balance, unmet
+
+
+class AnnealSearch:
+    """State of one anneal_optimize call."""
+
+    def __init__(self, ctx: SolverContext, section: str, timetable: TimetableGrid,
+                 all_timetables: Dict[str, TimetableGrid]):
+        self.ctx = ctx
+        self.section = section
+        self.timetable = timetable
+        self.all_timetables = all_timetables
+        self.subjects = ctx.subjects_per_section[section]
+        self.constraints = ctx.constraints_for(section)
+        self.free_positions = [(d, p) for d in range(1, num_days + 1) for p in range(1, num_periods + 1)
+                               if (d, p) not in self.constraints.locked_cells]
+        # (subject, day, period) -> iteration until which placing subject there is tabu
+        self.tabu: Dict[Tuple[str, int, int], int] = {}
+
+    # ---------- applying and validating moves ----------
+    def write(self, move: Move, day: int, period: int, subject: Optional[str]):
+        old = self.timetable.get(day, period)
+        if old != subject:
+            move.append((day, period, old, subject))
+            self.timetable.set(day, period, subject)
+
+    def undo(self, move: Move):
+        for day, period, old, _ in reversed(move):
+            self.timetable.set(day, period, old)
+
+    def unit_allowed(self, unit: List[Tuple[int, int]], displaced: Optional[str] = None) -> bool:
+        """Hard rules for whatever subject now sits in `unit` (and for `displaced`, the one that left it)."""
+        day, period = unit[0]
+        subject = self.timetable.get(day, period)
+        if not subject:
+            return swapped_unit_is_valid(self.ctx, self.section, self.timetable, unit, displaced)
+        if any(self.constraints.is_forbidden(subject, d, p) for (d, p) in unit):
+            return False
+        if subject in ["MC1", "MC2"] and self.mc_taken_elsewhere(day):
+            return False
+        return swapped_unit_is_valid(self.ctx, self.section, self.timetable, unit, displaced)
+
+    def mc_taken_elsewhere(self, day: int) -> bool:
+        """MC1/MC2 must never overlap across sections."""
+        for other in self.ctx.mc_peers(self.section):
+            grid = self.all_timetables.get(other)
+            if other == self.section or grid is None or grid is self.timetable:
+                continue
+            if any(grid.get(day, p) in ["MC1", "MC2"] for p in (6, 7)):
+                return True
+        return False
+
+    def is_tabu(self, move: Move, iteration: int) -> bool:
+        return any(self.tabu.get((new, day, period), 0) > iteration
+                   for day, period, _, new in move if new)
+
+    def remember(self, move: Move, iteration: int):
+        for day, period, old, _ in move:
+            if old:
+                self.tabu[(old, day, period)] = iteration + TABU_TENURE
+
+    # ---------- move generators (each returns an applied, valid move or None) ----------
+    def unmet_subjects(self) -> List[str]:
+        timetable = self.timetable
+        return [s for s, info in self.subjects.items() if timetable.count(s) < info["hours"]]
+
+    def try_place(self, subject: str) -> Optional[Move]:
+        """Put an unmet subject into free cell(s)."""
+        rng = self.ctx.rng
+        info = self.subjects[subject]
+        for _ in range(8):
+            day, period = self.free_positions[rng.randrange(len(self.free_positions))]
+            unit = self.unit_for(subject, info, day, period)
+            if unit is None or any(self.timetable.get(d, p) is not None for (d, p) in unit):
+                continue
+            move: Move = []
+            for (d, p) in unit:
+                self.write(move, d, p, subject)
+            if self.unit_allowed(unit):
+                return move
+            self.undo(move)
+        return None
+
+    def try_evict(self, subject: str) -> Optional[Move]:
+        """Replace placed non-lab subject(s) with an unmet one; the evicted hours become unmet."""
+        rng = self.ctx.rng
+        info = self.subjects[subject]
+        for _ in range(8):
+            day, period = self.free_positions[rng.randrange(len(self.free_positions))]
+            unit = self.unit_for(subject, info, day, period)
+            if unit is None:
+                continue
+            occupants = [self.timetable.get(d, p) for (d, p) in unit]
+            if subject in occupants or any(o and self.subjects.get(o, {}).get("lab") for o in occupants):
+                continue
+            move: Move = []
+            for (d, p) in unit:
+                self.write(move, d, p, subject)
+            if self.unit_allowed(unit):
+                return move
+            self.undo(move)
+        return None
+
+    def try_swap(self) -> Optional[Move]:
+        """Exchange two equally long units (a lab block moves as a whole)."""
+        rng = self.ctx.rng
+        positions = self.free_positions
+        for _ in range(8):
+            d1, p1 = positions[rng.randrange(len(positions))]
+            d2, p2 = positions[rng.randrange(len(positions))]
+            unit1 = expand_unit(self.timetable, d1, p1)
+            unit2 = expand_unit(self.timetable, d2, p2)
+            if len(unit1) != len(unit2) or set(unit1) & set(unit2):
+                continue
+            locked = self.constraints.locked_cells
+            if any(cell in locked for cell in unit1 + unit2):
+                continue
+            vals1 = [self.timetable.get(d, p) for (d, p) in unit1]
+            vals2 = [self.timetable.get(d, p) for (d, p) in unit2]
+            if vals1 == vals2:
+                continue
+            move: Move = []
+            for idx, (d, p) in enumerate(unit1):
+                self.write(move, d, p, vals2[idx])
+            for idx, (d, p) in enumerate(unit2):
+                self.write(move, d, p, vals1[idx])
+            if self.unit_allowed(unit1, vals1[0]) and self.unit_allowed(unit2, vals2[0]):
+                return move
+            self.undo(move)
+        return None
+
+    def unit_for(self, subject: str, info: dict, day: int, period: int) -> Optional[List[Tuple[int, int]]]:
+        """Cells `subject` would occupy when placed at (day, period), or None if it cannot start there."""
+        if not info["lab"]:
+            return [(day, period)]
+        if not lab_can_start(self.ctx, subject, info, period) or (day, period + 1) in self.constraints.locked_cells:
+            return None
+        return [(day, period), (day, period + 1)]
+
+    def propose(self) -> Optional[Move]:
+        rng = self.ctx.rng
+        unmet = self.unmet_subjects()
+        if unmet:
+            subject = unmet[rng.randrange(len(unmet))]
+            roll = rng.random()
+            if roll < 0.5:
+                return self.try_place(subject) or self.try_swap()
+            if roll < 0.75:
+                return self.try_evict(subject) or self.try_swap()
+        return self.try_swap()
+
+
+@timed_phase("anneal")
+def anneal_optimize(ctx: SolverContext, section: str, timetable: TimetableGrid,
+                    counters: Dict[str, int], all_timetables: Dict[str, TimetableGrid],
+                    time_budget: Optional[float] = None) -> Tuple[TimetableGrid, Dict[str, int], bool]:
+    """Improve one section's timetable by simulated annealing; same contract as smart_optimize.
+
+    `time_budget` (seconds) and the run's deadline only cut the walk short. With
+    a deadline, the call gets an even share of the remaining time among the
+    optimizer calls its pass still has to make (ctx.optimize_calls_left, itself
+    included; all of it outside a pass).
+    """
+    started = time.perf_counter()
+    hard_stop = started + time_budget if time_budget is not None else None
+    if ctx.deadline is not None:
+        pending = ctx.optimize_calls_left or 1
+        share = started + max(0.0, ctx.deadline - started) / pending
+        hard_stop = share if hard_stop is None else min(hard_stop, share)
+    if ctx.debug:
+        solver_debug(ctx, f"→ ANNEALING for Section {section} (up to {MAX_ITERATIONS} iterations)")
+
+    search = AnnealSearch(ctx, section, timetable, all_timetables)
+    rng = ctx.rng
+    faculties = section_faculties(ctx, section)
+    score, unmet = section_score(ctx, section, timetable, faculties)
+    best_score, best_unmet = score, unmet
+    best_grid = timetable.copy()
+
+    iteration = 0
+    best_at = 0
+    while iteration < MAX_ITERATIONS and best_unmet > 0 and iteration - best_at < STALL_ITERATIONS:
+        if hard_stop is not None and time.perf_counter() >= hard_stop:
+            break
+        ctx.check_cancelled()
+        temperature = START_TEMPERATURE * (END_TEMPERATURE / START_TEMPERATURE) ** (iteration / MAX_ITERATIONS)
+        iteration += 1
+        ctx.iterations += 1
+
+        move = search.propose()
+        if not move:
+            continue
+        ctx.stats.count("anneal_moves_proposed")
+        new_score, new_unmet = section_score(ctx, section, timetable, faculties)
+        delta = new_score - score
+        improves_best = new_score < best_score
+
+        if search.is_tabu(move, iteration) and not improves_best:
+            search.undo(move)
+            continue
+        if delta <= 0 or rng.random() < math.exp(-delta / temperature):
+            ctx.stats.count("anneal_moves_accepted")
+            search.remember(move, iteration)
+            score, unmet = new_score, new_unmet
+            if improves_best:
+                best_score, best_unmet = new_score, new_unmet
+                best_grid = timetable.copy()
+                best_at = iteration
+        else:
+            search.undo(move)
+
+        if iteration % 500 == 0:
+            ctx.report_progress(event="iteration", iteration=iteration, score=best_score, deficit=best_unmet)
+
+    # Continue from the best grid seen, not wherever the walk ended
+    timetable.copy_from(best_grid)
+    if ctx.debug:
+        solver_debug(ctx, f"✓ Annealing for Section {section}: {iteration} iterations, "
+                          f"best score {best_score}, unmet hours {best_unmet}")
+
+    counters = recount_subjects(ctx, section, timetable)
+    success = is_section_complete(ctx, section, counters)
+    if not success:
+        fix_remedial_at_end(ctx, section, timetable)
+        counters = recount_subjects(ctx, section, timetable)
+    return timetable, counters, success
@@ -0,0 +1,19 @@
+from sqlalchemy import text
+
+from server import app, db
+
+# db.create_all() only creates missing tables, so columns and indexes added to
+# existing tables are applied here. Every statement is safe to run repeatedly.
+MIGRATIONS = [
+    # Solver seed recorded with each generated section timetable
+    "ALTER TABLE section_timetables ADD COLUMN IF NOT EXISTS seed BIGINT",
+    # Faculty directory loads (by college) and faculty name lookups within a college
+    "CREATE INDEX IF NOT EXISTS idx_faculty_college_name ON faculty (college_id, faculty_name)",
+]
+
+with app.app_context():
+    db.create_all()
+    for statement in MIGRATIONS:
+        db.session.execute(text(statement))
+    db.session.commit()
+    print("Database schema is up to date!")
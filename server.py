@@ -1,7 +1,14 @@
 #server.py
 import os
+import cProfile
+import json
 import logging
-from flask import Flask, jsonify, request, send_from_directory, session, render_template
+import pstats
+import queue
+import random
+import threading
+import time
+from flask import Flask, Response, g, has_app_context, jsonify, request, send_from_directory, session, render_template
 try:
     from flask_cors import CORS
 except ImportError:
@@ -14,6 +21,7 @@ except ImportError:
     )
     raise
 from datetime import timedelta
+from sqlalchemy import event, insert
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
@@ -21,20 +29,27 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(mess
 # Import database and models
 try:
     from app.models.database import (
-        db, Department, Admin, SectionTimetable, 
+        db, Department, Admin, SectionTimetable, SolverResult,
         Subject, SubjectConstraint, Faculty, FacultyTimetable, BreakConfiguration
     )
 except ImportError:
     logging.error("Failed to import from app.models. Make sure app folder structure is set up correctly.")
     raise
 
-# Import timetable generation function and faculty mapping from algorithm
+# Import timetable generation function from algorithm
 try:
-    from algorithm import store_section_timetables, faculties as algorithm_faculties, get_faculty_for_subject
+    from algorithm import (
+        store_section_timetables, store_college_timetables, repair_section_timetables,
+        TimetableInfeasibleError, GenerationCancelled, ENGINES, SolverContext, find_infeasibilities,
+        problem_fingerprint, normalize_stored_timetable, solution_quality, SolverStats
+    )
 except Exception as e:
     logging.exception("Failed to import from algorithm")
     raise ImportError("could not import required functions from algorithm") from e
 
+from generation_jobs import GenerationJobQueue
+from metrics_registry import MetricsRegistry
+
 # Simple .env loader (handles spaces)
 def load_local_env(path):
     if not os.path.exists(path):
@@ -72,6 +87,94 @@ db.init_app(app)
 with app.app_context():
     db.create_all()
 
+# ==================== METRICS ====================
+# Served in the Prometheus text format by GET /metrics; kept in this process's memory
+metrics_registry = MetricsRegistry()
+
+REQUEST_LATENCY = metrics_registry.histogram(
+    'timetable_http_request_duration_seconds', 'Time to build a response, by route',
+    ['method', 'route'], buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120))
+REQUESTS_TOTAL = metrics_registry.counter(
+    'timetable_http_requests_total', 'Responses sent, by route and status code', ['method', 'route', 'status'])
+REQUEST_DB_QUERIES = metrics_registry.histogram(
+    'timetable_http_request_db_queries', 'Database queries run while handling one request, by route',
+    ['method', 'route'], buckets=(0, 1, 2, 5, 10, 20, 50, 100, 200, 500))
+DB_QUERIES_TOTAL = metrics_registry.counter(
+    'timetable_db_queries_total', 'Database queries run, including generation jobs outside requests')
+
+GENERATION_DURATION = metrics_registry.histogram(
+    'timetable_generation_duration_seconds', 'Time to generate and store one department, by engine and outcome',
+    ['engine', 'outcome'], buckets=(0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 30, 60, 120, 300))
+GENERATIONS_TOTAL = metrics_registry.counter(
+    'timetable_generations_total', 'Department generations, by engine and outcome', ['engine', 'outcome'])
+GENERATION_REMEDIAL_CELLS = metrics_registry.histogram(
+    'timetable_generation_remedial_cells_per_section', 'REMEDIAL filler cells per section of a generated department',
+    ['engine'], buckets=(0, 1, 2, 3, 5, 8, 12, 16, 20, 25, 35))
+GENERATION_SCORE = metrics_registry.histogram(
+    'timetable_generation_score_percent', 'Share of required hours placed in a generated department',
+    ['engine'], buckets=(50, 75, 90, 95, 98, 99, 100))
+SOLVER_CACHE_LOOKUPS = metrics_registry.counter(
+    'timetable_solver_cache_lookups_total', 'Result cache lookups before solving, by result (hit or miss)', ['result'])
+
+def solver_cache_hit_ratio():
+    hits, misses = SOLVER_CACHE_LOOKUPS.get(result='hit'), SOLVER_CACHE_LOOKUPS.get(result='miss')
+    return hits / (hits + misses) if hits + misses else None
+
+metrics_registry.gauge('timetable_solver_cache_hit_ratio', 'Share of cache lookups that found a stored solution',
+                       solver_cache_hit_ratio)
+FACULTY_DIRECTORY_LOOKUPS = metrics_registry.counter(
+    'timetable_faculty_directory_lookups_total', 'Faculty directory reads, by result (hit or miss)', ['result'])
+
+def count_db_query(conn, cursor, statement, parameters, context, executemany):
+    DB_QUERIES_TOTAL.inc()
+    if has_app_context():
+        g.db_queries = g.get('db_queries', 0) + 1
+
+with app.app_context():
+    event.listen(db.engine, 'before_cursor_execute', count_db_query)
+
+@app.before_request
+def start_request_metrics():
+    g.request_started = time.perf_counter()
+    g.db_queries = 0
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.get('request_started')
+    if started is not None:
+        # Unmatched URLs share one label so stray paths cannot grow the series without bound
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        REQUEST_LATENCY.observe(time.perf_counter() - started, method=request.method, route=route)
+        REQUESTS_TOTAL.inc(method=request.method, route=route, status=response.status_code)
+        REQUEST_DB_QUERIES.observe(g.get('db_queries', 0), method=request.method, route=route)
+    return response
+
+def generation_outcome(body, status):
+    """Outcome label of one run_generation result."""
+    if body.get('ok'):
+        if body.get('cached'):
+            return 'cached'
+        return 'complete' if body.get('quality', {}).get('complete') else 'incomplete'
+    if body.get('cancelled'):
+        return 'cancelled'
+    return {400: 'rejected', 422: 'infeasible', 504: 'timeout'}.get(status, 'error')
+
+def record_generation_metrics(options, body, status, seconds):
+    engine = options['engine']
+    outcome = generation_outcome(body, status)
+    GENERATIONS_TOTAL.inc(engine=engine, outcome=outcome)
+    GENERATION_DURATION.observe(seconds, engine=engine, outcome=outcome)
+    quality = body.get('quality')
+    # Quality distributions describe the solver, so cache hits are left out
+    if outcome in ('complete', 'incomplete') and quality and body.get('sections'):
+        GENERATION_REMEDIAL_CELLS.observe(quality['remedial_cells'] / len(body['sections']), engine=engine)
+        GENERATION_SCORE.observe(quality['score'], engine=engine)
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Request, database, solver and cache metrics in the Prometheus text format."""
+    return Response(metrics_registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 def extract_faculty_timetables(section_timetables, faculties, subjects_per_section, dept_name, college_id):
     """Extract individual faculty timetables from section timetables.
     
@@ -130,6 +233,48 @@ def extract_faculty_timetables(section_timetables, faculties, subjects_per_secti
     logging.info(f"Extracted {len(faculty_timetables)} faculty timetables (combined format)")
     return faculty_timetables
 
+def assemble_timetable_data(sections, subjects):
+    """Build (subjects_per_section, faculties) from a department's sections and its Subject rows."""
+    # Build subjects_per_section dictionary
+    # Structure: {section: {subject_name: {hours, lab, last}, ...}, ...}
+    subjects_per_section = {}
+    faculties = {}
+    
+    for section in sections:
+        subjects_per_section[section] = {}
+    
+    # Process each subject
+    for subject in subjects:
+        section = subject.section
+        
+        # Only include subjects for sections that exist in the department
+        if section not in subjects_per_section:
+            logging.warning(f"Subject {subject.subject_name} has section {section} not in department sections {sections}")
+            continue
+        
+        subject_info = {
+            'hours': subject.hours,
+            'lab': bool(subject.lab),
+            'last': bool(subject.last)
+        }
+        
+        subjects_per_section[section][subject.subject_name] = subject_info
+        
+        # Build faculties mapping (pick first one if multiple rows)
+        if subject.subject_name not in faculties:
+            faculties[subject.subject_name] = subject.faculty_name
+    
+    # Add REMEDIAL subject for each section if not already present
+    for section in sections:
+        if 'REMEDIAL' not in subjects_per_section[section]:
+            subjects_per_section[section]['REMEDIAL'] = {
+                'hours': 1,
+                'lab': False,
+                'last': False
+            }
+    
+    return subjects_per_section, faculties
+
 def build_timetable_data_from_db(dept_name: str, college_id: str):
     """
     Fetch subject and faculty data from database and build the 3 data structures
@@ -160,43 +305,7 @@ def build_timetable_data_from_db(dept_name: str, college_id: str):
             logging.error(f"No subjects found for department {dept_name}")
             return None, None, None
         
-        # Build subjects_per_section dictionary
-        # Structure: {section: {subject_name: {hours, lab, last}, ...}, ...}
-        subjects_per_section = {}
-        faculties = {}
-        
-        for section in sections:
-            subjects_per_section[section] = {}
-        
-        # Process each subject
-        for subject in subjects:
-            section = subject.section
-            
-            # Only include subjects for sections that exist in the department
-            if section not in subjects_per_section:
-                logging.warning(f"Subject {subject.subject_name} has section {section} not in department sections {sections}")
-                continue
-            
-            subject_info = {
-                'hours': subject.hours,
-                'lab': bool(subject.lab),
-                'last': bool(subject.last)
-            }
-            
-            subjects_per_section[section][subject.subject_name] = subject_info
-            
-            # Build faculties mapping (pick first one if multiple rows)
-            if subject.subject_name not in faculties:
-                faculties[subject.subject_name] = subject.faculty_name
-        
-        # Add REMEDIAL subject for each section if not already present
-        for section in sections:
-            if 'REMEDIAL' not in subjects_per_section[section]:
-                subjects_per_section[section]['REMEDIAL'] = {
-                    'hours': 1,
-                    'lab': False,
-                    'last': False
-                }
+        subjects_per_section, faculties = assemble_timetable_data(sections, subjects)
         
         logging.info(f"Built timetable data for {dept_name}:")
         logging.info(f"  Sections: {sections}")
@@ -209,6 +318,30 @@ def build_timetable_data_from_db(dept_name: str, college_id: str):
         logging.exception("Error building timetable data from database")
         return None, None, None
 
+def assemble_constraints(constraints):
+    """Build (strict_constraints, forbidden_constraints) from SubjectConstraint rows."""
+    strict_constraints = {}
+    forbidden_constraints = {}
+    
+    for constraint in constraints:
+        # Select target dict based on constraint type
+        target_dict = strict_constraints if constraint.constraint_type == 'strict' else forbidden_constraints
+        
+        # Initialize section if needed
+        if constraint.section not in target_dict:
+            target_dict[constraint.section] = {}
+        
+        # Initialize subject if needed
+        if constraint.subject not in target_dict[constraint.section]:
+            target_dict[constraint.section][constraint.subject] = []
+        
+        # Add the (day, period) tuple - ensure integers
+        day_val = int(constraint.day) if isinstance(constraint.day, str) else constraint.day
+        period_val = int(constraint.period) if isinstance(constraint.period, str) else constraint.period
+        target_dict[constraint.section][constraint.subject].append((day_val, period_val))
+    
+    return strict_constraints, forbidden_constraints
+
 def build_constraints_from_db(dept_name: str, college_id: str):
     """
     Fetch constraints from database and build the constraint dictionaries
@@ -223,25 +356,7 @@ def build_constraints_from_db(dept_name: str, college_id: str):
             dept_name=dept_name, college_id=college_id
         ).all()
         
-        strict_constraints = {}
-        forbidden_constraints = {}
-        
-        for constraint in constraints:
-            # Select target dict based on constraint type
-            target_dict = strict_constraints if constraint.constraint_type == 'strict' else forbidden_constraints
-            
-            # Initialize section if needed
-            if constraint.section not in target_dict:
-                target_dict[constraint.section] = {}
-            
-            # Initialize subject if needed
-            if constraint.subject not in target_dict[constraint.section]:
-                target_dict[constraint.section][constraint.subject] = []
-            
-            # Add the (day, period) tuple - ensure integers
-            day_val = int(constraint.day) if isinstance(constraint.day, str) else constraint.day
-            period_val = int(constraint.period) if isinstance(constraint.period, str) else constraint.period
-            target_dict[constraint.section][constraint.subject].append((day_val, period_val))
+        strict_constraints, forbidden_constraints = assemble_constraints(constraints)
         
         logging.info(f"Built constraints for {dept_name}: {len(constraints)} total constraints")
         logging.info(f"  Strict constraints: {strict_constraints}")
@@ -252,6 +367,13 @@ def build_constraints_from_db(dept_name: str, college_id: str):
         logging.exception("Error building constraints from database")
         return {}, {}
 
+def break_config_to_dict(break_config):
+    """The solver's break_config dict for a BreakConfiguration row."""
+    return {
+        'first_break_period': int(break_config.first_break_period),
+        'lunch_break_period': int(break_config.lunch_break_period)
+    }
+
 def get_break_configuration(dept_name: str, college_id: str):
     """
     Fetch break configuration for a department.
@@ -266,10 +388,7 @@ def get_break_configuration(dept_name: str, college_id: str):
         ).first()
         
         if break_config:
-            return {
-                'first_break_period': int(break_config.first_break_period),
-                'lunch_break_period': int(break_config.lunch_break_period)
-            }
+            return break_config_to_dict(break_config)
         else:
             # Return None if not configured - user must configure breaks first
             return None
@@ -279,148 +398,976 @@ def get_break_configuration(dept_name: str, college_id: str):
         # Return None if error - don't use defaults
         return None
 
+FLAG_VALUES = {'true': True, '1': True, 'yes': True, 'on': True,
+               'false': False, '0': False, 'no': False, 'off': False}
+
+def parse_flag(value):
+    """Read a boolean request option; JSON booleans, 0/1 and "true"/"false"-style strings.
+
+    Raises ValueError for anything else, so "false" cannot silently mean True.
+    """
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, int) and value in (0, 1):
+        return bool(value)
+    if isinstance(value, str) and value.strip().lower() in FLAG_VALUES:
+        return FLAG_VALUES[value.strip().lower()]
+    raise ValueError(value)
+
+def parse_generation_options(data):
+    """Validate the solver options of a generation request.
+
+    Returns (options, None) on success or (None, error_message) if the request is invalid.
+    """
+    # Solver engine: "greedy" (default), "cpsat" or "anneal"; num_workers only applies to cpsat
+    engine = data.get('engine', 'greedy')
+    if engine not in ENGINES:
+        return None, f'Unknown engine "{engine}". Use one of: {", ".join(ENGINES)}'
+    try:
+        # Wall-clock budget for the solve, in seconds (time_limit) or milliseconds (time_limit_ms);
+        # past it the best timetables found so far are returned. GENERATION_TIME_LIMIT_MS sets a default.
+        time_limit = float(data['time_limit']) if data.get('time_limit') is not None else None
+        time_limit_ms = data.get('time_limit_ms', os.getenv('GENERATION_TIME_LIMIT_MS'))
+        if time_limit is None and time_limit_ms:
+            time_limit = float(time_limit_ms) / 1000
+        num_workers = int(data['num_workers']) if data.get('num_workers') is not None else None
+        # Greedy engine: run restarts in parallel on this many processes (falls back to the env default)
+        multistart_workers = data.get('multistart_workers', os.getenv('TIMETABLE_MULTISTART_WORKERS'))
+        multistart_workers = int(multistart_workers) if multistart_workers else None
+        # Seed for the solver's random source; recorded with the timetables so the run can be replayed
+        seed = int(data['seed']) if data.get('seed') is not None else random.randrange(2**31)
+    except (TypeError, ValueError):
+        return None, 'time_limit, time_limit_ms, num_workers, multistart_workers and seed must be numbers'
+    try:
+        # Unset (or null) flags take their default: use_cache on, the rest off
+        flags = {name: parse_flag(data[name]) if data.get(name) is not None else name == 'use_cache'
+                 for name in ('use_cache', 'debug', 'profile', 'joint')}
+    except ValueError:
+        return None, 'use_cache, debug, profile and joint must be true or false'
+    return {
+        'engine': engine,
+        'time_limit': time_limit,
+        'num_workers': num_workers,
+        'multistart_workers': multistart_workers,
+        'seed': seed,
+        # An explicit seed only reuses a cached solution solved with that same seed
+        'seed_fixed': data.get('seed') is not None,
+        # Reuse the stored solution when the inputs have not changed since it was solved
+        'use_cache': flags['use_cache'],
+        # Collect the solver's debug trace for this request and return it as debug_log
+        'debug': flags['debug'],
+        # Run the solve under cProfile; the .prof file goes to PROFILE_DIR and a summary into metrics
+        'profile': flags['profile'],
+        # Repair all sections together instead of one after another (greedy/anneal engines)
+        'joint': flags['joint']
+    }, None
+
+def load_generation_inputs(dept_name, college_id):
+    """Fetch everything the solver needs for one department from the database.
+
+    Returns (inputs, None) where inputs is a dict of sections, subjects_per_section,
+    faculties, strict_constraints, forbidden_constraints and break_config, or
+    (None, (response_body, http_status)) if the department is not ready to generate.
+    """
+    # Fetch and build timetable data from database
+    sections, subjects_per_section, faculties = build_timetable_data_from_db(dept_name, college_id)
+
+    if sections is None or subjects_per_section is None or faculties is None:
+        # Provide more specific error information
+        dept = Department.query.filter_by(name=dept_name, college_id=college_id).first()
+        if not dept:
+            error_msg = f'Department "{dept_name}" not found in college "{college_id}"'
+        elif not dept.sections:
+            error_msg = f'Department "{dept_name}" has no sections defined'
+        else:
+            error_msg = f'No subjects found for department "{dept_name}". Please add subjects first.'
+        return None, ({'ok': False, 'error': error_msg}, 400)
+
+    logging.info(f"Successfully fetched data. Sections: {sections}, Subjects: {len(subjects_per_section)}")
+
+    # Fetch and build constraints from database
+    strict_constraints, forbidden_constraints = build_constraints_from_db(dept_name, college_id)
+    logging.info(f"Loaded constraints - Strict: {len(str(strict_constraints))}, Forbidden: {len(str(forbidden_constraints))}")
+
+    # Fetch break configuration for this department
+    break_config = get_break_configuration(dept_name, college_id)
+
+    # Check if break configuration is set
+    if break_config is None:
+        logging.error(f"Break configuration not set for {dept_name}")
+        return None, ({'ok': False, 'error': 'Please configure break timings before generating timetables'}, 400)
+
+    logging.info(f"Loaded break configuration: {break_config}")
+    return {
+        'sections': sections,
+        'subjects_per_section': subjects_per_section,
+        'faculties': faculties,
+        'strict_constraints': strict_constraints,
+        'forbidden_constraints': forbidden_constraints,
+        'break_config': break_config
+    }, None
+
+# ==================== RESULT CACHE ====================
+# Most-recently-used solutions kept per department; older ones are evicted
+SOLVER_CACHE_SIZE = int(os.getenv('SOLVER_CACHE_SIZE', 20))
+
+def generation_fingerprint(inputs, options):
+    """Fingerprint of a department's solver inputs and the options that change the solution (not the seed)."""
+    return problem_fingerprint(
+        inputs['sections'], inputs['subjects_per_section'], inputs['faculties'],
+        inputs['strict_constraints'], inputs['forbidden_constraints'], inputs['break_config'],
+        engine=options['engine'], time_limit=options['time_limit'], joint=options.get('joint', False)
+    )
+
+def find_cached_solution(dept_name, college_id, fingerprint, seed=None):
+    """Most recently used SolverResult for this fingerprint (and seed, if given), or None."""
+    query = SolverResult.query.filter_by(college_id=college_id, dept_name=dept_name, fingerprint=fingerprint)
+    if seed is not None:
+        query = query.filter_by(seed=seed)
+    return query.order_by(SolverResult.last_used_at.desc(), SolverResult.id.desc()).first()
+
+def remember_solution(dept_name, college_id, fingerprint, seed, section_timetables):
+    """Add a solution to the department's cache and evict the least recently used beyond SOLVER_CACHE_SIZE.
+
+    Joins the caller's transaction; the caller commits.
+    """
+    entry = find_cached_solution(dept_name, college_id, fingerprint, seed)
+    if entry is None:
+        db.session.add(SolverResult(college_id=college_id, dept_name=dept_name, fingerprint=fingerprint,
+                                    seed=seed, timetables=section_timetables, hits=0))
+    else:
+        entry.timetables = section_timetables
+        entry.last_used_at = db.func.now()
+    db.session.flush()
+
+    stale = SolverResult.query.filter_by(college_id=college_id, dept_name=dept_name)\
+        .order_by(SolverResult.last_used_at.desc(), SolverResult.id.desc()).offset(SOLVER_CACHE_SIZE).all()
+    for old in stale:
+        db.session.delete(old)
+
+def forget_cached_solutions(dept_name, college_id):
+    """Drop every cached solution of a department (joins the caller's transaction)."""
+    SolverResult.query.filter_by(college_id=college_id, dept_name=dept_name).delete(synchronize_session=False)
+
+def stored_timetables_match(dept_name, college_id, section_timetables):
+    """True if the department's stored section rows already hold exactly these timetables."""
+    rows = SectionTimetable.query.filter_by(dept_name=dept_name, college_id=college_id).all()
+    stored = {row.section_name: normalize_stored_timetable(row.timetable) for row in rows
+              if isinstance(row.timetable, dict)}
+    return len(rows) == len(section_timetables) and stored == section_timetables
+
+# ==================== FACULTY DIRECTORY ====================
+# Per-college faculty lookup tables, loaded with one query and dropped whenever this process
+# changes a faculty row; the TTL bounds staleness from writes made by other server processes
+FACULTY_DIRECTORY_TTL_SECONDS = float(os.getenv('FACULTY_DIRECTORY_TTL_SECONDS', 300))
+faculty_directories = {}
+# college_id -> invalidation count; a load that raced an invalidation is not cached
+faculty_directory_generations = {}
+faculty_directories_lock = threading.Lock()
+
+def faculty_directory(college_id):
+    """{'by_id': {faculty_id: faculty.to_dict()}, 'ids_by_name': {faculty_name: faculty_id}} for a college.
+
+    Duplicate names resolve to the lowest faculty_id. Treat the result as read-only.
+    """
+    now = time.monotonic()
+    with faculty_directories_lock:
+        directory = faculty_directories.get(college_id)
+        generation = faculty_directory_generations.get(college_id, 0)
+    if directory is not None and now - directory['loaded_at'] < FACULTY_DIRECTORY_TTL_SECONDS:
+        FACULTY_DIRECTORY_LOOKUPS.inc(result='hit')
+        return directory
+    FACULTY_DIRECTORY_LOOKUPS.inc(result='miss')
+
+    by_id, ids_by_name = {}, {}
+    for faculty in Faculty.query.filter_by(college_id=college_id).order_by(Faculty.faculty_id).all():
+        by_id[faculty.faculty_id] = faculty.to_dict()
+        ids_by_name.setdefault(faculty.faculty_name, faculty.faculty_id)
+    directory = {'by_id': by_id, 'ids_by_name': ids_by_name, 'loaded_at': now}
+    with faculty_directories_lock:
+        # An invalidation during the query may have made these rows stale: use them, don't keep them
+        if faculty_directory_generations.get(college_id, 0) == generation:
+            faculty_directories[college_id] = directory
+    return directory
+
+def invalidate_faculty_directory(college_id):
+    """Forget a college's cached directory; call after committing any change to its faculty rows."""
+    with faculty_directories_lock:
+        faculty_directories.pop(college_id, None)
+        faculty_directory_generations[college_id] = faculty_directory_generations.get(college_id, 0) + 1
+
+# ==================== PERSISTENCE ====================
+
+def insert_department_timetables(college_id, dept_name, section_timetables, faculty_timetables,
+                                 faculty_ids_by_name, seed):
+    """Insert a department's section and faculty timetable rows with one INSERT ... RETURNING per table.
+
+    Joins the caller's transaction; the caller deletes the old rows first and commits.
+    Returns (section_ids, faculty_ids) in the order of the given timetables.
+    """
+    section_ids = []
+    if section_timetables:
+        section_ids = db.session.scalars(
+            insert(SectionTimetable).returning(SectionTimetable.id, sort_by_parameter_order=True),
+            [{'section_name': section, 'dept_name': dept_name, 'college_id': college_id,
+              'timetable': timetable, 'seed': seed}
+             for section, timetable in section_timetables.items()]
+        ).all()
+
+    faculty_rows = []
+    for faculty_name, timetable in faculty_timetables.items():
+        faculty_id = faculty_ids_by_name.get(faculty_name)
+        if not faculty_id:
+            logging.warning(f"Faculty {faculty_name} not found in database for college {college_id}, skipping")
+            continue
+        # Stored as a single combined timetable (not section-wise)
+        faculty_rows.append({'college_id': college_id, 'dept_name': dept_name, 'section': 'ALL',
+                             'faculty_id': faculty_id, 'faculty_name': faculty_name, 'timetable': timetable})
+    faculty_ids = []
+    if faculty_rows:
+        faculty_ids = db.session.scalars(
+            insert(FacultyTimetable).returning(FacultyTimetable.id, sort_by_parameter_order=True), faculty_rows
+        ).all()
+    return section_ids, faculty_ids
+
+def replace_department_timetables(college_id, dept_name, section_timetables, faculties, subjects_per_section,
+                                  seed):
+    """Swap a department's stored section and faculty timetables for new ones, without committing.
+
+    Old rows are deleted and new ones inserted in the caller's transaction, so
+    readers keep seeing the previous timetables until the caller commits.
+    Faculty ids come from the college's cached faculty_directory.
+    Returns (section_ids, faculty_ids).
+    """
+    faculty_timetables = extract_faculty_timetables(section_timetables, faculties, subjects_per_section,
+                                                    dept_name, college_id)
+    faculty_ids_by_name = faculty_directory(college_id)['ids_by_name']
+    SectionTimetable.query.filter_by(dept_name=dept_name, college_id=college_id).delete(synchronize_session=False)
+    FacultyTimetable.query.filter_by(dept_name=dept_name, college_id=college_id).delete(synchronize_session=False)
+    return insert_department_timetables(college_id, dept_name, section_timetables, faculty_timetables,
+                                        faculty_ids_by_name, seed)
+
+# ==================== GENERATION METRICS ====================
+# One JSON line per generation (timings, counters, quality); METRICS_LOG='' turns the file off
+METRICS_LOG = os.getenv('METRICS_LOG', 'solver_metrics.jsonl')
+# Where profile=true requests leave their cProfile dumps (open with pstats or snakeviz)
+PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+PROFILE_TOP_FUNCTIONS = 15
+
+metrics_logger = logging.getLogger('timetable.metrics')
+metrics_logger.propagate = False
+metrics_logger.setLevel(logging.INFO)
+if METRICS_LOG and not metrics_logger.handlers:
+    _metrics_handler = logging.FileHandler(METRICS_LOG, encoding='utf8', delay=True)
+    _metrics_handler.setFormatter(logging.Formatter('%(message)s'))
+    metrics_logger.addHandler(_metrics_handler)
+
+def profile_summary(profiler, dept_name, seed):
+    """Dump a finished cProfile run to PROFILE_DIR and return its file and top functions by cumulative time."""
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    safe_dept = ''.join(c if c.isalnum() else '_' for c in dept_name)
+    path = os.path.join(PROFILE_DIR, f"{safe_dept}-{time.strftime('%Y%m%d-%H%M%S')}-{seed}.prof")
+    profiler.dump_stats(path)
+
+    stats = pstats.Stats(profiler).sort_stats(pstats.SortKey.CUMULATIVE)
+    top = []
+    for func in stats.fcn_list[:PROFILE_TOP_FUNCTIONS]:
+        _, calls, total_time, cumulative_time, _ = stats.stats[func]
+        filename, line, name = func
+        top.append({
+            'function': f"{os.path.basename(filename)}:{line}({name})",
+            'calls': calls,
+            'tottime_ms': round(total_time * 1000, 2),
+            'cumtime_ms': round(cumulative_time * 1000, 2)
+        })
+    return {'file': path, 'top': top}
+
+def log_generation_metrics(dept_name, college_id, options, body, status, metrics):
+    """Append one generation's metrics to the metrics log as a JSON line."""
+    record = {
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'college_id': college_id,
+        'dept_name': dept_name,
+        'engine': options['engine'],
+        'seed': body.get('seed', options['seed']),
+        'http_status': status,
+        'cached': body.get('cached'),
+        'fingerprint': body.get('fingerprint'),
+        'sections': len(body.get('sections', [])),
+        'quality': body.get('quality'),
+        'metrics': metrics
+    }
+    try:
+        metrics_logger.info(json.dumps(record, default=str))
+    except Exception:
+        logging.exception("Failed to write generation metrics")
+
+def run_generation(dept_name, college_id, options, progress=None, cancel=None):
+    """Generate and store the timetables of one department.
+
+    Shared by the synchronous /generate-timetable route and the generation job
+    workers; needs an application context. `progress` is an optional callable
+    receiving solver progress snapshots; `cancel` an optional cancel token that
+    stops the solve (409, nothing stored).
+
+    Unless the request opts out (use_cache=false) or asks for a debug trace, a
+    solution cached for the same inputs is reused instead of solving again; if
+    it is also what is stored already, nothing is rewritten.
+
+    Successful responses carry `metrics`: wall/CPU time per phase (loading
+    inputs, the solver's own phases, persistence), solver counters and the
+    total; every run is also written to the metrics log.
+
+    Returns (response_body, http_status).
+    """
+    stats = SolverStats()
+    started = time.perf_counter()
+    body, status = generate_and_store(dept_name, college_id, options, stats, progress, cancel)
+
+    elapsed = time.perf_counter() - started
+    metrics = stats.to_dict()
+    metrics['total_ms'] = round(elapsed * 1000, 2)
+    if 'profile' in body:
+        metrics['profile'] = body.pop('profile')
+    if body.get('ok'):
+        body['metrics'] = metrics
+    log_generation_metrics(dept_name, college_id, options, body, status, metrics)
+    record_generation_metrics(options, body, status, elapsed)
+    return body, status
+
+def raise_if_cancelled(cancel):
+    """Raise GenerationCancelled once a run's cancel token is set (the solver's check, for the code around it)."""
+    if cancel is not None and cancel.is_set():
+        raise GenerationCancelled()
+
+def generate_and_store(dept_name, college_id, options, stats, progress=None, cancel=None):
+    """Body of run_generation; adds its phase timings and the solver's to `stats`."""
+    engine = options['engine']
+    seed = options['seed']
+    logging.info(f"Generating timetables for {dept_name} in college {college_id} (engine={engine}, seed={seed})")
+
+    try:
+        with stats.phase('load_inputs'):
+            inputs, error = load_generation_inputs(dept_name, college_id)
+        if error:
+            return error
+        subjects_per_section = inputs['subjects_per_section']
+        faculties = inputs['faculties']
+
+        fingerprint = generation_fingerprint(inputs, options)
+        trace = [] if options.get('debug') else None
+        profile = None
+        cached = None
+        # A debug trace or profile is only worth anything for a real solve
+        if options.get('use_cache', True) and trace is None and not options.get('profile'):
+            cached = find_cached_solution(dept_name, college_id, fingerprint,
+                                          seed if options.get('seed_fixed') else None)
+            SOLVER_CACHE_LOOKUPS.inc(result='hit' if cached is not None else 'miss')
+
+        if cached is not None:
+            seed = cached.seed
+            # JSONB does not keep key order; list the sections in department order
+            section_timetables = {section: normalize_stored_timetable(cached.timetables[section])
+                                  for section in inputs['sections']}
+            cached.hits += 1
+            cached.last_used_at = db.func.now()
+            logging.info(f"Reusing cached solution {cached.id} for {dept_name} (fingerprint {fingerprint[:12]}, seed {seed})")
+
+            quality = solution_quality(subjects_per_section, section_timetables)
+            if stored_timetables_match(dept_name, college_id, section_timetables):
+                db.session.commit()
+                section_ids = [row.id for row in SectionTimetable.query.filter_by(
+                    dept_name=dept_name, college_id=college_id).order_by(SectionTimetable.id).all()]
+                faculty_ids = [row.id for row in FacultyTimetable.query.filter_by(
+                    dept_name=dept_name, college_id=college_id).order_by(FacultyTimetable.id).all()]
+                return {
+                    'ok': True,
+                    'message': 'Timetables are up to date',
+                    'ids': section_ids,
+                    'faculty_ids': faculty_ids,
+                    'sections': list(section_timetables.keys()),
+                    'seed': seed,
+                    'cached': True,
+                    'fingerprint': fingerprint,
+                    'quality': quality
+                }, 200
+        else:
+            # Generate timetables using the algorithm with dynamic data and constraints
+            quality = {}
+            profiler = cProfile.Profile() if options.get('profile') else None
+            with stats.phase('solve'):
+                if profiler is not None:
+                    profiler.enable()
+                try:
+                    section_timetables = store_section_timetables(
+                        section_list=inputs['sections'],
+                        subjects_dict=subjects_per_section,
+                        faculty_dict=faculties,
+                        strict_constraints=inputs['strict_constraints'],
+                        forbidden_constraints=inputs['forbidden_constraints'],
+                        break_config=inputs['break_config'],
+                        engine=engine,
+                        time_limit=options['time_limit'],
+                        num_workers=options['num_workers'],
+                        multistart_workers=options['multistart_workers'],
+                        seed=seed,
+                        progress=progress,
+                        trace=trace,
+                        joint=options.get('joint', False),
+                        report=quality,
+                        cancel=cancel
+                    )
+                finally:
+                    if profiler is not None:
+                        profiler.disable()
+            # The solver's phases and counters go to metrics; quality keeps the solution's scores
+            stats.merge({key: quality.pop(key, {}) for key in ('phases', 'counters')})
+            if profiler is not None:
+                profile = profile_summary(profiler, dept_name, seed)
+            logging.info(f"Solved {dept_name} with quality {quality}")
+
+            if not section_timetables:
+                logging.error(f"Algorithm returned empty timetables for {dept_name}")
+                return {'ok': False, 'error': 'Timetable generation returned empty results'}, 400
+
+            # Replay only complete solutions: with a random seed the next press may place every hour.
+            # A fixed seed reproduces its result anyway, unless the time budget cut the run short.
+            if quality['complete'] or (options.get('seed_fixed') and not quality['budget_exhausted']):
+                remember_solution(dept_name, college_id, fingerprint, seed, section_timetables)
+
+        # One transaction (with the cache entry above): readers never see the department half-replaced.
+        # A run cancelled or superseded meanwhile (also on a cache hit, which never polls) stores nothing.
+        with stats.phase('persist'):
+            raise_if_cancelled(cancel)
+            inserted_ids, faculty_ids = replace_department_timetables(
+                college_id, dept_name, section_timetables, faculties, subjects_per_section, seed)
+            raise_if_cancelled(cancel)
+            db.session.commit()
+        logging.info("Inserted timetables with ids=%s for sections=%s and faculty timetables with ids=%s",
+                     inserted_ids, list(section_timetables.keys()), faculty_ids)
+
+        body = {
+            'ok': True,
+            'message': 'Timetables generated and stored successfully',
+            'ids': inserted_ids,
+            'faculty_ids': faculty_ids,
+            'sections': list(section_timetables.keys()),
+            'seed': seed,
+            'cached': cached is not None,
+            'fingerprint': fingerprint,
+            'quality': quality
+        }
+        if trace is not None:
+            body['debug_log'] = trace
+        if profile is not None:
+            body['profile'] = profile
+        return body, 201
+
+    except TimetableInfeasibleError as infeasible:
+        logging.warning(f"No feasible timetable for {dept_name}: {infeasible}")
+        db.session.rollback()
+        return {'ok': False, 'error': f'No valid timetable exists: {infeasible}', 'problems': infeasible.problems}, 422
+    except TimeoutError as timeout:
+        logging.warning(f"Timetable generation timed out for {dept_name}: {timeout}")
+        db.session.rollback()
+        return {'ok': False, 'error': str(timeout)}, 504
+    except GenerationCancelled:
+        logging.info(f"Timetable generation for {dept_name} was cancelled")
+        db.session.rollback()
+        return {'ok': False, 'error': 'Timetable generation was cancelled', 'cancelled': True}, 409
+    except Exception as algo_error:
+        logging.exception("Error during timetable generation")
+        db.session.rollback()
+        return {'ok': False, 'error': f'Timetable generation failed: {str(algo_error)}'}, 500
+
 @app.route('/generate-timetable', methods=['POST'])
 def generate_timetable():
     try:
         data = request.get_json()
         dept_name = data.get('dept_name')
         college_id = data.get('college_id')
-        
+
         if not dept_name or not college_id:
             return jsonify({'ok': False, 'error': 'Department name and college ID are required'}), 400
-        
-        logging.info(f"Generating timetables for {dept_name} in college {college_id}")
-        
+
+        options, error = parse_generation_options(data)
+        if error:
+            return jsonify({'ok': False, 'error': error}), 400
+
+        # A newer generation of this department (sync or job) cancels this one
+        key = generation_key(dept_name, college_id)
+        cancel = generation_jobs.claim(key)
         try:
-            # Fetch and build timetable data from database
-            sections, subjects_per_section, faculties = build_timetable_data_from_db(dept_name, college_id)
-            
-            if sections is None or subjects_per_section is None or faculties is None:
-                # Provide more specific error information
-                dept = Department.query.filter_by(name=dept_name, college_id=college_id).first()
-                if not dept:
-                    error_msg = f'Department "{dept_name}" not found in college "{college_id}"'
-                elif not dept.sections:
-                    error_msg = f'Department "{dept_name}" has no sections defined'
-                else:
-                    error_msg = f'No subjects found for department "{dept_name}". Please add subjects first.'
-                return jsonify({'ok': False, 'error': error_msg}), 400
-            
-            logging.info(f"Successfully fetched data. Sections: {sections}, Subjects: {len(subjects_per_section)}")
-            
-            # Fetch and build constraints from database
-            strict_constraints, forbidden_constraints = build_constraints_from_db(dept_name, college_id)
-            logging.info(f"Loaded constraints - Strict: {len(str(strict_constraints))}, Forbidden: {len(str(forbidden_constraints))}")
-            
-            # Fetch break configuration for this department
-            break_config = get_break_configuration(dept_name, college_id)
-            
-            # Check if break configuration is set
-            if break_config is None:
-                logging.error(f"Break configuration not set for {dept_name}")
-                return jsonify({'ok': False, 'error': 'Please configure break timings before generating timetables'}), 400
-            
-            logging.info(f"Loaded break configuration: {break_config}")
-            
-            # Suppress algorithm debug output by redirecting stderr
-            import sys
-            import io
-            old_stdout = sys.stdout
-            old_stderr = sys.stderr
-            sys.stdout = io.StringIO()
-            sys.stderr = io.StringIO()
-            
-            try:
-                # Generate timetables using the algorithm with dynamic data and constraints
-                section_timetables = store_section_timetables(
-                    section_list=sections,
-                    subjects_dict=subjects_per_section,
-                    faculty_dict=faculties,
-                    strict_constraints=strict_constraints,
-                    forbidden_constraints=forbidden_constraints,
-                    break_config=break_config
-                )
-            finally:
-                # Restore stdout/stderr
-                sys.stdout = old_stdout
-                sys.stderr = old_stderr
-            
-            if not section_timetables:
-                logging.error(f"Algorithm returned empty timetables for {dept_name}")
-                return jsonify({'ok': False, 'error': 'Timetable generation returned empty results'}), 400
-            
-            # Delete existing timetables for this department
-            SectionTimetable.query.filter_by(dept_name=dept_name, college_id=college_id).delete()
-            db.session.commit()
-            
-            # Store timetables for each section
-            inserted_ids = []
-            for section, timetable in section_timetables.items():
-                new_timetable = SectionTimetable(
-                    section_name=section,
-                    dept_name=dept_name,
-                    college_id=college_id,
-                    timetable=timetable
-                )
-                db.session.add(new_timetable)
-                db.session.flush()  # Get the ID before commit
-                inserted_ids.append(new_timetable.id)
-            
-            db.session.commit()
-            logging.info("Inserted timetables with ids=%s for sections=%s", inserted_ids, list(section_timetables.keys()))
-            
-            # Extract and store faculty timetables
-            faculty_timetables = extract_faculty_timetables(section_timetables, faculties, subjects_per_section, dept_name, college_id)
-            
-            # Delete existing faculty timetables for this department
-            FacultyTimetable.query.filter_by(dept_name=dept_name, college_id=college_id).delete()
-            db.session.commit()
-            
-            # Store faculty timetables
-            faculty_ids = []
-            for faculty_name, timetable in faculty_timetables.items():
-                # Get faculty_id from Faculty table
-                faculty_record = Faculty.query.filter_by(faculty_name=faculty_name, college_id=college_id).first()
-                if not faculty_record:
-                    logging.warning(f"Faculty {faculty_name} not found in database for college {college_id}, skipping")
-                    continue
-                
-                faculty_id = faculty_record.faculty_id
-                
-                # Store as a single combined timetable (not section-wise)
-                new_faculty_tt = FacultyTimetable(
-                    college_id=college_id,
-                    dept_name=dept_name,
-                    section='ALL',  # Mark as combined timetable
-                    faculty_id=faculty_id,
-                    faculty_name=faculty_name,
-                    timetable=timetable
-                )
-                db.session.add(new_faculty_tt)
-                db.session.flush()
-                faculty_ids.append(new_faculty_tt.id)
-            
-            db.session.commit()
-            logging.info("Inserted faculty timetables with ids=%s", faculty_ids)
-            
-            return jsonify({
-                'ok': True,
-                'message': 'Timetables generated and stored successfully',
-                'ids': inserted_ids,
-                'faculty_ids': faculty_ids,
-                'sections': list(section_timetables.keys())
-            }), 201
-        
-        except Exception as algo_error:
-            logging.exception("Error during timetable generation")
-            db.session.rollback()
-            return jsonify({'ok': False, 'error': f'Timetable generation failed: {str(algo_error)}'}), 500
+            body, status = run_generation(dept_name, college_id, options, cancel=cancel)
+        finally:
+            generation_jobs.release(key, cancel)
+        return jsonify(body), status
 
     except Exception as e:
         db.session.rollback()
         logging.exception("Failed to generate/store timetables")
         return jsonify({'ok': False, 'error': str(e)}), 500
 
+# ==================== FEASIBILITY CHECK ====================
+@app.route('/check-feasibility', methods=['POST'])
+def check_feasibility():
+    """Statically check a department's hours and constraints without running the solver.
+
+    Counting and matching checks only, so it answers in milliseconds; a non-empty
+    `problems` list proves /generate-timetable cannot produce a complete timetable.
+    """
+    try:
+        data = request.get_json() or {}
+        dept_name = data.get('dept_name')
+        college_id = data.get('college_id')
+
+        if not dept_name or not college_id:
+            return jsonify({'ok': False, 'error': 'Department name and college ID are required'}), 400
+
+        inputs, error = load_generation_inputs(dept_name, college_id)
+        if error:
+            body, status = error
+            return jsonify(body), status
+
+        start = time.perf_counter()
+        ctx = SolverContext(inputs['sections'], inputs['subjects_per_section'], inputs['faculties'],
+                            inputs['strict_constraints'], inputs['forbidden_constraints'], inputs['break_config'])
+        problems = find_infeasibilities(ctx)
+        elapsed_ms = round((time.perf_counter() - start) * 1000, 2)
+        logging.info(f"Feasibility check for {dept_name} in college {college_id}: {len(problems)} problem(s) in {elapsed_ms}ms")
+
+        return jsonify({
+            'ok': True,
+            'feasible': not problems,
+            'problems': problems,
+            'sections': inputs['sections'],
+            'elapsed_ms': elapsed_ms
+        }), 200
+    except Exception as e:
+        logging.exception("Failed to check feasibility")
+        return jsonify({'ok': False, 'error': str(e)}), 500
+
+# ==================== GENERATION JOBS ====================
+def _run_generation_job(params, progress, cancel):
+    """Job worker entry point: run one generation inside its own app context."""
+    with app.app_context():
+        try:
+            return run_generation(params['dept_name'], params['college_id'], params['options'],
+                                  progress=progress, cancel=cancel)
+        finally:
+            db.session.remove()
+
+def generation_key(dept_name, college_id):
+    """Runs with the same key supersede each other: one department's generations."""
+    return (college_id, dept_name)
+
+generation_jobs = GenerationJobQueue(_run_generation_job, max_workers=int(os.getenv('GENERATION_JOB_WORKERS', 2)))
+
+@app.route('/generation-jobs', methods=['POST'])
+def create_generation_job():
+    """Queue a timetable generation and return its job id immediately (same body as /generate-timetable)."""
+    try:
+        data = request.get_json() or {}
+        dept_name = data.get('dept_name')
+        college_id = data.get('college_id')
+
+        if not dept_name or not college_id:
+            return jsonify({'ok': False, 'error': 'Department name and college ID are required'}), 400
+
+        options, error = parse_generation_options(data)
+        if error:
+            return jsonify({'ok': False, 'error': error}), 400
+
+        job = generation_jobs.submit({'dept_name': dept_name, 'college_id': college_id, 'options': options},
+                                     key=generation_key(dept_name, college_id))
+        logging.info(f"Queued generation job {job.id} for {dept_name} in college {college_id}")
+        return jsonify({
+            'ok': True,
+            'job_id': job.id,
+            'status': job.status,
+            'status_url': f'/generation-jobs/{job.id}'
+        }), 202
+    except Exception as e:
+        logging.exception("Failed to queue generation job")
+        return jsonify({'ok': False, 'error': str(e)}), 500
+
+@app.route('/generation-jobs/<job_id>', methods=['GET'])
+def get_generation_job(job_id):
+    """Report a generation job's status, progress and (once finished) result."""
+    job = generation_jobs.get(job_id)
+    if job is None:
+        return jsonify({'ok': False, 'error': 'Generation job not found'}), 404
+    return jsonify({'ok': True, 'job': job.to_dict()}), 200
+
+@app.route('/generation-jobs/<job_id>/cancel', methods=['POST'])
+def cancel_generation_job(job_id):
+    """Stop a queued or running generation job; nothing it computed is stored."""
+    job = generation_jobs.cancel(job_id)
+    if job is None:
+        return jsonify({'ok': False, 'error': 'Generation job not found'}), 404
+    if job.status in ('succeeded', 'failed'):
+        return jsonify({'ok': False, 'error': f'Generation job already {job.status}', 'job': job.to_dict()}), 409
+    logging.info(f"Cancellation requested for generation job {job.id}")
+    return jsonify({'ok': True, 'job': job.to_dict()}), 202
+
+# ==================== PROGRESS STREAMING (SSE) ====================
+# Seconds without solver progress after which a keep-alive comment is sent
+STREAM_KEEPALIVE_SECONDS = 15
+
+def sse_event(event, data):
+    """One Server-Sent Events message."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+def stream_generation_job(job):
+    """text/event-stream response relaying a generation job's progress until it finishes.
+
+    Events: `queued` (job id), one event per solver progress snapshot, named by
+    its `event` field (attempt_started, section_started, section_done,
+    iteration, attempt_finished, ...), `superseded` once a newer run of the
+    department takes over, and finally `result` with the job's outcome. Closing the stream does not stop the job.
+    """
+    events = job.subscribe()
+
+    def generate():
+        try:
+            yield sse_event('queued', {'job_id': job.id, 'status': job.status, 'status_url': f'/generation-jobs/{job.id}'})
+            while True:
+                try:
+                    snapshot = events.get(timeout=STREAM_KEEPALIVE_SECONDS)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                if snapshot is None:
+                    break
+                yield sse_event(snapshot.get('event', 'progress'), snapshot)
+            yield sse_event('result', job.to_dict())
+        finally:
+            job.unsubscribe(events)
+
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/generate-timetable/stream', methods=['POST'])
+def generate_timetable_stream():
+    """Run a generation (same body as /generate-timetable) and stream its progress as Server-Sent Events."""
+    try:
+        data = request.get_json() or {}
+        dept_name = data.get('dept_name')
+        college_id = data.get('college_id')
+
+        if not dept_name or not college_id:
+            return jsonify({'ok': False, 'error': 'Department name and college ID are required'}), 400
+
+        options, error = parse_generation_options(data)
+        if error:
+            return jsonify({'ok': False, 'error': error}), 400
+
+        job = generation_jobs.submit({'dept_name': dept_name, 'college_id': college_id, 'options': options},
+                                     key=generation_key(dept_name, college_id))
+        logging.info(f"Streaming generation job {job.id} for {dept_name} in college {college_id}")
+        return stream_generation_job(job)
+    except Exception as e:
+        logging.exception("Failed to start streaming generation")
+        return jsonify({'ok': False, 'error': str(e)}), 500
+
+@app.route('/generation-jobs/<job_id>/stream', methods=['GET'])
+def stream_generation_job_events(job_id):
+    """Follow an already queued generation job as Server-Sent Events (works with EventSource)."""
+    job = generation_jobs.get(job_id)
+    if job is None:
+        return jsonify({'ok': False, 'error': 'Generation job not found'}), 404
+    return stream_generation_job(job)
+
+# ==================== INCREMENTAL REPAIR ====================
+def run_repair(dept_name, college_id, options, cancel=None):
+    """Repair and store the timetables of one department (see /repair-timetable).
+
+    Needs an application context; `cancel` is an optional cancel token that
+    stops the repair (409, nothing stored). Returns (response_body, http_status).
+    """
+    try:
+        inputs, error = load_generation_inputs(dept_name, college_id)
+        if error:
+            return error
+
+        # Latest stored row per section
+        current = {}
+        for row in SectionTimetable.query.filter_by(dept_name=dept_name, college_id=college_id)\
+                .order_by(SectionTimetable.created_at, SectionTimetable.id).all():
+            current[row.section_name] = row
+        if not current:
+            return {'ok': False, 'error': 'No stored timetables to repair. Please generate timetables first.'}, 404
+        existing = {section: row.timetable for section, row in current.items() if isinstance(row.timetable, dict)}
+
+        seed = options['seed']
+        start = time.perf_counter()
+        trace = [] if options.get('debug') else None
+        section_timetables, report = repair_section_timetables(
+            inputs['sections'], inputs['subjects_per_section'], inputs['faculties'],
+            inputs['strict_constraints'], inputs['forbidden_constraints'], inputs['break_config'],
+            existing, seed=seed, trace=trace, cancel=cancel
+        )
+        elapsed_ms = round((time.perf_counter() - start) * 1000, 2)
+        logging.info(f"Repaired timetables for {dept_name} in {elapsed_ms}ms: {report}")
+
+        # Rewrite only the sections that changed; add new sections, drop removed ones
+        raise_if_cancelled(cancel)
+        updated_ids = []
+        for section, timetable in section_timetables.items():
+            row = current.get(section)
+            if row is None:
+                row = SectionTimetable(section_name=section, dept_name=dept_name, college_id=college_id,
+                                       timetable=timetable, seed=seed)
+                db.session.add(row)
+            elif report['changed_cells'][section]:
+                row.timetable = timetable
+                row.seed = seed
+            else:
+                continue
+            db.session.flush()
+            updated_ids.append(row.id)
+        for section, row in current.items():
+            if section not in section_timetables:
+                db.session.delete(row)
+
+        # Faculty timetables: update in place, add new faculty, drop faculty with no classes left
+        faculty_timetables = extract_faculty_timetables(section_timetables, inputs['faculties'],
+                                                        inputs['subjects_per_section'], dept_name, college_id)
+        stored_faculty = {row.faculty_name: row for row in
+                          FacultyTimetable.query.filter_by(dept_name=dept_name, college_id=college_id).all()}
+        faculty_ids_by_name = faculty_directory(college_id)['ids_by_name']
+        for faculty_name, timetable in faculty_timetables.items():
+            row = stored_faculty.get(faculty_name)
+            if row is not None:
+                if row.timetable != timetable:
+                    row.timetable = timetable
+            elif faculty_name in faculty_ids_by_name:
+                db.session.add(FacultyTimetable(college_id=college_id, dept_name=dept_name, section='ALL',
+                                                faculty_id=faculty_ids_by_name[faculty_name],
+                                                faculty_name=faculty_name, timetable=timetable))
+            else:
+                logging.warning(f"Faculty {faculty_name} not found in database for college {college_id}, skipping")
+        for faculty_name, row in stored_faculty.items():
+            if faculty_name not in faculty_timetables:
+                db.session.delete(row)
+
+        # Cached solutions no longer describe what is stored; the next generation solves afresh
+        forget_cached_solutions(dept_name, college_id)
+        raise_if_cancelled(cancel)
+        db.session.commit()
+
+        body = {
+            'ok': True,
+            'message': 'Timetables repaired and stored successfully',
+            'complete': report['shortfall'] == 0,
+            'shortfall': report['shortfall'],
+            'changed_cells': report['changed_cells'],
+            'unassigned': report['unassigned'],
+            'updated_ids': updated_ids,
+            'sections': list(section_timetables.keys()),
+            'seed': seed,
+            'elapsed_ms': elapsed_ms
+        }
+        if trace is not None:
+            body['debug_log'] = trace
+        return body, 200
+
+    except TimetableInfeasibleError as infeasible:
+        logging.warning(f"No feasible timetable for {dept_name}: {infeasible}")
+        db.session.rollback()
+        return {'ok': False, 'error': f'No valid timetable exists: {infeasible}', 'problems': infeasible.problems}, 422
+    except GenerationCancelled:
+        logging.info(f"Timetable repair for {dept_name} was cancelled")
+        db.session.rollback()
+        return {'ok': False, 'error': 'Timetable repair was cancelled', 'cancelled': True}, 409
+    except Exception as e:
+        db.session.rollback()
+        logging.exception("Failed to repair timetables")
+        return {'ok': False, 'error': str(e)}, 500
+
+@app.route('/repair-timetable', methods=['POST'])
+def repair_timetable():
+    """Re-solve a department after a small edit, starting from its stored timetables.
+
+    Classes the edit did not invalidate keep their cells; only changed rows are
+    rewritten (in place), so unaffected sections and faculty keep their week.
+    Takes the seed/debug options of /generate-timetable. Like a generation, a
+    repair supersedes (cancels) any earlier run for the department and is
+    superseded by later ones.
+    """
+    try:
+        data = request.get_json() or {}
+        dept_name = data.get('dept_name')
+        college_id = data.get('college_id')
+
+        if not dept_name or not college_id:
+            return jsonify({'ok': False, 'error': 'Department name and college ID are required'}), 400
+
+        options, error = parse_generation_options(data)
+        if error:
+            return jsonify({'ok': False, 'error': error}), 400
+
+        key = generation_key(dept_name, college_id)
+        cancel = generation_jobs.claim(key, owner='repair')
+        try:
+            body, status = run_repair(dept_name, college_id, options, cancel=cancel)
+        finally:
+            generation_jobs.release(key, cancel)
+        return jsonify(body), status
+
+    except Exception as e:
+        db.session.rollback()
+        logging.exception("Failed to repair timetables")
+        return jsonify({'ok': False, 'error': str(e)}), 500
+
+# ==================== COLLEGE-WIDE GENERATION ====================
+def load_college_inputs(college_id):
+    """Fetch the solver inputs of every department of a college with one query per table.
+
+    Returns (departments, skipped): departments maps dept_name to the dict
+    load_generation_inputs returns; skipped maps dept_name to why it cannot be generated.
+    """
+    departments = Department.query.filter_by(college_id=college_id).all()
+    subjects_by_dept = {}
+    for subject in Subject.query.filter_by(college_id=college_id).all():
+        subjects_by_dept.setdefault(subject.dept_name, []).append(subject)
+    constraints_by_dept = {}
+    for constraint in SubjectConstraint.query.filter_by(college_id=college_id).all():
+        constraints_by_dept.setdefault(constraint.dept_name, []).append(constraint)
+    breaks_by_dept = {row.dept_name: row for row in BreakConfiguration.query.filter_by(college_id=college_id).all()}
+
+    inputs = {}
+    skipped = {}
+    for department in departments:
+        name = department.name
+        if not department.sections:
+            skipped[name] = 'No sections defined'
+        elif name not in subjects_by_dept:
+            skipped[name] = 'No subjects found'
+        elif name not in breaks_by_dept:
+            skipped[name] = 'Break timings not configured'
+        else:
+            subjects_per_section, faculties = assemble_timetable_data(department.sections, subjects_by_dept[name])
+            strict_constraints, forbidden_constraints = assemble_constraints(constraints_by_dept.get(name, []))
+            inputs[name] = {
+                'sections': department.sections,
+                'subjects_per_section': subjects_per_section,
+                'faculties': faculties,
+                'strict_constraints': strict_constraints,
+                'forbidden_constraints': forbidden_constraints,
+                'break_config': break_config_to_dict(breaks_by_dept[name])
+            }
+    return inputs, skipped
+
+def store_college_results(college_id, results, inputs, seed, cancel=None):
+    """Replace the section and faculty timetables of every generated department in one transaction.
+
+    Also drops those departments' cached solutions (see forget_cached_solutions).
+    Nothing is committed once the `cancel` token is set (GenerationCancelled).
+
+    Returns {dept_name: {'ids': [...], 'faculty_ids': [...], 'sections': [...]}}.
+    """
+    dept_names = list(results)
+    try:
+        SectionTimetable.query.filter(SectionTimetable.college_id == college_id,
+                                      SectionTimetable.dept_name.in_(dept_names)).delete(synchronize_session=False)
+        FacultyTimetable.query.filter(FacultyTimetable.college_id == college_id,
+                                      FacultyTimetable.dept_name.in_(dept_names)).delete(synchronize_session=False)
+
+        faculty_ids_by_name = faculty_directory(college_id)['ids_by_name']
+        stored = {}
+        for dept_name, section_timetables in results.items():
+            faculty_timetables = extract_faculty_timetables(section_timetables, inputs[dept_name]['faculties'],
+                                                            inputs[dept_name]['subjects_per_section'], dept_name, college_id)
+            section_ids, faculty_ids = insert_department_timetables(college_id, dept_name, section_timetables,
+                                                                    faculty_timetables, faculty_ids_by_name, seed)
+            stored[dept_name] = {'ids': section_ids, 'faculty_ids': faculty_ids,
+                                 'sections': list(section_timetables.keys())}
+            # A cached single-department solution would overwrite this college-wide one on its next cache hit
+            forget_cached_solutions(dept_name, college_id)
+        raise_if_cancelled(cancel)
+        db.session.commit()
+        return stored
+    except Exception:
+        db.session.rollback()
+        raise
+
+@app.route('/generate-college-timetables', methods=['POST'])
+def generate_college_timetables():
+    """Generate every department of a college against one shared faculty calendar.
+
+    Same options as /generate-timetable ("joint" defaults to true here), plus
+    partition_workers to solve departments with no shared faculty in parallel.
+    The run claims every department it generates: it supersedes (cancels) their
+    earlier runs, and a later run for any of them cancels it (409, nothing stored).
+    """
+    try:
+        data = request.get_json() or {}
+        college_id = data.get('college_id')
+        if not college_id:
+            return jsonify({'ok': False, 'error': 'College ID is required'}), 400
+
+        options, error = parse_generation_options(data)
+        if error:
+            return jsonify({'ok': False, 'error': error}), 400
+        try:
+            partition_workers = int(data['partition_workers']) if data.get('partition_workers') is not None else None
+        except (TypeError, ValueError):
+            return jsonify({'ok': False, 'error': 'partition_workers must be a number'}), 400
+
+        inputs, skipped = load_college_inputs(college_id)
+        for dept_name, reason in skipped.items():
+            logging.warning(f"Skipping {dept_name} in college-wide generation: {reason}")
+        if not inputs:
+            return jsonify({'ok': False, 'error': 'No department is ready for generation', 'skipped': skipped}), 400
+
+        seed = options['seed']
+        logging.info(f"Generating timetables for {len(inputs)} department(s) of college {college_id} "
+                     f"(engine={options['engine']}, seed={seed})")
+        keys = [generation_key(dept_name, college_id) for dept_name in inputs]
+        cancel = generation_jobs.claim_all(keys, owner='college')
+        try:
+            results = store_college_timetables(
+                inputs,
+                engine=options['engine'],
+                time_limit=options['time_limit'],
+                num_workers=options['num_workers'],
+                seed=seed,
+                joint=parse_flag(data['joint']) if data.get('joint') is not None else True,
+                partition_workers=partition_workers,
+                cancel=cancel
+            )
+            stored = store_college_results(college_id, results, inputs, seed, cancel=cancel)
+        finally:
+            for key in keys:
+                generation_jobs.release(key, cancel)
+        logging.info(f"Stored college-wide timetables for {list(stored)}")
+
+        return jsonify({
+            'ok': True,
+            'message': 'Timetables generated and stored successfully',
+            'departments': stored,
+            'skipped': skipped,
+            'seed': seed
+        }), 201
+
+    except TimetableInfeasibleError as infeasible:
+        logging.warning(f"No feasible college-wide timetable for {college_id}: {infeasible}")
+        db.session.rollback()
+        return jsonify({'ok': False, 'error': f'No valid timetable exists: {infeasible}', 'problems': infeasible.problems}), 422
+    except TimeoutError as timeout:
+        logging.warning(f"College-wide generation timed out for {college_id}: {timeout}")
+        db.session.rollback()
+        return jsonify({'ok': False, 'error': str(timeout)}), 504
+    except GenerationCancelled:
+        logging.info(f"College-wide generation for {college_id} was cancelled")
+        db.session.rollback()
+        return jsonify({'ok': False, 'error': 'Timetable generation was cancelled', 'cancelled': True}), 409
+    except Exception as e:
+        db.session.rollback()
+        logging.exception("Failed to generate/store college-wide timetables")
+        return jsonify({'ok': False, 'error': str(e)}), 500
+
 def convert_timetable_dict_to_array(timetable_data):
     """Convert timetable to 2D array format [5 days][7 periods].
     Handles both:
@@ -569,7 +1516,7 @@ def get_my_timetable():
             return jsonify({'ok': False, 'error': 'Faculty not logged in'}), 401
         
         # Get faculty name for reference
-        faculty_record = Faculty.query.filter_by(faculty_id=faculty_id, college_id=college_id).first()
+        faculty_record = faculty_directory(college_id)['by_id'].get(faculty_id)
         if not faculty_record:
             return jsonify({'ok': False, 'error': 'Faculty record not found'}), 404
         
@@ -607,13 +1554,13 @@ def get_my_timetable():
             
             timetable_array = combined_timetable
         
-        logging.info(f"Retrieved combined timetable for faculty {faculty_record.faculty_name} ({faculty_id})")
+        logging.info(f"Retrieved combined timetable for faculty {faculty_record['faculty_name']} ({faculty_id})")
         
         return jsonify({
             'ok': True,
             'faculty_id': faculty_id,
-            'faculty_name': faculty_record.faculty_name,
-            'dept_name': faculty_record.dept_name,
+            'faculty_name': faculty_record['faculty_name'],
+            'dept_name': faculty_record['dept_name'],
             'timetable': timetable_array
         }), 200
         
@@ -624,7 +1571,7 @@ def get_my_timetable():
 @app.route('/get-faculty-timetables', methods=['GET'])
 def get_faculty_timetables():
     """Get timetables for each faculty member by analyzing section timetables.
-    Uses the algorithm's faculty mapping to determine which faculty teaches each subject."""
+    Uses the Subject table's faculty mapping to determine which faculty teaches each subject."""
     try:
         dept_name = request.args.get('dept_name')
         college_id = request.args.get('college_id')
@@ -653,9 +1600,13 @@ def get_faculty_timetables():
         
         # Create a mapping of (subject_name, section) -> faculty_name from database
         subject_faculty_map_db = {}
+        # Department-wide subject_name -> faculty_name (first row wins, as in generation)
+        subject_faculty_map_dept = {}
         for subject in subjects:
             key = (subject.subject_name, subject.section)
             subject_faculty_map_db[key] = subject.faculty_name
+            if subject.subject_name not in subject_faculty_map_dept:
+                subject_faculty_map_dept[subject.subject_name] = subject.faculty_name
         
         # Build faculty timetables by analyzing section timetables
         faculty_timetables = {}
@@ -679,14 +1630,10 @@ def get_faculty_timetables():
                         lookup_key = (subject_name, section_name)
                         faculty_name = subject_faculty_map_db.get(lookup_key)
                         
-                        # If not found in database, use the algorithm's faculty mapping
-                        if not faculty_name and subject_name in algorithm_faculties:
-                            faculty_data = algorithm_faculties[subject_name]
-                            # If it's a list, pick the first one (or could randomize)
-                            if isinstance(faculty_data, list):
-                                faculty_name = faculty_data[0]
-                            else:
-                                faculty_name = faculty_data
+                        # If not found for this section, fall back to the department-wide
+                        # mapping the generator used (subject_name -> faculty_name)
+                        if not faculty_name:
+                            faculty_name = subject_faculty_map_dept.get(subject_name)
                         
                         logging.debug(f"Slot {section_name}[Day {day_idx}][Period {period_idx}]: '{subject_name}' -> Faculty: {faculty_name}")
                         
@@ -706,7 +1653,7 @@ def get_faculty_timetables():
         
         if not faculty_timetables:
             logging.warning("No faculty timetables generated. Checking data...")
-            logging.warning(f"  - Algorithm faculties count: {len(algorithm_faculties)}")
+            logging.warning(f"  - Department faculty mappings count: {len(subject_faculty_map_dept)}")
             logging.warning(f"  - Database subjects count: {len(subjects)}")
             return jsonify({
                 'ok': True,
@@ -1478,6 +2425,8 @@ def update_department(dept_id):
             department.sections = data['sections']
 
         db.session.commit()
+        # A rename cascades to the faculty rows' dept_name
+        invalidate_faculty_directory(department.college_id)
         return jsonify({
             'message': 'Department updated successfully',
             'department': {
@@ -1627,6 +2576,7 @@ def update_faculty(faculty_id):
             faculty.faculty_password = data['faculty_password']
 
         db.session.commit()
+        invalidate_faculty_directory(faculty.college_id)
         return jsonify({
             'message': 'Faculty updated successfully',
             'faculty': faculty.to_dict()
@@ -1642,8 +2592,10 @@ def delete_faculty(faculty_id):
         if not faculty:
             return jsonify({'error': 'Faculty not found'}), 404
 
+        college_id = faculty.college_id
         db.session.delete(faculty)
         db.session.commit()
+        invalidate_faculty_directory(college_id)
         return jsonify({'message': 'Faculty deleted successfully'}), 200
     except Exception as e:
         db.session.rollback()
@@ -1686,6 +2638,7 @@ def add_faculty():
 
         db.session.add(new_faculty)
         db.session.commit()
+        invalidate_faculty_directory(new_faculty.college_id)
 
         return jsonify({
             'message': 'Faculty added successfully',
@@ -0,0 +1,110 @@
+"""Tests for the CP-SAT engine: its timetables satisfy every hard rule, impossible inputs raise."""
+
+import unittest
+
+from algorithm import SolverContext, TimetableInfeasibleError, lab_can_start, num_days, num_periods
+from cpsat_solver import cp_model, solve_with_cpsat
+
+BREAKS = {"first_break_period": 2, "lunch_break_period": 4}
+# Small enough for one search worker to prove the optimum in well under a second
+SECTIONS = ["A", "B"]
+FACULTY = {"MATHS": "F1", "OS": "F2", "DSA": "F3", "JAVA": "F4", "DSL": "F5", "MC1": "F6", "UHV": "F1"}
+STRICT = {"A": {"MATHS": [(1, 1)], "DSL": [(3, 3)]}, "B": {"MC1": [(2, 6)]}}
+FORBIDDEN = {"B": {"OS": [(day, 1) for day in range(1, num_days + 1)]}}
+
+
+def subjects():
+    return {section: {"MATHS": {"hours": 4, "lab": False, "last": False},
+                      "OS": {"hours": 4, "lab": False, "last": False},
+                      "DSA": {"hours": 3, "lab": False, "last": False},
+                      "JAVA": {"hours": 3, "lab": False, "last": False},
+                      "UHV": {"hours": 1, "lab": False, "last": False},
+                      "DSL": {"hours": 2, "lab": True, "last": False},
+                      "MC1": {"hours": 2, "lab": True, "last": True},
+                      "REMEDIAL": {"hours": 1, "lab": False, "last": False}}
+            for section in SECTIONS}
+
+
+@unittest.skipIf(cp_model is None, "ortools is not installed")
+class CpsatSolutionTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.ctx = SolverContext(SECTIONS, subjects(), FACULTY, STRICT, FORBIDDEN, BREAKS, seed=1)
+        cls.timetables = solve_with_cpsat(cls.ctx, time_limit=30, num_workers=1)
+
+    def cells(self, section, subject):
+        timetable = self.timetables[section]
+        return [(day, period) for day in range(1, num_days + 1) for period in range(1, num_periods + 1)
+                if timetable[day][period] == subject]
+
+    def test_every_subject_gets_its_hours(self):
+        for section, section_subjects in subjects().items():
+            for subject, info in section_subjects.items():
+                if subject != "REMEDIAL":
+                    self.assertEqual(len(self.cells(section, subject)), info["hours"], f"{section}/{subject}")
+
+    def test_labs_are_whole_blocks_at_valid_starts(self):
+        for section, section_subjects in subjects().items():
+            for subject, info in section_subjects.items():
+                if not info["lab"]:
+                    continue
+                cells = self.cells(section, subject)
+                starts = [(day, period) for (day, period) in cells if (day, period - 1) not in cells]
+                for (day, period) in starts:
+                    self.assertIn((day, period + 1), cells, f"{section}/{subject} block at day {day} P{period}")
+                    self.assertTrue(lab_can_start(self.ctx, subject, info, period), f"{section}/{subject} starts at P{period}")
+                self.assertEqual(len(starts) * 2, len(cells), f"{section}/{subject} has a run longer than a block")
+
+    def test_non_lab_subjects_appear_once_a_day(self):
+        for section, section_subjects in subjects().items():
+            for subject, info in section_subjects.items():
+                if not info["lab"] and subject != "REMEDIAL":
+                    cell_days = [day for (day, _) in self.cells(section, subject)]
+                    self.assertEqual(len(cell_days), len(set(cell_days)), f"{section}/{subject}")
+
+    def test_no_faculty_clash_or_back_to_back_classes(self):
+        for faculty in set(FACULTY.values()):
+            for day in range(1, num_days + 1):
+                teaching = sorted((period, section, self.timetables[section][day][period])
+                                  for section in SECTIONS for period in range(1, num_periods + 1)
+                                  if FACULTY.get(self.timetables[section][day][period]) == faculty)
+                for (p1, s1, subj1), (p2, s2, subj2) in zip(teaching, teaching[1:]):
+                    self.assertNotEqual(p1, p2, f"{faculty} teaches {s1} and {s2} on day {day} P{p1}")
+                    if p2 == p1 + 1:
+                        # Only the two halves of one lab block may be back to back
+                        self.assertEqual((s1, subj1), (s2, subj2), f"{faculty} back to back on day {day} P{p1}")
+                        self.assertTrue(subjects()[s1][subj1]["lab"])
+
+    def test_mc_blocks_never_share_a_day(self):
+        mc_days = [day for section in SECTIONS for (day, period) in self.cells(section, "MC1") if period == 6]
+        self.assertEqual(len(mc_days), len(set(mc_days)))
+
+    def test_strict_cells_are_honored_and_forbidden_cells_avoided(self):
+        self.assertEqual(self.timetables["A"][1][1], "MATHS")
+        self.assertEqual((self.timetables["A"][3][3], self.timetables["A"][3][4]), ("DSL", "DSL"))
+        self.assertEqual((self.timetables["B"][2][6], self.timetables["B"][2][7]), ("MC1", "MC1"))
+        for day in range(1, num_days + 1):
+            self.assertNotEqual(self.timetables["B"][day][1], "OS")
+
+
+@unittest.skipIf(cp_model is None, "ortools is not installed")
+class CpsatInfeasibleTest(unittest.TestCase):
+    def test_strict_lab_at_a_break_raises(self):
+        # The first break follows P2, so a lab block cannot start there
+        ctx = SolverContext(["A"], {"A": subjects()["A"]}, FACULTY, {"A": {"DSL": [(1, 2)]}}, {}, BREAKS, seed=1)
+
+        with self.assertRaises(TimetableInfeasibleError) as raised:
+            solve_with_cpsat(ctx, time_limit=10, num_workers=1)
+        self.assertIn("Strict lab DSL for section A cannot start at Mon P2", str(raised.exception))
+
+    def test_conflicting_strict_cells_are_proven_infeasible(self):
+        # Both sections' MC1 pinned to the same day, which MC exclusivity forbids
+        strict = {"A": {"MC1": [(2, 6)]}, "B": {"MC1": [(2, 6)]}}
+        ctx = SolverContext(SECTIONS, subjects(), FACULTY, strict, {}, BREAKS, seed=1)
+
+        with self.assertRaises(TimetableInfeasibleError):
+            solve_with_cpsat(ctx, time_limit=10, num_workers=1)
+
+
+if __name__ == "__main__":
+    unittest.main()
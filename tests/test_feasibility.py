@@ -0,0 +1,142 @@
+"""Behavioral tests for the static feasibility checks (find_infeasibilities, unassignable_subjects)."""
+
+import unittest
+
+from algorithm import (SolverContext, TimetableInfeasibleError, check_feasibility, find_infeasibilities,
+                       num_days, num_periods, unassignable_subjects)
+
+BREAKS = {"first_break_period": 2, "lunch_break_period": 4}
+
+
+def subject(hours, lab=False, last=False):
+    return {"hours": hours, "lab": lab, "last": last}
+
+
+def every_cell_but(*cells):
+    return [(day, period) for day in range(1, num_days + 1) for period in range(1, num_periods + 1)
+            if (day, period) not in cells]
+
+
+def checks(problems):
+    return sorted(problem["check"] for problem in problems)
+
+
+class FeasibleInputTest(unittest.TestCase):
+    def test_a_satisfiable_department_reports_nothing(self):
+        subjects = {section: {"MATHS": subject(4), "OS": subject(3), "OSL": subject(2, lab=True),
+                              "MC1": subject(2, lab=True, last=True), "REMEDIAL": subject(1)}
+                    for section in ("A", "B")}
+        ctx = SolverContext(["A", "B"], subjects, {"MATHS": "F1", "OS": "F2", "OSL": "F3", "MC1": "F4"},
+                            strict_constraints={"A": {"MATHS": [(1, 1)]}},
+                            forbidden_constraints={"B": {"OS": [(day, 1) for day in range(1, num_days + 1)]}},
+                            break_config=BREAKS)
+
+        self.assertEqual(find_infeasibilities(ctx), [])
+        self.assertEqual(unassignable_subjects(ctx, "A"), (0, []))
+        check_feasibility(ctx)
+
+    def test_remedial_filler_does_not_count_towards_the_week(self):
+        subjects = {"A": {f"S{index}": subject(5) for index in range(7)}}
+        subjects["A"]["REMEDIAL"] = subject(3)
+        ctx = SolverContext(["A"], subjects, {f"S{index}": f"F{index}" for index in range(7)}, break_config=BREAKS)
+
+        self.assertEqual(find_infeasibilities(ctx), [])
+
+
+class InfeasibilityKindsTest(unittest.TestCase):
+    def test_section_hours(self):
+        subjects = {"A": {f"S{index}": subject(4) for index in range(9)}}
+        ctx = SolverContext(["A"], subjects, {f"S{index}": f"F{index}" for index in range(9)}, break_config=BREAKS)
+
+        problems = find_infeasibilities(ctx)
+        self.assertEqual(checks(problems), ["section_hours"])
+        self.assertEqual(problems[0]["section"], "A")
+        self.assertIn("needs 36 periods but the week has only 35", problems[0]["message"])
+
+    def test_odd_lab_hours(self):
+        ctx = SolverContext(["A"], {"A": {"DSL": subject(3, lab=True)}}, {"DSL": "F1"}, break_config=BREAKS)
+
+        problems = find_infeasibilities(ctx)
+        self.assertEqual(checks(problems), ["odd_lab_hours"])
+        self.assertEqual((problems[0]["section"], problems[0]["subject"]), ("A", "DSL"))
+        self.assertIn("lab hours (3) must be even", problems[0]["message"])
+
+    def test_subject_domain_for_a_subject_missing_days(self):
+        # Five periods need five different days, but Monday is forbidden
+        ctx = SolverContext(["A"], {"A": {"MATHS": subject(5)}}, {"MATHS": "F1"},
+                            forbidden_constraints={"A": {"MATHS": [(1, period) for period in range(1, num_periods + 1)]}},
+                            break_config=BREAKS)
+
+        problems = find_infeasibilities(ctx)
+        self.assertEqual(checks(problems), ["subject_domain"])
+        self.assertEqual(problems[0]["subject"], "MATHS")
+        self.assertIn("needs 5 periods on different days but only 4 day(s)", problems[0]["message"])
+
+    def test_subject_domain_for_a_lab_missing_block_starts(self):
+        # Two blocks needed, only Monday P1-P2 left open
+        ctx = SolverContext(["A"], {"A": {"DSL": subject(4, lab=True)}}, {"DSL": "F1"},
+                            forbidden_constraints={"A": {"DSL": every_cell_but((1, 1), (1, 2))}},
+                            break_config=BREAKS)
+
+        problems = find_infeasibilities(ctx)
+        self.assertEqual(checks(problems), ["subject_domain"])
+        self.assertIn("needs 2 lab block(s) but only 1 valid block start(s)", problems[0]["message"])
+
+    def test_mc_exclusivity(self):
+        sections = [chr(ord("A") + index) for index in range(6)]
+        subjects = {section: {"MC1": subject(2, lab=True, last=True)} for section in sections}
+        ctx = SolverContext(sections, subjects, {"MC1": "F1"}, break_config=BREAKS)
+
+        problems = find_infeasibilities(ctx)
+        self.assertEqual(checks(problems), ["mc_exclusivity"])
+        self.assertIn("MC1/MC2 need 6 block(s) across sections but cannot overlap", problems[0]["message"])
+
+    def test_faculty_load(self):
+        sections = [chr(ord("A") + index) for index in range(6)]
+        subjects = {section: {"MATHS": subject(4)} for section in sections}
+        ctx = SolverContext(sections, subjects, {"MATHS": "F1"}, break_config=BREAKS)
+
+        problems = find_infeasibilities(ctx)
+        self.assertEqual(checks(problems), ["faculty_load"])
+        self.assertEqual(problems[0]["faculty"], "F1")
+        self.assertIn("Faculty F1 has 24 periods but can take at most 20 a week", problems[0]["message"])
+
+    def test_strict_faculty_clash(self):
+        subjects = {section: {"MATHS": subject(2)} for section in ("A", "B")}
+        ctx = SolverContext(["A", "B"], subjects, {"MATHS": "F1"},
+                            strict_constraints={"A": {"MATHS": [(1, 1)]}, "B": {"MATHS": [(1, 2)]}},
+                            break_config=BREAKS)
+
+        problems = find_infeasibilities(ctx)
+        self.assertEqual(checks(problems), ["strict_faculty_clash"])
+        self.assertEqual((problems[0]["faculty"], problems[0]["day"], problems[0]["period"]), ("F1", 1, 1))
+        self.assertIn("Strict placements A/MATHS and B/MATHS give faculty F1 back-to-back classes on Mon P1/P2",
+                      problems[0]["message"])
+
+    def test_cell_matching(self):
+        # Each subject alone fits its three days, but both share the same three cells
+        shared = [(1, 1), (2, 1), (3, 1)]
+        ctx = SolverContext(["A"], {"A": {"S": subject(3), "T": subject(3), "U": subject(2)}},
+                            {"S": "F1", "T": "F2", "U": "F3"},
+                            forbidden_constraints={"A": {"S": every_cell_but(*shared), "T": every_cell_but(*shared)}},
+                            break_config=BREAKS)
+
+        self.assertEqual(unassignable_subjects(ctx, "A"), (3, ["S", "T"]))
+        problems = find_infeasibilities(ctx)
+        self.assertEqual(checks(problems), ["cell_matching"])
+        self.assertEqual(problems[0]["subjects"], ["S", "T"])
+        self.assertIn("Section A: 3 period(s) of S, T cannot be given cells", problems[0]["message"])
+
+    def test_check_feasibility_raises_with_every_problem(self):
+        subjects = {"A": {"DSL": subject(3, lab=True), "MATHS": subject(6)}}
+        ctx = SolverContext(["A"], subjects, {"DSL": "F1", "MATHS": "F2"}, break_config=BREAKS)
+
+        with self.assertRaises(TimetableInfeasibleError) as raised:
+            check_feasibility(ctx)
+        self.assertEqual(checks(raised.exception.problems), ["odd_lab_hours", "subject_domain"])
+        self.assertIn("DSL", str(raised.exception))
+        self.assertIn("MATHS", str(raised.exception))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,175 @@
+"""Tests for the in-process generation job queue (claims, cancellation, superseding, pruning)."""
+
+import threading
+import time
+import unittest
+
+from generation_jobs import CANCELLED, QUEUED, RUNNING, SUCCEEDED, GenerationJobQueue
+
+WAIT_SECONDS = 5
+
+
+def wait_until(condition):
+    deadline = time.monotonic() + WAIT_SECONDS
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("timed out waiting for the job queue")
+        time.sleep(0.01)
+
+
+class BlockingRunner:
+    """A runner that reports progress, then waits until its job is cancelled or it is let go."""
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self, params, progress, cancel):
+        progress({'percent': 10})
+        self.started.set()
+        while not self.release.is_set():
+            if cancel.is_set():
+                return {'ok': False, 'error': 'Timetable generation was cancelled', 'cancelled': True}, 409
+            time.sleep(0.01)
+        return {'ok': True, 'dept_name': params.get('dept_name')}, 201
+
+
+class ClaimTest(unittest.TestCase):
+    def setUp(self):
+        self.jobs = GenerationJobQueue(BlockingRunner(), max_workers=1)
+
+    def test_a_second_claim_on_the_same_key_cancels_the_first_token(self):
+        first = self.jobs.claim(('C1', 'CSE'))
+        second = self.jobs.claim(('C1', 'CSE'))
+
+        self.assertTrue(first.is_set())
+        self.assertFalse(second.is_set())
+        # Releasing the superseded run does not forget the newer one
+        self.jobs.release(('C1', 'CSE'), first)
+        self.assertIs(self.jobs.active[('C1', 'CSE')], second)
+        self.jobs.release(('C1', 'CSE'), second)
+        self.assertEqual(self.jobs.active, {})
+
+    def test_claims_on_other_keys_are_independent(self):
+        cse = self.jobs.claim(('C1', 'CSE'))
+        self.jobs.claim(('C1', 'ECE'))
+
+        self.assertFalse(cse.is_set())
+
+    def test_claim_all_is_cancelled_by_a_later_claim_on_any_of_its_keys(self):
+        college = self.jobs.claim_all([('C1', 'CSE'), ('C1', 'ECE')], owner='college')
+        self.assertFalse(college.is_set())
+
+        self.jobs.claim(('C1', 'ECE'))
+        self.assertTrue(college.is_set())
+
+
+class JobLifecycleTest(unittest.TestCase):
+    def setUp(self):
+        self.runner = BlockingRunner()
+        self.jobs = GenerationJobQueue(self.runner, max_workers=1)
+
+    def tearDown(self):
+        self.runner.release.set()
+        self.jobs.executor.shutdown(wait=True)
+
+    def test_a_job_runs_to_completion(self):
+        job = self.jobs.submit({'dept_name': 'CSE'}, key=('C1', 'CSE'))
+        self.runner.release.set()
+        # finished_at is set once the outcome is recorded; the key is released right after
+        wait_until(lambda: job.finished_at is not None and not self.jobs.active)
+
+        self.assertEqual(job.status, SUCCEEDED)
+        self.assertEqual((job.result, job.http_status), ({'ok': True, 'dept_name': 'CSE'}, 201))
+        self.assertEqual(job.progress['percent'], 100)
+
+    def test_cancel_stops_a_running_job(self):
+        job = self.jobs.submit({'dept_name': 'CSE'}, key=('C1', 'CSE'))
+        self.assertTrue(self.runner.started.wait(WAIT_SECONDS))
+        self.assertEqual(job.status, RUNNING)
+        events = job.subscribe()
+
+        self.assertIs(self.jobs.cancel(job.id), job)
+        wait_until(lambda: job.finished_at is not None and not self.jobs.active)
+
+        self.assertEqual(job.status, CANCELLED)
+        self.assertEqual(job.http_status, 409)
+        self.assertIsNone(events.get(timeout=WAIT_SECONDS))
+
+    def test_a_new_job_supersedes_a_running_one(self):
+        first = self.jobs.submit({'dept_name': 'CSE'}, key=('C1', 'CSE'))
+        self.assertTrue(self.runner.started.wait(WAIT_SECONDS))
+        events = first.subscribe()
+
+        second = self.jobs.submit({'dept_name': 'CSE'}, key=('C1', 'CSE'))
+        wait_until(lambda: first.finished)
+
+        self.assertEqual(first.status, CANCELLED)
+        self.assertEqual(first.superseded_by, second.id)
+        self.assertEqual(events.get(timeout=WAIT_SECONDS)['event'], 'superseded')
+        self.assertFalse(second.cancel_token.is_set())
+
+    def test_a_synchronous_claim_supersedes_a_queued_job(self):
+        running = self.jobs.submit({'dept_name': 'ECE'}, key=('C1', 'ECE'))
+        self.assertTrue(self.runner.started.wait(WAIT_SECONDS))
+        queued = self.jobs.submit({'dept_name': 'CSE'}, key=('C1', 'CSE'))
+        self.assertEqual(queued.status, QUEUED)
+        events = queued.subscribe()
+
+        token = self.jobs.claim(('C1', 'CSE'))
+
+        self.assertEqual(queued.status, CANCELLED)
+        self.assertEqual(queued.superseded_by, 'synchronous')
+        self.assertIsNone(events.get(timeout=WAIT_SECONDS))
+        self.assertFalse(running.cancel_token.is_set())
+        self.assertIs(self.jobs.active[('C1', 'CSE')], token)
+
+    def test_cancelling_a_queued_job_finishes_it_at_once(self):
+        self.jobs.submit({'dept_name': 'ECE'}, key=('C1', 'ECE'))
+        self.assertTrue(self.runner.started.wait(WAIT_SECONDS))
+        queued = self.jobs.submit({'dept_name': 'CSE'}, key=('C1', 'CSE'))
+
+        self.jobs.cancel(queued.id)
+
+        self.assertEqual(queued.status, CANCELLED)
+        self.assertEqual(queued.error, 'Cancelled before it started')
+        self.assertNotIn(('C1', 'CSE'), self.jobs.active)
+
+    def test_cancel_of_an_unknown_job_returns_none(self):
+        self.assertIsNone(self.jobs.cancel('no-such-job'))
+
+
+class PruneTest(unittest.TestCase):
+    def test_finished_jobs_are_pruned_after_the_retention_window(self):
+        runner = BlockingRunner()
+        runner.release.set()
+        jobs = GenerationJobQueue(runner, max_workers=1, retention_seconds=0.05)
+        try:
+            finished = jobs.submit({'dept_name': 'CSE'})
+            wait_until(lambda: finished.finished_at is not None)
+            time.sleep(0.1)
+
+            # Pruning happens when the next job is submitted
+            latest = jobs.submit({'dept_name': 'ECE'})
+
+            self.assertIsNone(jobs.get(finished.id))
+            self.assertIs(jobs.get(latest.id), latest)
+        finally:
+            jobs.executor.shutdown(wait=True)
+
+    def test_unfinished_jobs_are_kept(self):
+        runner = BlockingRunner()
+        jobs = GenerationJobQueue(runner, max_workers=1, retention_seconds=0)
+        try:
+            running = jobs.submit({'dept_name': 'CSE'})
+            self.assertTrue(runner.started.wait(WAIT_SECONDS))
+            jobs.submit({'dept_name': 'ECE'})
+
+            self.assertIs(jobs.get(running.id), running)
+        finally:
+            runner.release.set()
+            jobs.executor.shutdown(wait=True)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+"""Tests for incremental repair (repair_section_timetables): keep what an edit leaves valid, fail cleanly otherwise."""
+
+import copy
+import unittest
+
+from algorithm import (TimetableInfeasibleError, num_days, num_periods, repair_section_timetables,
+                       store_section_timetables)
+
+BREAKS = {"first_break_period": 2, "lunch_break_period": 4}
+SECTIONS = ["A", "B"]
+FACULTY = {"MATHS": "F1", "OS": "F2", "DSA": "F3", "JAVA": "F4", "DSL": "F5", "MC1": "F6"}
+
+
+def subjects():
+    return {section: {"MATHS": {"hours": 4, "lab": False, "last": False},
+                      "OS": {"hours": 4, "lab": False, "last": False},
+                      "DSA": {"hours": 4, "lab": False, "last": False},
+                      "JAVA": {"hours": 3, "lab": False, "last": False},
+                      "DSL": {"hours": 2, "lab": True, "last": False},
+                      "MC1": {"hours": 2, "lab": True, "last": True}}
+            for section in SECTIONS}
+
+
+def unavailable(subject, day):
+    """Forbidden constraints for `subject` on every period of `day`, in every section."""
+    return {section: {subject: [(day, period) for period in range(1, num_periods + 1)]} for section in SECTIONS}
+
+
+class RepairTest(unittest.TestCase):
+    def setUp(self):
+        self.stored = store_section_timetables(SECTIONS, subjects(), FACULTY, {}, {}, BREAKS, seed=1)
+
+    def test_unchanged_inputs_change_nothing(self):
+        timetables, report = repair_section_timetables(SECTIONS, subjects(), FACULTY, {}, {}, BREAKS,
+                                                       self.stored, seed=2)
+
+        self.assertEqual(timetables, self.stored)
+        self.assertEqual(report["changed_cells"], {"A": 0, "B": 0})
+        self.assertEqual(report["shortfall"], 0)
+
+    def test_faculty_unavailable_for_a_day_moves_only_their_classes(self):
+        # F1 (MATHS) can no longer teach on a day MATHS was taught in section A
+        day = next(d for d in range(1, num_days + 1) if "MATHS" in self.stored["A"][d].values())
+        timetables, report = repair_section_timetables(SECTIONS, subjects(), FACULTY, {}, unavailable("MATHS", day),
+                                                       BREAKS, self.stored, seed=2)
+
+        self.assertEqual(report["shortfall"], 0)
+        for section in SECTIONS:
+            before, after = self.stored[section], timetables[section]
+            self.assertNotIn("MATHS", after[day].values())
+            self.assertEqual(sum(subject == "MATHS" for periods in after.values() for subject in periods.values()), 4)
+            moved = [(d, p) for d in before for p in before[d] if before[d][p] != after[d][p]]
+            self.assertEqual(len(moved), report["changed_cells"][section])
+            for (d, p) in moved:
+                # Only the dropped MATHS class leaves its cell, and it can only land on a free (REMEDIAL) cell
+                self.assertTrue((before[d][p] == "MATHS" and d == day)
+                                or (before[d][p] == "REMEDIAL" and after[d][p] == "MATHS"),
+                                f"{section} {d}/{p}: {before[d][p]} -> {after[d][p]}")
+        self.assertGreater(report["changed_cells"]["A"], 0)
+
+    def test_infeasible_edit_raises_and_leaves_the_stored_timetables_alone(self):
+        # Four MATHS periods need four different days; two days off leave three
+        forbidden = unavailable("MATHS", 1)
+        for section in SECTIONS:
+            forbidden[section]["MATHS"] += [(2, period) for period in range(1, num_periods + 1)]
+        existing = copy.deepcopy(self.stored)
+
+        with self.assertRaises(TimetableInfeasibleError) as raised:
+            repair_section_timetables(SECTIONS, subjects(), FACULTY, {}, forbidden, BREAKS, existing, seed=2)
+        self.assertEqual({problem["check"] for problem in raised.exception.problems}, {"subject_domain"})
+        self.assertEqual(existing, self.stored)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,43 @@
+"""Regression tests for the delta checks that validate a swap (swapped_unit_is_valid)."""
+
+import unittest
+
+from algorithm import SolverContext, create_empty_timetable, swapped_unit_is_valid
+
+
+class SplitLabSwapTest(unittest.TestCase):
+    def setUp(self):
+        subjects = {"A": {
+            "L": {"hours": 4, "lab": True, "last": False},
+            "M": {"hours": 2, "lab": True, "last": False},
+        }}
+        self.ctx = SolverContext(["A"], subjects, {"L": "F1", "M": "F2"},
+                                 break_config={"first_break_period": 4, "lunch_break_period": 6})
+        self.timetable = create_empty_timetable(self.ctx, "A")
+        for period in range(1, 5):
+            self.timetable.set(1, period, "L")
+        self.timetable.set(2, 1, "M")
+        self.timetable.set(2, 2, "M")
+
+    def test_swap_out_of_the_middle_of_a_lab_run_is_rejected(self):
+        # L,L,L,L on Monday; moving M into P2-P3 would leave L,M,M,L
+        unit1, unit2 = [(1, 2), (1, 3)], [(2, 1), (2, 2)]
+        for (d1, p1), (d2, p2) in zip(unit1, unit2):
+            self.timetable.set(d1, p1, "M")
+            self.timetable.set(d2, p2, "L")
+
+        self.assertFalse(swapped_unit_is_valid(self.ctx, "A", self.timetable, unit1, "L")
+                         and swapped_unit_is_valid(self.ctx, "A", self.timetable, unit2, "M"))
+
+    def test_swap_of_a_whole_lab_block_is_accepted(self):
+        unit1, unit2 = [(1, 3), (1, 4)], [(2, 1), (2, 2)]
+        for (d1, p1), (d2, p2) in zip(unit1, unit2):
+            self.timetable.set(d1, p1, "M")
+            self.timetable.set(d2, p2, "L")
+
+        self.assertTrue(swapped_unit_is_valid(self.ctx, "A", self.timetable, unit1, "L"))
+        self.assertTrue(swapped_unit_is_valid(self.ctx, "A", self.timetable, unit2, "M"))
+
+
+if __name__ == "__main__":
+    unittest.main()